@@ -9,3 +9,5 @@ from .game import Game
 
 from .player import HumanPlayer
 from .player import AIPlayer
+
+from .simulate import simulate_round
@@ -0,0 +1,335 @@
+"""Benchmarks of the hot paths of the game engine.
+
+Run all benchmarks, save a baseline and compare against it later:
+
+    python -m foxforest.benchmark --save baseline.json
+    python -m foxforest.benchmark --compare baseline.json --threshold 0.1
+
+The comparison exits with status 1 when any benchmark lost more than
+threshold of its throughput.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+import numpy as np
+
+from .game import Game
+from .game import Play
+from .player import AIPlayer
+from .player import RandomPlayer
+
+
+# a benchmark prepares its fixtures from a seeded rng and returns the operation
+# to time
+Benchmark = Callable[[random.Random], Callable[[], object]]
+
+
+@dataclass
+class BenchmarkResult:
+    """Throughput of one benchmark, and for whole rounds the latency
+    percentiles in milliseconds."""
+
+    name: str
+    ops_per_sec: float
+    percentiles: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+
+        return {"ops_per_sec": self.ops_per_sec, "percentiles": self.percentiles}
+
+
+############
+#
+# Benchmarks
+#
+############
+
+
+def _new_game(rng: random.Random) -> Game:
+
+    game = Game(
+        RandomPlayer("player1", random.Random(rng.getrandbits(64))),
+        RandomPlayer("player2", random.Random(rng.getrandbits(64))),
+        random.Random(rng.getrandbits(64)),
+    )
+    game.setup_game()
+
+    return game
+
+
+def bench_is_valid_play(rng: random.Random) -> Callable[[], object]:
+
+    game = _new_game(rng)
+    game.play_turn()
+
+    plays = [Play(game.player_turn, card) for card in game.player_turn.hand]
+
+    def run():
+        for play in plays:
+            game.is_valid_play(play)
+
+    return run
+
+
+def bench_get_valid_moves(rng: random.Random) -> Callable[[], object]:
+
+    game = _new_game(rng)
+    game.play_turn()
+
+    player = game.player_turn
+
+    return lambda: player.get_valid_moves(game)
+
+
+def bench_determine_trick_winner(rng: random.Random) -> Callable[[], object]:
+
+    game = _new_game(rng)
+    game.play_turn()
+    game.play_turn()
+
+    return game.determine_trick_winner
+
+
+def bench_setup_game(rng: random.Random) -> Callable[[], object]:
+
+    game = _new_game(rng)
+
+    return game.setup_game
+
+
+def bench_step_round(rng: random.Random) -> Callable[[], object]:
+
+    game = _new_game(rng)
+
+    def run():
+
+        game.setup_game()
+        player = game.player1
+
+        while game.turns < 13:
+
+            if game.wait_for_discard:
+                game.step(Play(player, player.request_discard(game)))
+            else:
+                game.step(player.request_play(game))
+
+    return run
+
+
+def bench_play_game(rng: random.Random) -> Callable[[], object]:
+
+    game = _new_game(rng)
+
+    return lambda: game.play_game(verbose=False)
+
+
+def bench_encode_cards(rng: random.Random) -> Callable[[], object]:
+
+    game = _new_game(rng)
+    player = AIPlayer("player", seed=rng.getrandbits(64))
+    hand = game.player1.hand
+
+    return lambda: player.encode_cards(hand)
+
+
+# per operation benchmarks report throughput, round benchmarks also latencies
+BENCHMARKS: Dict[str, Benchmark] = {
+    "is_valid_play": bench_is_valid_play,
+    "get_valid_moves": bench_get_valid_moves,
+    "determine_trick_winner": bench_determine_trick_winner,
+    "setup_game": bench_setup_game,
+    "encode_cards": bench_encode_cards,
+}
+
+ROUND_BENCHMARKS: Dict[str, Benchmark] = {
+    "step_round": bench_step_round,
+    "play_game": bench_play_game,
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+############
+#
+# Running and comparing
+#
+############
+
+
+def measure(
+    name: str,
+    benchmark: Benchmark,
+    min_time: float = 0.5,
+    repeats: int = 5,
+    seed: int = 0,
+    latencies: bool = False,
+) -> BenchmarkResult:
+    """Times a benchmark and returns its best throughput over repeats runs of
+    at least min_time / repeats seconds each."""
+
+    operation = benchmark(random.Random(seed))
+    target = min_time / repeats
+
+    # calibrate the number of operations per run
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target or number >= 1 << 24:
+            break
+        number *= 2 if elapsed > target / 10 else 10
+
+    best = 0.0
+    samples: List[float] = []
+
+    for _ in range(repeats):
+
+        if latencies:
+            start = time.perf_counter()
+            for _ in range(number):
+                operation_start = time.perf_counter()
+                operation()
+                samples.append(time.perf_counter() - operation_start)
+            elapsed = time.perf_counter() - start
+        else:
+            start = time.perf_counter()
+            for _ in range(number):
+                operation()
+            elapsed = time.perf_counter() - start
+
+        best = max(best, number / elapsed)
+
+    percentiles = {}
+    if samples:
+        values = np.percentile(np.array(samples) * 1000, PERCENTILES)
+        percentiles = {
+            f"p{percentile}_ms": float(value)
+            for percentile, value in zip(PERCENTILES, values)
+        }
+
+    return BenchmarkResult(name, best, percentiles)
+
+
+def run_benchmarks(
+    names: Optional[Sequence[str]] = None,
+    min_time: float = 0.5,
+    repeats: int = 5,
+    seed: int = 0,
+) -> List[BenchmarkResult]:
+
+    benchmarks = {name: (bench, False) for name, bench in BENCHMARKS.items()}
+    benchmarks.update({name: (bench, True) for name, bench in ROUND_BENCHMARKS.items()})
+
+    if names is None:
+        names = list(benchmarks)
+
+    return [
+        measure(name, benchmarks[name][0], min_time, repeats, seed, benchmarks[name][1])
+        for name in names
+    ]
+
+
+def to_json(results: Sequence[BenchmarkResult]) -> dict:
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": {result.name: result.to_dict() for result in results},
+    }
+
+
+def compare(
+    results: Sequence[BenchmarkResult], baseline: dict, threshold: float = 0.1
+) -> List[str]:
+    """Returns a message for every benchmark whose throughput dropped by more
+    than threshold, a fraction, below the baseline."""
+
+    regressions = []
+
+    for result in results:
+
+        reference = baseline["benchmarks"].get(result.name)
+        if reference is None:
+            continue
+
+        change = result.ops_per_sec / reference["ops_per_sec"] - 1
+
+        if change < -threshold:
+            regressions.append(
+                f"{result.name}: {result.ops_per_sec:,.0f} ops/s is {-change:.0%} "
+                f"below the baseline of {reference['ops_per_sec']:,.0f} ops/s"
+            )
+
+    return regressions
+
+
+def format_results(results: Sequence[BenchmarkResult]) -> str:
+
+    lines = []
+
+    for result in results:
+        line = f"{result.name:<24} {result.ops_per_sec:>14,.0f} ops/s"
+        for name, value in result.percentiles.items():
+            line += f"  {name} {value:.3f}"
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against this JSON baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed throughput loss as a fraction, 0.1 by default",
+    )
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names or None, args.min_time, args.repeats, args.seed)
+
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(to_json(results), file, indent=2)
+
+    if args.compare:
+
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,886 @@
+from __future__ import annotations
+
+import math
+import random
+
+from typing import TYPE_CHECKING
+from typing import Iterator
+from typing import List
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+############
+#
+# Card layout
+#
+############
+
+# every card is an index in 0..32, ordered by suit 'K', 'B', 'M' and value 1..11,
+# the same layout used by AIPlayer.encode_cards. Sets of cards are 33-bit integers.
+
+SUITS = ("K", "B", "M")
+SUIT_INDEX = {"K": 0, "B": 1, "M": 2}
+
+NUM_VALUES = 11
+NUM_CARDS = 33
+ALL_CARDS = (1 << NUM_CARDS) - 1
+
+# marks the absence of a card, e.g. no card has been led in the current trick
+NO_CARD = -1
+
+# second element of a move that discards its card after a 5
+DISCARD = -2
+
+# a move is (card, ability_card) for plays and (card, DISCARD) for discards
+Move = Tuple[int, int]
+
+CARD_VALUES: Tuple[int, ...] = tuple(i % NUM_VALUES + 1 for i in range(NUM_CARDS))
+CARD_SUITS: Tuple[int, ...] = tuple(i // NUM_VALUES for i in range(NUM_CARDS))
+
+SUIT_MASKS: Tuple[int, ...] = tuple(
+    ((1 << NUM_VALUES) - 1) << (NUM_VALUES * suit) for suit in range(len(SUITS))
+)
+
+# VALUE_MASKS[v] holds the cards of value v in all three suits, index 0 is unused
+VALUE_MASKS: Tuple[int, ...] = (0,) + tuple(
+    sum(1 << (suit * NUM_VALUES + value - 1) for suit in range(len(SUITS)))
+    for value in range(1, NUM_VALUES + 1)
+)
+
+SEVENS = VALUE_MASKS[7]
+
+# points [player1, player2] awarded for the number of tricks won by player1
+TRICK_POINTS: Tuple[Tuple[int, int], ...] = (
+    (6, 0),
+    (6, 0),
+    (6, 0),
+    (6, 0),
+    (1, 6),
+    (2, 6),
+    (3, 6),
+    (6, 3),
+    (6, 2),
+    (6, 1),
+    (0, 6),
+    (0, 6),
+    (0, 6),
+    (0, 6),
+)
+
+
+# random.Random or numpy Generator, anything that draws for a round is passed
+# one of these explicitly so every round can be replayed from its seed
+RandomSource = Union[random.Random, "np.random.Generator"]
+
+
+def card_index(value: int, suit: str) -> int:
+
+    return SUIT_INDEX[suit] * NUM_VALUES + value - 1
+
+
+def card_name(index: int) -> str:
+
+    return f"{CARD_VALUES[index]}{SUITS[CARD_SUITS[index]]}"
+
+
+def _popcount(mask: int) -> int:
+
+    return bin(mask).count("1")
+
+
+# int.bit_count is only available from python 3.10
+popcount = getattr(int, "bit_count", _popcount)
+
+
+def iter_cards(mask: int) -> Iterator[int]:
+
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# positions of the bits set in every 11-bit suit chunk of a mask
+_CHUNK_CARDS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(i for i in range(NUM_VALUES) if chunk >> i & 1)
+    for chunk in range(1 << NUM_VALUES)
+)
+
+
+# SUIT_CARDS[suit][chunk] holds the indices of the cards of suit whose bits
+# are set in an 11-bit chunk, the chunk of a mask for suit s is
+# mask >> (NUM_VALUES * s) & SUIT_CHUNK
+SUIT_CHUNK = (1 << NUM_VALUES) - 1
+
+SUIT_CARDS: Tuple[Tuple[Tuple[int, ...], ...], ...] = tuple(
+    tuple(tuple(suit * NUM_VALUES + i for i in cards) for cards in _CHUNK_CARDS)
+    for suit in range(len(SUITS))
+)
+
+
+def cards_of(mask: int) -> Tuple[int, ...]:
+    """Returns the indices of the cards in mask in ascending order, with one
+    table lookup per suit instead of a loop over the bits."""
+
+    return (
+        SUIT_CARDS[0][mask & SUIT_CHUNK]
+        + SUIT_CARDS[1][mask >> NUM_VALUES & SUIT_CHUNK]
+        + SUIT_CARDS[2][mask >> 2 * NUM_VALUES]
+    )
+
+
+def random_below(n: int, rng: RandomSource) -> int:
+    """Draws an integer in 0..n-1 uniformly."""
+
+    if isinstance(rng, random.Random):
+        return rng.randrange(n)
+
+    return int(rng.integers(n))
+
+
+def random_card(mask: int, rng: RandomSource) -> int:
+    """Picks one of the cards in a non-empty mask uniformly."""
+
+    k = int(rng.random() * popcount(mask))
+
+    for offset in (0, NUM_VALUES, 2 * NUM_VALUES):
+        cards = _CHUNK_CARDS[mask >> offset & 0x7FF]
+        if k < len(cards):
+            return offset + cards[k]
+        k -= len(cards)
+
+    raise ValueError("Cannot pick a card from an empty mask")
+
+
+_DECK_PERMUTATIONS = math.factorial(NUM_CARDS)
+
+
+def shuffled_deck(rng: RandomSource) -> List[int]:
+    """Returns the 33 card indices in random order."""
+
+    if not isinstance(rng, random.Random):
+        return [int(index) for index in rng.permutation(NUM_CARDS)]
+
+    order = list(range(NUM_CARDS))
+
+    # Fisher-Yates with all swap positions decoded from a single uniform draw
+    # below 33!, much cheaper than one rng.shuffle call per card
+    code = rng.randrange(_DECK_PERMUTATIONS)
+
+    for i in range(NUM_CARDS - 1, 0, -1):
+        code, j = divmod(code, i + 1)
+        order[i], order[j] = order[j], order[i]
+
+    return order
+
+
+def cards_to_mask(indices: Sequence[int]) -> int:
+
+    mask = 0
+
+    for index in indices:
+        mask |= 1 << index
+
+    return mask
+
+
+############
+#
+# Rules
+#
+############
+
+
+# HIGHEST_CARD[chunk] is the bit of the highest card in an 11-bit suit chunk
+HIGHEST_CARD: Tuple[int, ...] = (0,) + tuple(
+    1 << (chunk.bit_length() - 1) for chunk in range(1, 1 << NUM_VALUES)
+)
+
+
+def _follow_chunk(chunk: int, eleven: bool) -> int:
+
+    # an 11 forces the 1 or the highest card of the suit
+    if eleven and chunk:
+        return (chunk & 1) | HIGHEST_CARD[chunk]
+
+    return chunk
+
+
+# LEGAL_FOLLOW[lead][chunk] is the mask of legal answers to the card led from
+# a hand whose chunk of the led suit is chunk, 0 if the hand lacks the suit.
+# Leads of the same suit share a table, the 11s have their own.
+_FOLLOW_TABLES = {
+    (suit, eleven): tuple(
+        _follow_chunk(chunk, eleven) << (NUM_VALUES * suit)
+        for chunk in range(1 << NUM_VALUES)
+    )
+    for suit in range(len(SUITS))
+    for eleven in (False, True)
+}
+
+LEGAL_FOLLOW: Tuple[Tuple[int, ...], ...] = tuple(
+    _FOLLOW_TABLES[CARD_SUITS[lead], CARD_VALUES[lead] == 11]
+    for lead in range(NUM_CARDS)
+)
+
+# LEAD_SHIFT[lead] moves the chunk of the led suit to the lowest bits
+LEAD_SHIFT: Tuple[int, ...] = tuple(
+    NUM_VALUES * CARD_SUITS[lead] for lead in range(NUM_CARDS)
+)
+
+
+def legal_moves(hand: int, lead: int) -> int:
+    """Returns the mask of cards in hand that may be played.
+
+    Args:
+        hand (int): mask of the cards held by the player to move
+        lead (int): index of the card led in the current trick, or NO_CARD
+    """
+
+    if lead < 0:
+        return hand
+
+    # a player without the led suit may play anything
+    return LEGAL_FOLLOW[lead][hand >> LEAD_SHIFT[lead] & SUIT_CHUNK] or hand
+
+
+def trick_winner(lead: int, follow: int, trump_suit: int) -> int:
+    """Returns 0 if the card led wins the trick and 1 if the following card wins.
+
+    This spells out the rules, look the winner up in TRICK_WINNER instead where
+    speed matters.
+    """
+
+    lead_value = CARD_VALUES[lead]
+    follow_value = CARD_VALUES[follow]
+    lead_suit = CARD_SUITS[lead]
+    follow_suit = CARD_SUITS[follow]
+
+    # if only one 9 is played, counts as trump
+    if lead_value == 9 and follow_value != 9:
+        if follow_suit == trump_suit and follow_value > lead_value:
+            return 1
+        return 0
+
+    if lead_value != 9 and follow_value == 9:
+        if lead_suit == trump_suit and lead_value > follow_value:
+            return 0
+        return 1
+
+    # if equal suit, highest wins
+    if lead_suit == follow_suit:
+        return 0 if lead_value > follow_value else 1
+
+    # if the following card is trump it wins
+    if follow_suit == trump_suit:
+        return 1
+
+    # else the card led wins, since suit was not matched
+    return 0
+
+
+# TRICK_WINNER[lead][follow][trump_suit] is trick_winner(lead, follow, trump_suit),
+# nested tuples index faster than a flat table with computed offsets
+TRICK_WINNER: Tuple[Tuple[Tuple[int, ...], ...], ...] = tuple(
+    tuple(
+        tuple(
+            trick_winner(lead, follow, trump_suit) for trump_suit in range(len(SUITS))
+        )
+        for follow in range(NUM_CARDS)
+    )
+    for lead in range(NUM_CARDS)
+)
+
+
+def round_points(p1_tricks: int, p1_sevens: int, p2_sevens: int) -> List[int]:
+
+    p1_points, p2_points = TRICK_POINTS[p1_tricks]
+
+    return [p1_points + p1_sevens, p2_points + p2_sevens]
+
+
+############
+#
+# Actions
+#
+############
+
+# every decision is one integer action:
+#   0..32     play card c without using an ability
+#   33..131   play the 3 of suit s and take the decree card in exchange for
+#             card x, SWAP_OFFSET + s * NUM_CARDS + x
+#   132..164  discard card y after a 5, DISCARD_OFFSET + y
+# Sets of actions are NUM_ACTIONS-bit integers, like sets of cards.
+
+SWAP_OFFSET = NUM_CARDS
+DISCARD_OFFSET = SWAP_OFFSET + len(SUITS) * NUM_CARDS
+NUM_ACTIONS = DISCARD_OFFSET + NUM_CARDS
+
+THREES = VALUE_MASKS[3]
+
+# the bits of an action mask are enumerated like the bits of a card mask
+iter_actions = iter_cards
+
+
+def random_action(mask: int, rng: RandomSource) -> int:
+    """Picks one of the actions in a non-empty mask uniformly."""
+
+    actions = list(iter_actions(mask))
+
+    return actions[random_below(len(actions), rng)]
+
+
+def move_to_action(move: Move) -> int:
+
+    card, ability_card = move
+
+    if ability_card == DISCARD:
+        return DISCARD_OFFSET + card
+
+    if ability_card >= 0:
+        return SWAP_OFFSET + CARD_SUITS[card] * NUM_CARDS + ability_card
+
+    return card
+
+
+def action_to_move(action: int) -> Move:
+
+    if action < SWAP_OFFSET:
+        return action, NO_CARD
+
+    if action < DISCARD_OFFSET:
+        suit, ability_card = divmod(action - SWAP_OFFSET, NUM_CARDS)
+        return suit * NUM_VALUES + 2, ability_card
+
+    return action - DISCARD_OFFSET, DISCARD
+
+
+def legal_actions(hand: int, lead: int, pending_discard: bool = False) -> int:
+    """Returns the mask of legal actions of the player to act.
+
+    Args:
+        hand (int): mask of the cards held by the player to act
+        lead (int): index of the card led in the current trick, or NO_CARD
+        pending_discard (bool): whether the player has to discard after a 5
+    """
+
+    if pending_discard:
+        return hand << DISCARD_OFFSET
+
+    legal = legal_moves(hand, lead)
+    actions = legal
+
+    # a 3 may exchange any other card in hand with the decree card
+    if legal & THREES:
+        for three in cards_of(legal & THREES):
+            actions |= (hand ^ (1 << three)) << (
+                SWAP_OFFSET + CARD_SUITS[three] * NUM_CARDS
+            )
+
+    return actions
+
+
+############
+#
+# Zobrist hashing
+#
+############
+
+# random 64-bit keys of the features of a position. The seed is fixed, so a
+# position hashes the same in every process, e.g. to find duplicates in
+# corpora written by different workers
+_ZOBRIST_RNG = random.Random(0x5F0C5)
+
+
+def _zobrist_keys(count: int) -> Tuple[int, ...]:
+
+    return tuple(_ZOBRIST_RNG.getrandbits(64) for _ in range(count))
+
+
+ZOBRIST_HANDS: Tuple[Tuple[int, ...], ...] = (
+    _zobrist_keys(NUM_CARDS),
+    _zobrist_keys(NUM_CARDS),
+)
+ZOBRIST_DECREE = _zobrist_keys(NUM_CARDS)
+ZOBRIST_LEAD = _zobrist_keys(NUM_CARDS)
+ZOBRIST_FOLLOW = _zobrist_keys(NUM_CARDS)
+# ZOBRIST_DECK[position][card], positions counted from the top of the deck
+ZOBRIST_DECK: Tuple[Tuple[int, ...], ...] = tuple(
+    _zobrist_keys(NUM_CARDS) for _ in range(NUM_CARDS)
+)
+# no tricks or sevens won has key 0, so the hash of the empty state is 0
+ZOBRIST_TRICKS = ((0,) + _zobrist_keys(13), (0,) + _zobrist_keys(13))
+ZOBRIST_SEVENS = ((0,) + _zobrist_keys(3), (0,) + _zobrist_keys(3))
+ZOBRIST_TURN = _ZOBRIST_RNG.getrandbits(64)
+ZOBRIST_PENDING = _ZOBRIST_RNG.getrandbits(64)
+
+
+# combined keys of the updates made by every move, so most moves take one
+# lookup: ZOBRIST_LEADS[seat][card] takes card from the hand of seat into the
+# trick and passes the turn, ZOBRIST_FOLLOWS[seat][card] plays the card that
+# completes the trick and clears the card led, ZOBRIST_WON[seat][tricks] adds
+# a trick to the tricks won by seat
+ZOBRIST_LEADS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(hand[card] ^ ZOBRIST_LEAD[card] ^ ZOBRIST_TURN for card in range(NUM_CARDS))
+    for hand in ZOBRIST_HANDS
+)
+ZOBRIST_FOLLOWS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(hand[card] ^ ZOBRIST_FOLLOW[card] for card in range(NUM_CARDS))
+    for hand in ZOBRIST_HANDS
+)
+# ZOBRIST_DRAW[position][card] moves card from position + 1 to position, as
+# the cards below the top move up when it is drawn
+ZOBRIST_DRAW: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(
+        ZOBRIST_DECK[position][card] ^ ZOBRIST_DECK[position - 1][card]
+        for card in range(NUM_CARDS)
+    )
+    for position in range(1, NUM_CARDS)
+)
+ZOBRIST_WON: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(won[tricks] ^ won[tricks + 1] for tricks in range(13))
+    for won in ZOBRIST_TRICKS
+)
+
+
+def _chunk_keys(keys: Tuple[int, ...]) -> Tuple[int, ...]:
+
+    chunk_keys = [0] * (1 << NUM_VALUES)
+
+    for chunk in range(1, 1 << NUM_VALUES):
+        low = chunk & -chunk
+        chunk_keys[chunk] = chunk_keys[chunk ^ low] ^ keys[low.bit_length() - 1]
+
+    return tuple(chunk_keys)
+
+
+# ZOBRIST_HAND_CHUNKS[seat][suit][chunk] is the xor of the hand keys of the
+# cards of suit in an 11-bit chunk, see SUIT_CARDS
+ZOBRIST_HAND_CHUNKS: Tuple[Tuple[Tuple[int, ...], ...], ...] = tuple(
+    tuple(
+        _chunk_keys(keys[suit * NUM_VALUES : (suit + 1) * NUM_VALUES])
+        for suit in range(len(SUITS))
+    )
+    for keys in ZOBRIST_HANDS
+)
+
+
+def hand_hash(seat: int, hand: int) -> int:
+
+    chunks = ZOBRIST_HAND_CHUNKS[seat]
+
+    return (
+        chunks[0][hand & SUIT_CHUNK]
+        ^ chunks[1][hand >> NUM_VALUES & SUIT_CHUNK]
+        ^ chunks[2][hand >> 2 * NUM_VALUES]
+    )
+
+
+def deck_hash(cards: Sequence[int]) -> int:
+    """Hashes the cards left in a deck, top card first."""
+
+    key = 0
+
+    for position, card in enumerate(cards):
+        key ^= ZOBRIST_DECK[position][card]
+
+    return key
+
+
+def zobrist_hash(state: GameState) -> int:
+    """Computes the hash of a position from scratch.
+
+    It covers the hands, the decree card, the cards left in the deck in
+    order, the cards of the current trick, the player to act, a pending
+    discard and the tricks and sevens won. The played cards follow from
+    these, the order of the earlier tricks is not part of the position.
+    """
+
+    key = (
+        hand_hash(0, state.hands[0])
+        ^ hand_hash(1, state.hands[1])
+        ^ deck_hash(state.deck[state.deck_pos :])
+        ^ ZOBRIST_TRICKS[0][state.tricks[0]]
+        ^ ZOBRIST_TRICKS[1][state.tricks[1]]
+        ^ ZOBRIST_SEVENS[0][state.sevens[0]]
+        ^ ZOBRIST_SEVENS[1][state.sevens[1]]
+    )
+
+    if state.decree >= 0:
+        key ^= ZOBRIST_DECREE[state.decree]
+    if state.lead >= 0:
+        key ^= ZOBRIST_LEAD[state.lead]
+    if state.follow >= 0:
+        key ^= ZOBRIST_FOLLOW[state.follow]
+    if state.turn:
+        key ^= ZOBRIST_TURN
+    if state.pending_discard:
+        key ^= ZOBRIST_PENDING
+
+    return key
+
+
+############
+#
+# Game state
+#
+############
+
+
+class GameState:
+    """Compact state of a single round, every set of cards is a 33-bit mask.
+
+    Players are referred to by seat, 0 for player1 and 1 for player2. The
+    methods assume the proposed moves are legal, use legal_moves() and
+    is_legal() to check them first.
+
+    hash is the Zobrist hash of the position, see zobrist_hash, kept up to
+    date by every move while hashed is set. Call rehash() after setting fields
+    by hand. Simulations that never look at the hash deal with hashed=False,
+    which saves its upkeep on every move.
+    """
+
+    __slots__ = (
+        "hands",
+        "deck",
+        "deck_pos",
+        "decree",
+        "trick",
+        "lead",
+        "follow",
+        "leader",
+        "played",
+        "turn",
+        "pending_discard",
+        "tricks",
+        "sevens",
+        "turns",
+        "history",
+        "hash",
+        "hashed",
+        "_undo",
+    )
+
+    def __init__(self):
+
+        self.hands: List[int] = [0, 0]
+        # cards left in the deck are deck[deck_pos:], drawn from the front
+        self.deck: List[int] = []
+        self.deck_pos = 0
+        self.decree = NO_CARD
+        self.trick = 0
+        self.lead = NO_CARD
+        self.follow = NO_CARD
+        self.leader = 0
+        self.played = 0
+        self.turn = 0
+        self.pending_discard = False
+        self.tricks: List[int] = [0, 0]
+        self.sevens: List[int] = [0, 0]
+        self.turns = 0
+        # (leader, card led, card followed, winner) for every finished trick
+        self.history: List[Tuple[int, int, int, int]] = []
+        self.hash = 0
+        self.hashed = True
+        # snapshots taken by push()
+        self._undo: List[tuple] = []
+
+    def copy(self) -> GameState:
+
+        state = GameState.__new__(GameState)
+
+        state.hands = self.hands[:]
+        state.deck = self.deck[:]
+        state.deck_pos = self.deck_pos
+        state.decree = self.decree
+        state.trick = self.trick
+        state.lead = self.lead
+        state.follow = self.follow
+        state.leader = self.leader
+        state.played = self.played
+        state.turn = self.turn
+        state.pending_discard = self.pending_discard
+        state.tricks = self.tricks[:]
+        state.sevens = self.sevens[:]
+        state.turns = self.turns
+        state.history = self.history[:]
+        state.hash = self.hash
+        state.hashed = self.hashed
+        state._undo = []
+
+        return state
+
+    def push(self, card: int, ability_card: int = NO_CARD) -> None:
+        """Plays a card, or discards it when a discard is pending. The move can
+        be taken back with pop()."""
+
+        self._undo.append(
+            (
+                self.hands[0],
+                self.hands[1],
+                self.deck_pos,
+                len(self.deck),
+                self.decree,
+                self.trick,
+                self.lead,
+                self.follow,
+                self.leader,
+                self.played,
+                self.turn,
+                self.pending_discard,
+                self.tricks[0],
+                self.tricks[1],
+                self.sevens[0],
+                self.sevens[1],
+                self.turns,
+                len(self.history),
+                self.hash,
+            )
+        )
+
+        if self.pending_discard:
+            self.discard(card)
+        else:
+            self.play(card, ability_card)
+
+    def pop(self) -> None:
+
+        (
+            self.hands[0],
+            self.hands[1],
+            self.deck_pos,
+            deck_length,
+            self.decree,
+            self.trick,
+            self.lead,
+            self.follow,
+            self.leader,
+            self.played,
+            self.turn,
+            self.pending_discard,
+            self.tricks[0],
+            self.tricks[1],
+            self.sevens[0],
+            self.sevens[1],
+            self.turns,
+            history_length,
+            self.hash,
+        ) = self._undo.pop()
+
+        del self.deck[deck_length:]
+        del self.history[history_length:]
+
+    def deal(self, order: Sequence[int], hashed: bool = True) -> None:
+        """Deals a shuffled deck the way Game.setup_game does: 13 cards to each
+        player, followed by the decree card. The remaining cards form the deck."""
+
+        self.__init__()
+        self.hands[0] = cards_to_mask(order[:13])
+        self.hands[1] = cards_to_mask(order[13:26])
+        self.decree = order[26]
+        self.deck = list(order[27:])
+
+        if hashed:
+            self.rehash()
+        else:
+            self.hashed = False
+
+    def rehash(self) -> None:
+        """Computes the hash from scratch, and keeps it up to date from then
+        on."""
+
+        self.hash = zobrist_hash(self)
+        self.hashed = True
+
+    @property
+    def done(self) -> bool:
+
+        return self.turns >= 13
+
+    @property
+    def trump_suit(self) -> int:
+
+        return CARD_SUITS[self.decree]
+
+    def legal_moves(self) -> int:
+
+        return legal_moves(self.hands[self.turn], self.lead)
+
+    def moves(self) -> List[Move]:
+        """Enumerates the moves of the player to act, including every card a 3
+        can exchange with the decree card, and the discards after a 5."""
+
+        hand = self.hands[self.turn]
+
+        if self.pending_discard:
+            return [(card, DISCARD) for card in cards_of(hand)]
+
+        legal = legal_moves(hand, self.lead)
+        moves = [(card, NO_CARD) for card in cards_of(legal)]
+
+        if legal & VALUE_MASKS[3]:
+            for three in cards_of(legal & VALUE_MASKS[3]):
+                moves += [(three, card) for card in cards_of(hand ^ (1 << three))]
+
+        return moves
+
+    def legal_actions(self) -> int:
+
+        return legal_actions(self.hands[self.turn], self.lead, self.pending_discard)
+
+    def apply_action(self, action: int) -> None:
+
+        card, ability_card = action_to_move(action)
+
+        if ability_card == DISCARD:
+            self.discard(card)
+        else:
+            self.play(card, ability_card)
+
+    def is_legal(self, card: int, ability_card: int = NO_CARD) -> bool:
+
+        if self.pending_discard or not self.legal_moves() >> card & 1:
+            return False
+
+        if ability_card >= 0:
+            return (
+                CARD_VALUES[card] == 3
+                and ability_card != card
+                and bool(self.hands[self.turn] >> ability_card & 1)
+            )
+
+        return True
+
+    def play(self, card: int, ability_card: int = NO_CARD) -> None:
+
+        player = self.turn
+        bit = 1 << card
+        value = CARD_VALUES[card]
+        hashed = self.hashed
+        key = 0
+
+        self.hands[player] ^= bit
+        self.trick |= bit
+        self.played |= bit
+
+        if self.lead < 0:
+            self.lead = card
+            self.leader = player
+            if hashed:
+                key = ZOBRIST_LEADS[player][card]
+        else:
+            self.follow = card
+            if hashed:
+                key = ZOBRIST_FOLLOWS[player][card]
+
+        # if 3 played and ability used, exchange decree card with ability card
+        if value == 3 and ability_card >= 0:
+            self.hands[player] ^= (1 << ability_card) | (1 << self.decree)
+            if hashed:
+                key ^= (
+                    ZOBRIST_HANDS[player][ability_card]
+                    ^ ZOBRIST_HANDS[player][self.decree]
+                    ^ ZOBRIST_DECREE[self.decree]
+                    ^ ZOBRIST_DECREE[ability_card]
+                )
+            self.decree = ability_card
+
+        # if 5 is played, draw the top card of the deck and wait for a discard,
+        # the turn only passes after it
+        if value == 5:
+            drawn = self.deck[self.deck_pos]
+            if hashed:
+                key ^= (
+                    ZOBRIST_HANDS[player][drawn]
+                    ^ ZOBRIST_DECK[0][drawn]
+                    ^ ZOBRIST_PENDING
+                )
+                for position, moved in enumerate(self.deck[self.deck_pos + 1 :]):
+                    key ^= ZOBRIST_DRAW[position][moved]
+                if self.follow < 0:
+                    key ^= ZOBRIST_TURN
+                self.hash ^= key
+            self.hands[player] |= 1 << drawn
+            self.deck_pos += 1
+            self.pending_discard = True
+        elif self.follow < 0:
+            self.turn = player ^ 1
+            if hashed:
+                self.hash ^= key
+        else:
+            self._finish_trick(key)
+
+    def discard(self, card: int) -> None:
+
+        key = 0
+
+        if self.hashed:
+            key = (
+                ZOBRIST_HANDS[self.turn][card]
+                ^ ZOBRIST_DECK[len(self.deck) - self.deck_pos][card]
+                ^ ZOBRIST_PENDING
+            )
+
+        self.hands[self.turn] ^= 1 << card
+        self.deck.append(card)
+        self.pending_discard = False
+
+        if self.follow < 0:
+            self.turn ^= 1
+            if self.hashed:
+                self.hash ^= key ^ ZOBRIST_TURN
+        else:
+            self._finish_trick(key)
+
+    def _finish_trick(self, key: int) -> None:
+        """Hands the trick to its winner, key holds the hash updates of the
+        move that completed it."""
+
+        leader = self.leader
+        lead = self.lead
+        follow = self.follow
+
+        winner = leader ^ TRICK_WINNER[lead][follow][CARD_SUITS[self.decree]]
+        hashed = self.hashed
+
+        if hashed:
+            key ^= (
+                ZOBRIST_LEAD[lead]
+                ^ ZOBRIST_FOLLOW[follow]
+                ^ ZOBRIST_WON[winner][self.tricks[winner]]
+            )
+
+        self.tricks[winner] += 1
+        self.history.append((leader, lead, follow, winner))
+
+        if self.trick & SEVENS:
+            won = popcount(self.trick & SEVENS)
+            if hashed:
+                sevens = ZOBRIST_SEVENS[winner]
+                key ^= sevens[self.sevens[winner]] ^ sevens[self.sevens[winner] + won]
+            self.sevens[winner] += won
+
+        # winner leads, unless a 1 was played but did not win the trick
+        losing_card = follow if winner == leader else lead
+        turn = winner ^ 1 if CARD_VALUES[losing_card] == 1 else winner
+
+        if hashed:
+            if turn != self.turn:
+                key ^= ZOBRIST_TURN
+            self.hash ^= key
+
+        self.turn = turn
+
+        self.trick = 0
+        self.lead = NO_CARD
+        self.follow = NO_CARD
+        self.turns += 1
+
+    def points(self) -> List[int]:
+
+        return round_points(self.tricks[0], self.sevens[0], self.sevens[1])
@@ -0,0 +1,342 @@
+"""Sequential comparison of two players on mirrored deals.
+
+Every deal is played twice with the seats swapped, which cancels most of the
+luck of the deal, and the pair of rounds is scored as one outcome. After every
+chunk of pairs a sequential probability ratio test decides whether the first
+player is at least elo1 stronger or at most elo0, and the match stops as soon
+as it does.
+"""
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import statistics
+from dataclasses import dataclass
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from .simulate import simulate_round
+from .tournament import PlayerFactory
+from .tournament import create_players
+from .tournament import spawn_seeds
+
+
+# outcomes of a pair of rounds, the score of the first player over both
+# rounds in half points: a loss 0, a draw 1 and a win 2 per round
+PAIR_SCORES = (0, 1, 2, 3, 4)
+
+# zero counts are replaced by this when estimating the variance of the pair
+# scores, so a lopsided start does not give infinite evidence
+REGULARIZATION = 1e-3
+
+H0 = "H0"
+H1 = "H1"
+
+
+def elo_to_score(elo: float) -> float:
+
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score: float) -> float:
+
+    score = min(max(score, 1e-6), 1 - 1e-6)
+
+    return -400 * math.log10(1 / score - 1)
+
+
+class PentanomialSPRT:
+    """Sequential probability ratio test on the outcomes of mirrored pairs.
+
+    Uses the normal approximation of the generalized SPRT on the pentanomial
+    distribution of pair scores, which accounts for the correlation of the two
+    rounds of a deal.
+
+    Args:
+        elo0 (float): Elo difference of the null hypothesis
+        elo1 (float): Elo difference of the alternative hypothesis
+        alpha (float): probability of accepting H1 when H0 holds
+        beta (float): probability of accepting H0 when H1 holds
+        min_pairs (int): pairs needed before a decision, as the variance
+            estimated from a few pairs, all alike, is close to zero
+    """
+
+    def __init__(
+        self,
+        elo0: float = 0.0,
+        elo1: float = 30.0,
+        alpha: float = 0.05,
+        beta: float = 0.05,
+        min_pairs: int = 30,
+    ):
+
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.min_pairs = min_pairs
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.counts = [0] * len(PAIR_SCORES)
+
+    @property
+    def pairs(self) -> int:
+
+        return sum(self.counts)
+
+    def add(self, counts: Sequence[int]) -> None:
+
+        for outcome, count in enumerate(counts):
+            self.counts[outcome] += count
+
+    def moments(self) -> Tuple[float, float]:
+        """Returns the mean and variance of the pair score, as a fraction of
+        the points of a pair."""
+
+        counts = [count or REGULARIZATION for count in self.counts]
+        total = sum(counts)
+
+        mean = sum(count * score for count, score in zip(counts, PAIR_SCORES))
+        mean /= 4 * total
+
+        variance = sum(
+            count * (score / 4 - mean) ** 2 for count, score in zip(counts, PAIR_SCORES)
+        )
+
+        return mean, variance / total
+
+    def llr(self) -> float:
+
+        if not self.pairs:
+            return 0.0
+
+        mean, variance = self.moments()
+        score0 = elo_to_score(self.elo0)
+        score1 = elo_to_score(self.elo1)
+
+        return (
+            self.pairs
+            * (score1 - score0)
+            * (2 * mean - score0 - score1)
+            / (2 * variance)
+        )
+
+    def decision(self) -> Optional[str]:
+        """Returns H1 or H0 once accepted, None while more pairs are needed."""
+
+        if self.pairs < self.min_pairs:
+            return None
+
+        llr = self.llr()
+
+        if llr >= self.upper:
+            return H1
+        if llr <= self.lower:
+            return H0
+
+        return None
+
+
+@dataclass
+class Evaluation:
+    """Outcome of a match between two players.
+
+    counts holds the number of pairs with every score in PAIR_SCORES, seen
+    from the first player. decision is None when the match ran out of pairs
+    before the test decided.
+    """
+
+    names: Tuple[str, str]
+    counts: List[int]
+    llr: float
+    bounds: Tuple[float, float]
+    decision: Optional[str]
+    point_difference: float
+
+    @property
+    def pairs(self) -> int:
+
+        return sum(self.counts)
+
+    @property
+    def rounds(self) -> int:
+
+        return 2 * self.pairs
+
+    def score(self) -> float:
+
+        total = sum(count * score for count, score in zip(self.counts, PAIR_SCORES))
+
+        return total / max(4 * self.pairs, 1)
+
+    def elo(self) -> float:
+        """Elo difference of the first player over the second, the Bradley-Terry
+        rating on the logistic Elo scale."""
+
+        return score_to_elo(self.score())
+
+    def elo_interval(self, confidence: float = 0.95) -> Tuple[float, float]:
+
+        sprt = PentanomialSPRT()
+        sprt.add(self.counts)
+
+        mean, variance = sprt.moments()
+        spread = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        error = spread * math.sqrt(variance / max(self.pairs, 1))
+
+        return score_to_elo(mean - error), score_to_elo(mean + error)
+
+    def ratings(
+        self, confidence: float = 0.95
+    ) -> List[Tuple[str, float, float, float]]:
+        """Returns (name, rating, lowest, highest) for both players, the second
+        player anchored at 0."""
+
+        lowest, highest = self.elo_interval(confidence)
+
+        return [
+            (self.names[0], self.elo(), lowest, highest),
+            (self.names[1], 0.0, 0.0, 0.0),
+        ]
+
+
+def _round_score(points: int, opponent_points: int) -> int:
+
+    if points > opponent_points:
+        return 2
+
+    return 1 if points == opponent_points else 0
+
+
+def _play_pairs(
+    task: Tuple[PlayerFactory, PlayerFactory, int, int]
+) -> Tuple[List[int], int]:
+    """Plays pairs of mirrored rounds and returns the counts of their pair
+    scores and the summed point difference."""
+
+    first, second, pairs, seed = task
+
+    rng = np.random.default_rng(seed)
+    player_a, player_b = create_players(first, second, rng)
+
+    counts = [0] * len(PAIR_SCORES)
+    difference = 0
+
+    for deal_seed, ahead_seed, behind_seed in rng.integers(2**63, size=(pairs, 3)):
+
+        # both rounds are dealt the same cards, but every round makes its own
+        # choices on them
+        ahead = simulate_round(player_a, player_b, int(deal_seed), int(ahead_seed))
+        behind = simulate_round(player_b, player_a, int(deal_seed), int(behind_seed))
+
+        counts[
+            _round_score(ahead.points[0], ahead.points[1])
+            + _round_score(behind.points[1], behind.points[0])
+        ] += 1
+
+        difference += ahead.points[0] - ahead.points[1]
+        difference += behind.points[1] - behind.points[0]
+
+    return counts, difference
+
+
+def _results(
+    tasks: List[Tuple[PlayerFactory, PlayerFactory, int, int]],
+    processes: int,
+) -> Iterator[Tuple[List[int], int]]:
+
+    if processes == 1:
+        for task in tasks:
+            yield _play_pairs(task)
+        return
+
+    # leaving the pool terminates the chunks still running once decided
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(_play_pairs, tasks)
+
+
+def evaluate(
+    first: PlayerFactory,
+    second: PlayerFactory,
+    elo0: float = 0.0,
+    elo1: float = 30.0,
+    alpha: float = 0.05,
+    beta: float = 0.05,
+    max_pairs: int = 10000,
+    seed: Optional[int] = None,
+    processes: Optional[int] = None,
+    chunk_size: int = 10,
+    names: Optional[Sequence[str]] = None,
+    min_pairs: int = 30,
+) -> Evaluation:
+    """Plays mirrored pairs of rounds between two players until the
+    sequential test decides or max_pairs have been played.
+
+    Chunks of chunk_size pairs run in a process pool, each with its own seed
+    from a numpy SeedSequence, and the test is updated with every chunk in
+    order, so the outcome only depends on the seed and chunk_size.
+
+    Args:
+        first (PlayerFactory): player being tested, a Player subclass or a
+            picklable callable creating a player from a name
+        second (PlayerFactory): player it is compared with
+        elo0 (float): Elo difference of the null hypothesis
+        elo1 (float): Elo difference of the alternative hypothesis
+        alpha (float): probability of accepting H1 when H0 holds
+        beta (float): probability of accepting H0 when H1 holds
+        max_pairs (int): pairs played at most
+        seed (Optional[int]): seed of the match
+        processes (Optional[int]): worker processes, all cores by default,
+            1 plays everything in the calling process
+        chunk_size (int): pairs per task and between two tests
+        names (Optional[Sequence[str]]): names reported in the result
+        min_pairs (int): pairs played before the test may decide
+    """
+
+    if names is None:
+        names = [
+            getattr(player, "__name__", repr(player)) for player in (first, second)
+        ]
+
+    chunks = [
+        min(chunk_size, max_pairs - start) for start in range(0, max_pairs, chunk_size)
+    ]
+    seeds = spawn_seeds(seed, len(chunks))
+    tasks = [
+        (first, second, pairs, chunk_seed) for pairs, chunk_seed in zip(chunks, seeds)
+    ]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    sprt = PentanomialSPRT(elo0, elo1, alpha, beta, min_pairs)
+    difference = 0
+    decision = None
+
+    results = _results(tasks, processes)
+
+    try:
+        for counts, chunk_difference in results:
+
+            sprt.add(counts)
+            difference += chunk_difference
+
+            decision = sprt.decision()
+            if decision is not None:
+                break
+
+    finally:
+        results.close()
+
+    return Evaluation(
+        names=(names[0], names[1]),
+        counts=list(sprt.counts),
+        llr=sprt.llr(),
+        bounds=(sprt.lower, sprt.upper),
+        decision=decision,
+        point_difference=difference / max(2 * sprt.pairs, 1),
+    )
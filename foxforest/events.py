@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import foxforest.game as game
+from .player import Player
+
+
+############
+#
+# Events
+#
+############
+
+# a Game only builds events while it has listeners, see Game.subscribe
+
+
+@dataclass(frozen=True)
+class RoundStarted:
+
+    players: Tuple[Player, Player]
+    hands: Tuple[Tuple["game.Card", ...], Tuple["game.Card", ...]]
+    decree_card: "game.Card"
+
+
+@dataclass(frozen=True)
+class CardPlayed:
+
+    player: Player
+    card: "game.Card"
+
+
+@dataclass(frozen=True)
+class AbilityUsed:
+    """A 3 exchanging the decree card, or a 5 drawing a card.
+
+    taken is the card the player took into hand, the old decree card or the
+    card drawn. given is the card that became the decree card, None for a 5.
+    """
+
+    player: Player
+    card: "game.Card"
+    taken: "game.Card"
+    given: Optional["game.Card"] = None
+
+
+@dataclass(frozen=True)
+class CardDiscarded:
+
+    player: Player
+    card: "game.Card"
+
+
+@dataclass(frozen=True)
+class TrickWon:
+
+    winner: Player
+    cards: Tuple["game.Card", ...]
+    players: Tuple[Player, ...]
+
+
+@dataclass(frozen=True)
+class RoundScored:
+    """Points and tricks won by player1 and player2."""
+
+    points: Tuple[int, int]
+    tricks: Tuple[int, int]
+
+
+Event = Union[
+    RoundStarted, CardPlayed, AbilityUsed, CardDiscarded, TrickWon, RoundScored
+]
+
+Listener = Callable[[Event], None]
+
+
+############
+#
+# Listeners
+#
+############
+
+
+class ConsoleRenderer:
+    """Prints a round as it is played."""
+
+    def __init__(self, write: Callable[[str], object] = print):
+
+        self.write = write
+
+    def __call__(self, event: Event) -> None:
+
+        if isinstance(event, RoundStarted):
+
+            self.write(f"Decree card is: {event.decree_card}")
+
+            for seat, hand in enumerate(event.hands):
+                self.write(f"Player {seat + 1} hand:")
+                self.write("".join(f"{card.value} {card.suit}, " for card in hand))
+
+        elif isinstance(event, CardPlayed):
+
+            self.write(
+                f"Player {event.player.name} plays: {event.card.value} {event.card.suit}"
+            )
+
+        elif isinstance(event, AbilityUsed):
+
+            if event.given is not None:
+                self.write(
+                    f"Player {event.player.name} exchanges the decree card for: "
+                    f"{event.given.value} {event.given.suit}"
+                )
+            else:
+                self.write(f"Player {event.player.name} draws a card")
+
+        elif isinstance(event, CardDiscarded):
+
+            self.write(f"Player {event.player.name} discards a card")
+
+        elif isinstance(event, TrickWon):
+
+            self.write(f"Winner is: {event.winner.name}")
+
+        elif isinstance(event, RoundScored):
+
+            self.write(f"Player 1 won {event.tricks[0]} tricks")
+            self.write(f"Player 2 won {event.tricks[1]} tricks")
+            self.write(f"Final points {list(event.points)}")
+
+
+class EventRecorder:
+    """Keeps every event received, e.g. to inspect a round after playing it."""
+
+    def __init__(self):
+
+        self.events: List[Event] = []
+
+    def __call__(self, event: Event) -> None:
+
+        self.events.append(event)
+
+    def of_type(self, event_type: type) -> List[Event]:
+
+        return [event for event in self.events if isinstance(event, event_type)]
@@ -2,26 +2,104 @@ from __future__ import annotations
 
 from typing import Optional
 from typing import List
+from typing import Sequence
+from typing import Tuple
 
+import copy
+import functools
 import random
-from dataclasses import dataclass
 
+from . import engine
+from . import profiling
 from .player import Player
+from . import events
 
 
 class InvalidPlay(Exception):
     pass
 
 
-@dataclass(order=True)
+@functools.total_ordering
 class Card:
+    """One of the 33 cards. Cards are interned: Card(value, suit) always returns
+    the same immutable instance, so cards can be shared between any number of
+    games. Cards compare and hash by their engine index. Who played a card is
+    kept in the trick record of the Game, not on the card."""
+
+    __slots__ = ("value", "suit", "index")
+
     value: int
     suit: str
-    played_by: Optional[Player] = None
+    index: int
+
+    def __new__(cls, value: int, suit: str) -> Card:
+
+        if suit not in engine.SUIT_INDEX or not 1 <= value <= engine.NUM_VALUES:
+            raise ValueError(f"No card {value}{suit}")
+
+        return _CARDS[engine.card_index(value, suit)]
+
+    def __setattr__(self, name, value):
+
+        raise AttributeError("Cards are immutable")
+
+    def __delattr__(self, name):
+
+        raise AttributeError("Cards are immutable")
 
     def __str__(self):
         return f"{self.value}{self.suit}"
 
+    def __repr__(self):
+
+        return f"Card({self.value}, {self.suit!r})"
+
+    def __hash__(self):
+
+        return self.index
+
+    def __lt__(self, other: Card) -> bool:
+
+        if not isinstance(other, Card):
+            return NotImplemented
+
+        return self.index < other.index
+
+    def __reduce__(self):
+
+        # unpickling returns the interned instance
+        return (Card.from_index, (self.index,))
+
+    def __copy__(self) -> Card:
+
+        return self
+
+    def __deepcopy__(self, memo) -> Card:
+
+        return self
+
+    @classmethod
+    def from_index(cls, index: int) -> Card:
+
+        return _CARDS[index]
+
+
+def _intern_card(index: int) -> Card:
+
+    card = object.__new__(Card)
+
+    object.__setattr__(card, "value", engine.CARD_VALUES[index])
+    object.__setattr__(card, "suit", engine.SUITS[engine.CARD_SUITS[index]])
+    object.__setattr__(card, "index", index)
+
+    return card
+
+
+_CARDS = tuple(_intern_card(index) for index in range(engine.NUM_CARDS))
+
+# order of a fresh deck before shuffling, by value and then suit
+_NEW_DECK = tuple(Card(value, suit) for value in range(1, 12) for suit in engine.SUITS)
+
 
 class Play:
     def __init__(
@@ -39,44 +117,146 @@ class Play:
 
 
 class Deck:
-    def __init__(self):
-        self.cards = []
+    """Cards still to be drawn are cards[position:], the top card first.
+
+    Drawing moves position forward instead of removing cards from the front
+    of the list, and discards go to the bottom, so both are O(1).
+
+    Args:
+        rng (Optional[engine.RandomSource]): source of the shuffles, seeded from
+            the global random module when not given
+    """
+
+    def __init__(self, rng: Optional[engine.RandomSource] = None):
+
+        self._cards: List[Card] = []
+        self.position = 0
+        self.rng = random.Random(random.getrandbits(64)) if rng is None else rng
 
     def __str__(self):
 
         output = ""
 
         for card in self.cards:
-            output.append(str(card) + "\n")
+            output += str(card) + "\n"
 
         return output
 
-    def create_deck(self) -> None:
+    def __len__(self) -> int:
 
-        cards = []
+        return len(self._cards) - self.position
 
-        for value in range(1, 12):
-            for suit in ["K", "B", "M"]:
-                cards.append(Card(value, suit))
+    @property
+    def cards(self) -> List[Card]:
+        """The cards left in the deck, top card first, as a new list."""
 
-        self.cards = cards
+        return self._cards[self.position :]
+
+    @cards.setter
+    def cards(self, cards: Sequence[Card]) -> None:
+
+        self._cards = list(cards)
+        self.position = 0
+
+    def copy(self, rng: Optional[engine.RandomSource] = None) -> Deck:
+        """Returns a deck with the same cards left, drawing from rng or from a
+        copy of this deck's random state."""
+
+        deck = Deck.__new__(Deck)
+        deck._cards = self._cards[self.position :]
+        deck.position = 0
+        deck.rng = copy.deepcopy(self.rng) if rng is None else rng
+
+        return deck
+
+    def create_deck(self, order: Optional[Sequence[int]] = None) -> None:
+
+        # a given order of card indices reproduces a specific deal
+        if order is not None:
+            self.cards = [_CARDS[index] for index in order]
+            return None
+
+        self.cards = _NEW_DECK
 
     def shuffle_deck(self) -> None:
 
-        random.shuffle(self.cards)
+        cards = self.cards
+
+        if len(cards) == engine.NUM_CARDS:
+            self.cards = [cards[i] for i in engine.shuffled_deck(self.rng)]
+            return None
+
+        # any other size, e.g. a deck set up by hand
+        for i in range(len(cards) - 1, 0, -1):
+            j = engine.random_below(i + 1, self.rng)
+            cards[i], cards[j] = cards[j], cards[i]
+
+        self.cards = cards
 
     def draw_top_n_cards(self, n: int) -> List[Card]:
 
-        drawn_cards: List[Card] = []
+        if n > len(self):
+            raise IndexError("Not enough cards left in the deck")
 
-        while len(drawn_cards) < n:
-            drawn_cards.append(self.cards.pop(0))
+        drawn_cards = self._cards[self.position : self.position + n]
+        self.position += n
 
         return drawn_cards
 
+    def deal(self) -> Tuple[List[Card], List[Card], Card]:
+        """Draws both hands of 13 cards and the decree card in one go."""
+
+        start = self.position
+        cards = self._cards
+
+        if len(self) < 27:
+            raise IndexError("Not enough cards left in the deck")
+
+        self.position += 27
+
+        return (
+            cards[start : start + 13],
+            cards[start + 13 : start + 26],
+            cards[start + 26],
+        )
+
+    def put_bottom(self, card: Card) -> None:
+
+        self._cards.append(card)
+
+    def take_bottom(self) -> Card:
+        """Takes back the card put at the bottom last, to undo a discard."""
+
+        return self._cards.pop()
+
+    def return_top(self, card: Card) -> None:
+        """Puts a drawn card back on top of the deck, to undo a draw."""
+
+        if self.position == 0:
+            self._cards.insert(0, card)
+            return None
+
+        self.position -= 1
+        self._cards[self.position] = card
+
 
 class Game:
-    def __init__(self, player1: Player, player2: Player):
+    """A round of fox in the forest between two players.
+
+    Args:
+        player1 (Player): player leading the first trick
+        player2 (Player): the other player
+        rng (Optional[engine.RandomSource]): source of the shuffles, seeded from
+            the global random module when not given
+    """
+
+    def __init__(
+        self,
+        player1: Player,
+        player2: Player,
+        rng: Optional[engine.RandomSource] = None,
+    ):
+        self.rng = random.Random(random.getrandbits(64)) if rng is None else rng
         self.turns = 0
         self.deck: Deck
         self.player1 = player1
@@ -90,27 +270,138 @@ class Game:
 
         self.played_tricks: List[List[Card]] = []
 
-    def setup_game(self):
+        # trick record of who played each card, parallel to current_trick_cards
+        # and played_tricks
+        self.current_trick_players: List[Player] = []
+        self.played_trick_players: List[List[Player]] = []
+        self.wait_for_discard = False
+
+        # the card order dealt from and every engine action taken since, enough
+        # to replay the round, see records
+        self.deal_order: List[int] = []
+        self.action_log: List[int] = []
+
+        # undo records of the moves made with push()
+        self._pushed: List[tuple] = []
+
+        # callables receiving the events of the rounds played, see events
+        self.listeners: List[events.Listener] = []
+
+        # Zobrist hash of the round being played, the hash of to_state(),
+        # kept up to date by every play, discard, trick and change of turn
+        self.zobrist = 0
+
+    def clone(self) -> Game:
+        """Returns an independent copy of the round being played, including
+        copies of both players. Cards are immutable and shared."""
+
+        game = Game.__new__(Game)
+
+        player1 = self.player1.clone()
+        player2 = player1 if self.player2 is self.player1 else self.player2.clone()
+        players = {id(self.player1): player1, id(self.player2): player2}
+
+        game.turns = self.turns
+        game.player1 = player1
+        game.player2 = player2
+        game.player_turn = players[id(self.player_turn)]
+        game.round_done = self.round_done
+        game.played_tricks = list(self.played_tricks)
+        game.current_trick_cards = list(self.current_trick_cards)
+        game.current_trick_players = [
+            players[id(player)] for player in self.current_trick_players
+        ]
+        game.played_trick_players = [
+            [players[id(player)] for player in trick]
+            for trick in self.played_trick_players
+        ]
+        game.wait_for_discard = self.wait_for_discard
+        game.deal_order = self.deal_order
+        game.action_log = list(self.action_log)
+        game._pushed = []
+        game.listeners = []
+        game.zobrist = self.zobrist
+
+        game.rng = copy.deepcopy(self.rng)
+
+        if hasattr(self, "deck"):
+            game.deck = self.deck.copy(game.rng if self.deck.rng is self.rng else None)
+
+        if hasattr(self, "decree_card"):
+            game.decree_card = self.decree_card
+
+        return game
+
+    def enable_profiling(
+        self, profiler: Optional[profiling.Profiler] = None
+    ) -> profiling.Profiler:
+        """Starts counting and timing the phases of every round and the
+        decisions of both players, see profiling.Profiler."""
+
+        if profiler is None:
+            profiler = profiling.Profiler()
+
+        profiling.instrument(self, profiler)
+
+        return profiler
+
+    def disable_profiling(self) -> None:
+
+        profiling.uninstrument(self)
+
+    def subscribe(self, listener: events.Listener) -> events.Listener:
+        """Sends every event of the rounds played from now on to listener.
+
+        Events are only built while there are listeners, so a Game nobody
+        listens to does not pay for them. pop() emits no events.
+        """
+
+        self.listeners.append(listener)
+
+        return listener
+
+    def unsubscribe(self, listener: events.Listener) -> None:
+
+        self.listeners.remove(listener)
+
+    def emit(self, event: events.Event) -> None:
+
+        for listener in self.listeners:
+            listener(event)
 
-        self.deck = Deck()
-        self.deck.create_deck()
-        self.deck.shuffle_deck()
+    def setup_game(self, order: Optional[Sequence[int]] = None):
+
+        self.deck = Deck(self.rng)
+
+        if order is None:
+            self.deck.create_deck()
+            self.deck.shuffle_deck()
+        else:
+            self.deck.create_deck(order)
+
+        self.deal_order = [card.index for card in self.deck.cards]
+        self.action_log = []
 
         self.current_trick_cards = []
+        self.played_tricks = []
+        self.current_trick_players = []
+        self.played_trick_players = []
 
         # define players and deal cards
         self.player1.hand = []
         self.player2.hand = []
         self.player1.tricks_won = []
         self.player2.tricks_won = []
-        self.player1.add_to_hand(self.deck.draw_top_n_cards(13))
-        self.player2.add_to_hand(self.deck.draw_top_n_cards(13))
+        hand1, hand2, decree_card = self.deck.deal()
+
+        self.player1.add_to_hand(hand1)
+        self.player2.add_to_hand(hand2)
 
         self.player1.sort_hand()
         self.player2.sort_hand()
 
         # assign top card as suit card
-        self.decree_card = self.deck.draw_top_n_cards(1)[0]
+        self.decree_card = decree_card
 
         # set whose turn it is
         self.player_turn = self.player1
@@ -122,8 +413,26 @@ class Game:
         # initiate round
         self.round_done = False
 
+        self.zobrist = (
+            engine.hand_hash(0, self.player1.hand.mask)
+            ^ engine.hand_hash(1, self.player2.hand.mask)
+            ^ engine.ZOBRIST_DECREE[decree_card.index]
+            ^ engine.deck_hash([card.index for card in self.deck.cards])
+        )
+
+        if self.listeners:
+            self.emit(
+                events.RoundStarted(
+                    (self.player1, self.player2),
+                    (tuple(self.player1.hand), tuple(self.player2.hand)),
+                    decree_card,
+                )
+            )
+
     def change_turn(self) -> Player:
 
+        self.zobrist ^= engine.ZOBRIST_TURN
+
         if self.player_turn == self.player1:
 
             self.player_turn = self.player2
@@ -133,53 +442,106 @@ class Game:
             self.player_turn = self.player1
             return self.player1
 
-    def is_valid_play(self, play: Play) -> bool:
-
-        card = play.card
-        hand = play.player.hand
-        player = play.player
+    def legal_moves_mask(self, player: Player) -> int:
 
-        # check it is the turn of the player
+        # no card may be played out of turn
         if self.player_turn != player:
-            return False
+            return 0
 
-        # check card is in the hand of the player
-        if card not in hand:
-            return False
+        if len(self.current_trick_cards) == 0:
+            lead = engine.NO_CARD
+        else:
+            lead = self.current_trick_cards[0].index
 
-        # check if a 3 is played and ability used, that that card is in hand player
-        if card.value == 3 and play.use_ability == True:
+        return engine.legal_moves(player.hand.mask, lead)
 
-            if (play.ability_card not in hand) or (play.ability_card == play.card):
-                return False
+    def legal_actions(self) -> int:
+        """Returns the mask of legal engine actions of the player whose turn it
+        is, including every exchange a 3 can make and the discards after a 5."""
 
-        # if this is the first card to be played
         if len(self.current_trick_cards) == 0:
+            lead = engine.NO_CARD
+        else:
+            lead = self.current_trick_cards[0].index
+
+        return engine.legal_actions(
+            self.player_turn.hand.mask, lead, self.wait_for_discard
+        )
+
+    def action_to_play(self, action: int) -> Play:
+
+        card, ability_card = engine.action_to_move(action)
+
+        if ability_card >= 0:
+            return Play(
+                self.player_turn,
+                _CARDS[card],
+                use_ability=True,
+                ability_card=_CARDS[ability_card],
+            )
+
+        return Play(self.player_turn, _CARDS[card])
+
+    def request_action(self) -> int:
+        """Asks the player whose turn it is for its play, or for its discard
+        after a 5, and returns it as an engine action without executing it."""
+
+        player = self.player_turn
+
+        if self.wait_for_discard:
+            return engine.DISCARD_OFFSET + player.request_discard(self).index
 
-            return True
+        play = player.request_play(self)
 
-        # if second card to be played
+        if play.card.value == 3 and play.use_ability:
+            return engine.move_to_action((play.card.index, play.ability_card.index))
+
+        return play.card.index
+
+    def apply_action(self, action: int) -> Optional[Player]:
+        """Executes an engine action of the player whose turn it is and finishes
+        the trick once both cards are down.
+
+        Returns:
+            Optional[Player]: winner of the trick, if the action completed one
+        """
+
+        if not self.legal_actions() >> action & 1:
+            raise InvalidPlay("Proposed action is not valid")
+
+        play = self.action_to_play(action)
+
+        if self.wait_for_discard:
+            self.execute_discard(play)
         else:
+            self.execute_play(play)
 
-            # if suit matches first card play is valid
-            if self.current_trick_cards[0].suit == card.suit:
+        if not self.wait_for_discard and len(self.current_trick_cards) == 2:
+            return self.finish_trick()
 
-                # exception: if 11 was played, check it is 1 or highest
-                if self.current_trick_cards[0].value == 11:
+        return None
 
-                    # check value is 1 or no higher card exists in hand
-                    if card.value != 1 and not all(
-                        card.suit != x.suit or card.value >= x.value for x in hand
-                    ):
+    def is_valid_play(self, play: Play) -> bool:
 
-                        return False
+        card = play.card
+        hand = play.player.hand.mask
 
-                return True
+        # check it is the turn of the player and the card may be played
+        if not self.legal_moves_mask(play.player) >> card.index & 1:
+            return False
 
-            # if not, verify no suit matching first card in hand
-            else:
+        # check if a 3 is played and ability used, that that card is in hand player
+        if card.value == 3 and play.use_ability == True:
 
-                return self.current_trick_cards[0].suit not in [x.suit for x in hand]
+            ability_card = play.ability_card
+
+            if ability_card is None or ability_card.index == card.index:
+                return False
+
+            if not hand >> ability_card.index & 1:
+                return False
+
+        return True
 
     def execute_play(self, play: Play) -> None:
 
@@ -187,25 +549,73 @@ class Game:
 
             raise InvalidPlay("Proposed Play is not valid")
 
-        setattr(play.card, "played_by", play.player)
+        ability_index = engine.NO_CARD
+        if play.card.value == 3 and play.use_ability:
+            ability_index = play.ability_card.index
+
+        self.action_log.append(engine.move_to_action((play.card.index, ability_index)))
+
+        seat = 0 if play.player is self.player1 else 1
+        index = play.card.index
+
+        self.zobrist ^= engine.ZOBRIST_HANDS[seat][index] ^ (
+            engine.ZOBRIST_FOLLOW[index]
+            if self.current_trick_cards
+            else engine.ZOBRIST_LEAD[index]
+        )
 
         self.current_trick_cards.append(play.card)
+        self.current_trick_players.append(play.player)
         play.player.hand.remove(play.card)
 
+        if self.listeners:
+            self.emit(events.CardPlayed(play.player, play.card))
+
         # if 3 played and ability used, exhange decree card with ability card
         if play.card.value == 3 and play.use_ability:
 
             assert type(play.ability_card) == Card
-            play.player.add_to_hand([self.decree_card])
+            old_decree_card = self.decree_card
+            play.player.add_to_hand([old_decree_card])
             self.decree_card = play.ability_card
             play.player.hand.remove(play.ability_card)
 
+            self.zobrist ^= (
+                engine.ZOBRIST_HANDS[seat][old_decree_card.index]
+                ^ engine.ZOBRIST_HANDS[seat][play.ability_card.index]
+                ^ engine.ZOBRIST_DECREE[old_decree_card.index]
+                ^ engine.ZOBRIST_DECREE[play.ability_card.index]
+            )
+
+            if self.listeners:
+                self.emit(
+                    events.AbilityUsed(
+                        play.player, play.card, old_decree_card, play.ability_card
+                    )
+                )
+
         # if 5 is played, add card to hand player and request_discard
         if play.card.value == 5:
 
-            play.player.add_to_hand(self.deck.draw_top_n_cards(1))
+            drawn = self.deck.draw_top_n_cards(1)
+            play.player.add_to_hand(drawn)
+
+            key = (
+                engine.ZOBRIST_HANDS[seat][drawn[0].index]
+                ^ engine.ZOBRIST_DECK[0][drawn[0].index]
+                ^ engine.ZOBRIST_PENDING
+            )
 
-            # TODO set to false again in next block
+            # the cards left in the deck move up one position
+            for position, card in enumerate(self.deck.cards):
+                key ^= engine.ZOBRIST_DRAW[position][card.index]
+
+            self.zobrist ^= key
+
+            if self.listeners:
+                self.emit(events.AbilityUsed(play.player, play.card, drawn[0]))
+
+            # execute_discard clears it again
             self.wait_for_discard = True
 
             return None
@@ -223,7 +633,19 @@ class Game:
 
         play.player.hand.remove(play.card)
 
-        self.deck.cards.append(play.card)
+        self.zobrist ^= (
+            engine.ZOBRIST_HANDS[0 if play.player is self.player1 else 1][
+                play.card.index
+            ]
+            ^ engine.ZOBRIST_DECK[len(self.deck)][play.card.index]
+            ^ engine.ZOBRIST_PENDING
+        )
+
+        self.deck.put_bottom(play.card)
+        self.action_log.append(engine.DISCARD_OFFSET + play.card.index)
+
+        if self.listeners:
+            self.emit(events.CardDiscarded(play.player, play.card))
 
         self.wait_for_discard = False
 
@@ -236,233 +658,321 @@ class Game:
         card_1 = self.current_trick_cards[0]
         card_2 = self.current_trick_cards[1]
 
-        assert isinstance(card_1.played_by, Player)
-        assert isinstance(card_2.played_by, Player)
-
-        trump_suit = self.decree_card.suit
-
-        # if only one 9 is played, counts as trump
-        if card_1.value == 9 and card_2.value != 9:
-            # other card also trump suit, highest wins
-            if card_2.suit == trump_suit:
-                if card_1.value > card_2.value:
-                    return card_1.played_by
-                else:
-                    return card_2.played_by
-            else:
-                return card_1.played_by
-
-        if card_1.value != 9 and card_2.value == 9:
-            # other card also trump suit, highest wins
-            if card_1.suit == trump_suit:
-                if card_1.value > card_2.value:
-                    return card_1.played_by
-                else:
-                    return card_2.played_by
-            else:
-                return card_2.played_by
-
-        # if equal suit, highest wins
-        if card_1.suit == card_2.suit:
-            if card_1.value > card_2.value:
-                return card_1.played_by
-            else:
-                return card_2.played_by
+        trump_suit = engine.SUIT_INDEX[self.decree_card.suit]
 
-        # if card 2 is trump it wins
-        if card_2.suit == self.decree_card.suit:
-            return card_2.played_by
+        winner = engine.TRICK_WINNER[card_1.index][card_2.index][trump_suit]
 
-        # else first card played wins, since suit was not matched
-        return card_1.played_by
+        return self.current_trick_players[winner]
 
     def determine_points_end_round(self) -> List[int]:
 
         # count sevens won by each player
-        p1_points = sum(
-            1 for hand in self.player2.tricks_won for card in hand if card.value == 7
+        p1_sevens = sum(
+            1 for hand in self.player1.tricks_won for card in hand if card.value == 7
         )
-        p2_points = sum(
+        p2_sevens = sum(
             1 for hand in self.player2.tricks_won for card in hand if card.value == 7
         )
 
-        trick_points = {
-            0: [6, 0],
-            1: [6, 0],
-            2: [6, 0],
-            3: [6, 0],
-            4: [1, 6],
-            5: [2, 6],
-            6: [3, 6],
-            7: [6, 3],
-            8: [6, 2],
-            9: [6, 1],
-            10: [0, 6],
-            11: [0, 6],
-            12: [0, 6],
-            13: [0, 6],
-        }
-
         p1_tricks = len(self.player1.tricks_won)
 
-        end_of_round_points = trick_points[p1_tricks]
-
-        p1_points = p1_points + end_of_round_points[0]
-        p2_points = p2_points + end_of_round_points[1]
+        return engine.round_points(p1_tricks, p1_sevens, p2_sevens)
+
+    def to_state(self) -> engine.GameState:
+        """Exports the round being played to the compact engine state."""
+
+        state = engine.GameState()
+
+        state.hands = [self.player1.hand.mask, self.player2.hand.mask]
+        state.deck = [card.index for card in self.deck.cards]
+        state.decree = self.decree_card.index
+        state.turn = 0 if self.player_turn == self.player1 else 1
+        state.pending_discard = self.wait_for_discard
+        state.tricks = [len(self.player1.tricks_won), len(self.player2.tricks_won)]
+        state.sevens = [
+            sum(1 for trick in player.tricks_won for card in trick if card.value == 7)
+            for player in (self.player1, self.player2)
+        ]
+        state.turns = self.turns
+
+        # finish_trick hands the winner the very list kept in played_tricks
+        won_by_player1 = {id(trick) for trick in self.player1.tricks_won}
+
+        for trick, players in zip(self.played_tricks, self.played_trick_players):
+
+            lead, follow = trick
+            state.played |= 1 << lead.index | 1 << follow.index
+            state.history.append(
+                (
+                    0 if players[0] is self.player1 else 1,
+                    lead.index,
+                    follow.index,
+                    0 if id(trick) in won_by_player1 else 1,
+                )
+            )
 
-        return [p1_points, p2_points]
+        for position, card in enumerate(self.current_trick_cards):
 
-    def play_game(self) -> None:
-        def print_hand(hand: List[Card]):
+            state.trick |= 1 << card.index
+            state.played |= 1 << card.index
 
-            string = ""
-            for card in hand:
-                string = string + str(card.value) + " " + card.suit + ", "
-            print(string)
+            if position == 0:
+                state.lead = card.index
+                leader = self.current_trick_players[0]
+                state.leader = 0 if leader == self.player1 else 1
+            else:
+                state.follow = card.index
 
-        self.setup_game()
+        state.rehash()
 
-        print(
-            "Decree card is: "
-            + str(self.decree_card.value)
-            + str(self.decree_card.suit)
-        )
+        return state
 
-        print("Player 1 hand:")
-        print_hand(self.player1.hand)
+    def play_turn(self) -> Play:
+        """Requests and executes the play of the player whose turn it is,
+        including the discard after a 5."""
 
-        print("Player 2 hand:")
-        print_hand(self.player2.hand)
+        play = self.player_turn.request_play(self)
+        self.execute_play(play)
 
-        while self.turns < 13:
+        # if 5 was played, request discard
+        if self.wait_for_discard == True:
+            card_to_discard = play.player.request_discard(self)
+            discard_play = Play(play.player, card_to_discard)
+            self.execute_discard(discard_play)
 
-            # both players make their turns
-            play1 = self.player_turn.request_play(self)
-            self.execute_play(play1)
+        return play
 
-            if self.wait_for_discard == True:
-                card_to_discard = play1.player.request_discard(self)
-                discard_play = Play(play1.player, card_to_discard)
-                self.execute_discard(discard_play)
+    def push(self, play: Play) -> None:
+        """Executes a play, or the discard when one is pending, and finishes the
+        trick once both cards are down. Every push can be reversed by pop(),
+        so a search can walk the game tree in place."""
 
-            print(
-                f"Player {play1.player.name} plays: {play1.card.value} {play1.card.suit}"
-            )
+        player = play.player
+        card = play.card
+        hand = player.hand
 
-            play2 = self.player_turn.request_play(self)
-            self.execute_play(play2)
+        position = hand.index(card)
+        ability_position = -1
 
-            if self.wait_for_discard == True:
-                card_to_discard = play2.player.request_discard(self)
-                discard_play = Play(play2.player, card_to_discard)
-                self.execute_discard(discard_play)
+        record = (
+            self.player_turn,
+            self.wait_for_discard,
+            self.decree_card,
+            self.round_done,
+            self.zobrist,
+        )
 
-            print(
-                f"Player {play2.player.name} plays: {play2.card.value} {play2.card.suit}"
-            )
+        if self.wait_for_discard:
 
-            # winner is determined
-            winner = self.determine_trick_winner()
+            self.execute_discard(play)
+            discarded = True
 
-            print(f"Winner is: {winner.name}")
+        else:
 
-            # cards added to hand and turn given to winner
-            self.played_tricks.append(self.current_trick_cards)
-            winner.add_to_tricks_won(self.current_trick_cards)
+            if card.value == 3 and play.use_ability:
+                ability_position = hand.index(play.ability_card)
 
-            self.player_turn = winner
+            self.execute_play(play)
+            discarded = False
 
-            # unless 1 was played but did not win trick
-            for card in self.current_trick_cards:
-                assert isinstance(card.played_by, Player)
-                if card.value == 1 and card.played_by != winner:
-                    self.player_turn = card.played_by
+        trick = None
 
-            self.current_trick_cards = []
+        if not self.wait_for_discard and len(self.current_trick_cards) == 2:
+            trick = (
+                self.current_trick_cards,
+                self.current_trick_players,
+                self.finish_trick(),
+            )
 
-            self.turns += 1
+        self._pushed.append(
+            (play, position, ability_position, discarded, trick) + record
+        )
 
-        self.round_done = True
+    def pop(self) -> Play:
+        """Reverses the last push() and returns its play."""
 
-        print(f"Player 1 won {len(self.player1.tricks_won)} tricks")
-        print(f"Player 2 won {len(self.player2.tricks_won)} tricks")
+        (
+            play,
+            position,
+            ability_position,
+            discarded,
+            trick,
+            player_turn,
+            wait_for_discard,
+            decree_card,
+            round_done,
+            zobrist,
+        ) = self._pushed.pop()
 
-        print(f"Final points {self.determine_points_end_round()}")
+        self.action_log.pop()
 
-    def step(self, play: Play) -> None:
-        """Steps through one round of play,
-        executing the passed Play, until it is player1's turn again.
-        In this way it is possible to play a game using direct function calls as input from the player
+        player = play.player
+        card = play.card
+        hand = player.hand
 
-        Args:
-            play (Play): _description_
-        """
+        if trick is not None:
+            self.current_trick_cards, self.current_trick_players, winner = trick
+            winner.tricks_won.pop()
+            self.played_tricks.pop()
+            self.played_trick_players.pop()
+            self.turns -= 1
 
-        # if waiting for discard from player execute discard and return
-        if self.wait_for_discard == True:
+        if discarded:
 
-            self.execute_discard(play)
+            self.deck.take_bottom()
 
         else:
 
-            self.execute_play(play)
+            # undo the 5 drawing the top card of the deck
+            if card.value == 5:
+                self.deck.return_top(hand.pop())
 
-            # if waiting for discard, return and wait for next play
-            if self.wait_for_discard == True:
+            # undo the 3 exchanging the decree card, the old decree card was
+            # appended after the played card had been removed
+            if ability_position >= 0:
+                hand.pop()
+                if ability_position > position:
+                    ability_position -= 1
+                hand.insert(ability_position, play.ability_card)
 
-                return None
+            self.current_trick_cards.pop()
+            self.current_trick_players.pop()
 
-        # If this was first card played, player2 needs to play a card
-        if len(self.current_trick_cards) == 1:
+        hand.insert(position, card)
 
-            play2 = self.player_turn.request_play(self)
-            self.execute_play(play2)
+        self.player_turn = player_turn
+        self.wait_for_discard = wait_for_discard
+        self.decree_card = decree_card
+        self.round_done = round_done
+        self.zobrist = zobrist
 
-            # if 5 was played, request discard
-            if self.wait_for_discard == True:
-
-                card_to_discard = self.player_turn.request_discard(self)
-                discard_play = Play(self.player_turn, card_to_discard)
+        return play
 
-                self.execute_discard(discard_play)
+    def finish_trick(self) -> Player:
+        """Hands the completed trick to its winner and gives the turn to the
+        player that leads the next trick."""
 
         # winner is determined
         winner = self.determine_trick_winner()
+        seat = 0 if winner is self.player1 else 1
+        turn_before = self.player_turn
+
+        lead, follow = self.current_trick_cards
+        key = (
+            engine.ZOBRIST_LEAD[lead.index]
+            ^ engine.ZOBRIST_FOLLOW[follow.index]
+            ^ engine.ZOBRIST_WON[seat][len(winner.tricks_won)]
+        )
+
+        sevens = (lead.value == 7) + (follow.value == 7)
+        if sevens:
+            won = sum(card.value == 7 for trick in winner.tricks_won for card in trick)
+            key ^= (
+                engine.ZOBRIST_SEVENS[seat][won]
+                ^ engine.ZOBRIST_SEVENS[seat][won + sevens]
+            )
 
         # cards added to hand and turn given to winner
         self.played_tricks.append(self.current_trick_cards)
+        self.played_trick_players.append(self.current_trick_players)
         winner.add_to_tricks_won(self.current_trick_cards)
 
         self.player_turn = winner
 
         # unless 1 was played but did not win trick
-        for card in self.current_trick_cards:
-            assert isinstance(card.played_by, Player)
-            if card.value == 1 and card.played_by != winner:
-                self.player_turn = card.played_by
+        for card, player in zip(self.current_trick_cards, self.current_trick_players):
+            if card.value == 1 and player != winner:
+                self.player_turn = player
+
+        if self.player_turn is not turn_before:
+            key ^= engine.ZOBRIST_TURN
+
+        self.zobrist ^= key
+
+        if self.listeners:
+            self.emit(
+                events.TrickWon(
+                    winner,
+                    tuple(self.current_trick_cards),
+                    tuple(self.current_trick_players),
+                )
+            )
 
         self.current_trick_cards = []
+        self.current_trick_players = []
 
         self.turns += 1
 
-        # If it is player2's turn, make them play the first card
+        if self.turns >= 13:
+            self.round_done = True
 
-        if self.player_turn == self.player2 and self.turns < 13:
+            if self.listeners:
+                self.emit(
+                    events.RoundScored(
+                        tuple(self.determine_points_end_round()),  # type: ignore
+                        (len(self.player1.tricks_won), len(self.player2.tricks_won)),
+                    )
+                )
+
+        return winner
+
+    def play_game(self, verbose: bool = True) -> None:
+        """Plays a round, printing it as it is played when verbose."""
+
+        renderer = self.subscribe(events.ConsoleRenderer()) if verbose else None
+
+        try:
+
+            self.setup_game()
+
+            while self.turns < 13:
 
-            play2 = self.player2.request_play(self)
-            self.execute_play(play2)
+                # both players make their turns
+                self.play_turn()
+                self.play_turn()
 
-            # if 5 was played, request discard
+                self.finish_trick()
+
+        finally:
+
+            if renderer is not None:
+                self.unsubscribe(renderer)
+
+    def step(self, play: Play) -> None:
+        """Steps through one round of play,
+        executing the passed Play, until it is player1's turn again.
+        In this way it is possible to play a game using direct function calls as input from the player
+
+        Args:
+            play (Play): _description_
+        """
+
+        # if waiting for discard from player execute discard and return
+        if self.wait_for_discard == True:
+
+            self.execute_discard(play)
+
+        else:
+
+            self.execute_play(play)
+
+            # if waiting for discard, return and wait for next play
             if self.wait_for_discard == True:
 
-                card_to_discard = self.player_turn.request_discard(self)
-                discard_play = Play(self.player_turn, card_to_discard)
+                return None
+
+        # If this was first card played, player2 needs to play a card
+        if len(self.current_trick_cards) == 1:
 
-                self.execute_discard(discard_play)
+            self.play_turn()
 
-        if self.turns >= 13:
+        self.finish_trick()
 
-            self.round_done = True
+        # If it is player2's turn, make them play the first card
+
+        if self.player_turn == self.player2 and self.turns < 13:
+
+            self.play_turn()
 
         return None
 
@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import math
+import random
+import time
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from . import engine
+from . import sampler
+from .tablebase import Tablebase
+
+
+def apply_move(state: engine.GameState, move: engine.Move) -> None:
+
+    card, ability_card = move
+
+    if ability_card == engine.DISCARD:
+        state.discard(card)
+    else:
+        state.play(card, ability_card)
+
+
+def playout(
+    state: engine.GameState,
+    rng: random.Random,
+    tablebase: Optional[Tablebase] = None,
+) -> Optional[int]:
+    """Finishes the round with uniformly random plays and discards.
+
+    With a tablebase the playout stops at the first position it holds and
+    returns the exact point difference still to be gained, see tablebase.
+    """
+
+    while state.turns < 13:
+
+        if tablebase is not None and state.lead < 0:
+            value = tablebase.value(state)
+            if value is not None:
+                return value
+
+        if state.pending_discard:
+            state.discard(engine.random_card(state.hands[state.turn], rng))
+        else:
+            state.play(engine.random_card(state.legal_moves(), rng))
+
+    return None
+
+
+def reward(state: engine.GameState, seat: int) -> float:
+    """Maps the point difference of a finished round for seat onto [0, 1]."""
+
+    points = state.points()
+
+    return (points[seat] - points[seat ^ 1] + 9) / 18
+
+
+############
+#
+# Information set
+#
+############
+
+
+class InformationSet(sampler.Sampler):
+    """What one seat knows about a round, used to sample determinizations.
+
+    state is the true state of the round, but only the parts visible to seat
+    are used: the hand and deck cards of the opponent are redrawn from the
+    unknown cards every time determinize() is called, see sampler.Sampler.
+
+    Args:
+        state (engine.GameState): state of the round
+        seat (int): seat of the searching player
+        known_opponent (int): mask of cards known to be in the opponent's hand
+        void_suits (int): mask of the suits the opponent is known to lack
+        known_deck (int): mask of deck cards whose position the seat knows
+        excluded (int): mask of other cards the opponent cannot hold
+    """
+
+    def __init__(
+        self,
+        state: engine.GameState,
+        seat: int,
+        known_opponent: int = 0,
+        void_suits: int = 0,
+        known_deck: int = 0,
+        excluded: int = 0,
+    ):
+
+        for suit in range(len(engine.SUITS)):
+            if void_suits >> suit & 1:
+                excluded |= engine.SUIT_MASKS[suit]
+
+        sampler.Sampler.__init__(
+            self, state, seat, known_opponent, excluded, known_deck
+        )
+
+    def determinize(self, rng: random.Random) -> engine.GameState:
+        """Returns a copy of the state with the hidden cards dealt uniformly
+        among the deals consistent with the information set."""
+
+        return self.draw(rng)
+
+
+############
+#
+# Search
+#
+############
+
+
+class Node:
+
+    __slots__ = ("move", "parent", "seat", "children", "visits", "total", "available")
+
+    def __init__(self, move: Optional[engine.Move], parent: Optional[Node], seat: int):
+
+        self.move = move
+        self.parent = parent
+        # seat that made the move leading to this node
+        self.seat = seat
+        self.children: Dict[engine.Move, Node] = {}
+        self.visits = 0
+        self.total = 0.0
+        self.available = 1
+
+
+class ISMCTS:
+    """Single observer information set Monte Carlo tree search.
+
+    Every iteration samples a determinization, descends the tree with UCB over
+    the moves legal in that determinization, expands one move and finishes the
+    round with a random playout. Discards of the opponent are hidden, so they
+    are sampled at random instead of being part of the tree.
+
+    The tree is kept between calls: advance() moves the root along the moves
+    played since the last search, so statistics gathered earlier are reused.
+
+    Args:
+        iterations (int): playouts per search
+        time_limit (Optional[float]): seconds per search, stops before the
+            iterations are used up when given
+        exploration (float): UCB exploration constant
+        rng (Optional[random.Random]): source of randomness
+        tablebase (Optional[Tablebase]): ends playouts at its horizon with
+            the exact value
+    """
+
+    def __init__(
+        self,
+        iterations: int = 1000,
+        time_limit: Optional[float] = None,
+        exploration: float = 0.7,
+        rng: Optional[random.Random] = None,
+        tablebase: Optional[Tablebase] = None,
+    ):
+
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.rng = random.Random() if rng is None else rng
+        self.tablebase = tablebase
+        self.root: Optional[Node] = None
+
+    def reset(self) -> None:
+
+        self.root = None
+
+    def advance(self, move: engine.Move) -> None:
+        """Moves the root to the child reached by move, or drops the tree if
+        that move was never explored."""
+
+        if self.root is not None:
+            self.root = self.root.children.get(move)
+
+        if self.root is not None:
+            self.root.parent = None
+
+    def search(self, information: InformationSet) -> engine.Move:
+
+        moves = information.state.moves()
+
+        if self.root is None:
+            self.root = Node(None, None, information.seat ^ 1)
+
+        if len(moves) == 1:
+            return moves[0]
+
+        deadline = None
+        if self.time_limit is not None:
+            deadline = time.perf_counter() + self.time_limit
+
+        for iteration in range(self.iterations):
+
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            self._iterate(information)
+
+        children = [
+            self.root.children[move] for move in moves if move in self.root.children
+        ]
+
+        if not children:
+            return self.rng.choice(moves)
+
+        return max(children, key=lambda child: child.visits).move  # type: ignore
+
+    def _iterate(self, information: InformationSet) -> None:
+
+        rng = self.rng
+        seat = information.seat
+        determinization = information.determinize(rng)
+
+        node = self.root
+        assert node is not None
+
+        # selection and expansion
+        while determinization.turns < 13:
+
+            # the opponent's discard is hidden and sampled outside the tree
+            if determinization.pending_discard and determinization.turn != seat:
+                hand = determinization.hands[determinization.turn]
+                determinization.discard(engine.random_card(hand, rng))
+                continue
+
+            moves = determinization.moves()
+            children = node.children
+            untried = []
+
+            # every child legal in this determinization was available to
+            # choose, whether or not it is chosen or the node is expanded
+            for move in moves:
+                child = children.get(move)
+                if child is None:
+                    untried.append(move)
+                else:
+                    child.available += 1
+
+            if untried:
+                move = untried[int(rng.random() * len(untried))]
+                child = Node(move, node, determinization.turn)
+                node.children[move] = child
+                apply_move(determinization, move)
+                node = child
+                break
+
+            best = None
+            best_value = -1.0
+            log_weight = self.exploration
+
+            for move in moves:
+
+                child = children[move]
+                value = child.total / child.visits + log_weight * math.sqrt(
+                    math.log(child.available) / child.visits
+                )
+
+                if value > best_value:
+                    best = child
+                    best_value = value
+
+            assert best is not None
+            apply_move(determinization, best.move)  # type: ignore
+            node = best
+
+        remaining = playout(determinization, rng, self.tablebase)
+
+        if remaining is None:
+            rewards = (reward(determinization, 0), reward(determinization, 1))
+        else:
+            difference = (
+                determinization.sevens[0] - determinization.sevens[1] + remaining
+            )
+            rewards = ((difference + 9) / 18, (9 - difference) / 18)
+
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            node.total += rewards[node.seat]
+            node = node.parent
+
+
+############
+#
+# Observation of a Game
+#
+############
+
+
+class Observer:
+    """Keeps track of what one player learns from the public course of a
+    Game, see sampler.Knowledge: voids of the opponent and what it reveals
+    answering an 11, cards it took with a 3, and the deck cards the player put
+    back itself."""
+
+    def __init__(self):
+
+        self.reset()
+
+    def reset(self) -> None:
+
+        self.new_round = True
+        self.plays_seen = 0
+        self.decree = engine.NO_CARD
+        self.knowledge = sampler.Knowledge(0)
+        self.opponent_moves: List[engine.Move] = []
+
+    def observe(self, game, player) -> InformationSet:
+
+        state = game.to_state()
+        seat = 0 if game.player1 is player else 1
+
+        plays = [
+            (card, played_by)
+            for cards, players in zip(game.played_tricks, game.played_trick_players)
+            for card, played_by in zip(cards, players)
+        ]
+        plays.extend(zip(game.current_trick_cards, game.current_trick_players))
+
+        # a new round started since the last call
+        if len(plays) < self.plays_seen or self.decree == engine.NO_CARD:
+            self.reset()
+            self.decree = game.deal_order[26]
+        else:
+            self.new_round = False
+
+        # the exchanges made with a 3 are public, the log holds them in the
+        # order of the plays, between the hidden discards
+        moves = [
+            engine.action_to_move(action)
+            for action in game.action_log
+            if action < engine.DISCARD_OFFSET
+        ]
+
+        knowledge = self.knowledge
+        knowledge.seat = seat
+        self.opponent_moves = []
+
+        for position in range(self.plays_seen, len(plays)):
+
+            card, played_by = plays[position]
+            ability_card = moves[position][1]
+
+            # the decree card at the time of the play, which a 3 takes
+            taken = engine.NO_CARD
+            if ability_card >= 0:
+                taken = self.decree
+                self.decree = ability_card
+
+            if played_by is player:
+                continue
+
+            index = card.index
+
+            # plays alternate between leading and following a trick
+            lead = plays[position - 1][0].index if position % 2 else engine.NO_CARD
+
+            knowledge.opponent_played(index, lead, taken)
+
+            # a 5 draws a card unknown to the player
+            if card.value == 5:
+                knowledge.drawn(seat ^ 1)
+
+            self.opponent_moves.append((index, ability_card))
+
+        self.plays_seen = len(plays)
+
+        # own discards that left the deck were drawn by the opponent
+        in_deck = engine.cards_to_mask(state.deck[state.deck_pos :])
+        drawn = knowledge.known_deck & ~in_deck & ~state.hands[seat] & ~state.played
+        knowledge.known_opponent |= drawn
+        knowledge.known_deck &= ~drawn
+
+        return InformationSet(
+            state,
+            seat,
+            knowledge.known_opponent,
+            known_deck=knowledge.known_deck,
+            excluded=knowledge.excluded,
+        )
+
+    def record_own(self, move: engine.Move) -> None:
+
+        card, ability_card = move
+
+        if ability_card == engine.DISCARD:
+            self.knowledge.own_discard(card)
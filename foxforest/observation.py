@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+import foxforest.game as game
+from . import engine
+
+
+############
+#
+# Feature layout
+#
+############
+
+# every observation is a row of NUM_FEATURES values, seen from one seat:
+#   HAND             cards in hand
+#   OWN_PLAYED       cards played by the seat
+#   OPPONENT_PLAYED  cards played by the opponent
+#   TRICK            cards in the current trick
+#   DECREE           the decree card
+#   VOIDS            suits the opponent is known to lack
+#   TURNS            tricks played, divided by 13
+#   TRICKS           tricks won by the seat, divided by 13
+#   OPPONENT_TRICKS  tricks won by the opponent, divided by 13
+
+HAND = slice(0, 33)
+OWN_PLAYED = slice(33, 66)
+OPPONENT_PLAYED = slice(66, 99)
+TRICK = slice(99, 132)
+DECREE = slice(132, 165)
+VOIDS = slice(165, 168)
+TURNS = 168
+TRICKS = 169
+OPPONENT_TRICKS = 170
+
+NUM_FEATURES = 171
+
+# the card features, 5 blocks of 33 columns
+_CARD_BLOCKS = 5
+
+_SHIFTS = np.arange(engine.NUM_CARDS, dtype=np.uint64)
+_SUIT_SHIFTS = np.arange(len(engine.SUITS), dtype=np.uint64)
+
+# cards that end what is known about the suits held: a 5 draws an unknown
+# card and a 3 may take the decree card, see observe
+_REVEALING = engine.VALUE_MASKS[3] | engine.VALUE_MASKS[5]
+
+
+def observe(state: engine.GameState, seat: int) -> Tuple[int, ...]:
+    """Collects the raw observation of seat: the card masks of HAND,
+    OWN_PLAYED, OPPONENT_PLAYED, TRICK and DECREE, followed by the void mask,
+    the tricks played and the tricks won by seat and by the opponent.
+
+    A card of the opponent that does not follow the suit led reveals a void,
+    until the opponent plays a 3 or a 5. This is deliberately more
+    conservative than sampler.Knowledge, which tracks the exact cards a
+    player cannot hold: the state does not record whether a 3 exchanged the
+    decree card, so every 3 is taken to have done so, and the card a 5 draws
+    is unknown to the seat.
+    """
+
+    played = [0, 0]
+    voids = 0
+    opponent = seat ^ 1
+    card_suits = engine.CARD_SUITS
+
+    tricks = state.history
+    if state.follow >= 0:
+        tricks = tricks + [(state.leader, state.lead, state.follow, 0)]
+
+    for leader, lead, follow, _ in tricks:
+
+        played[leader] |= 1 << lead
+        played[leader ^ 1] |= 1 << follow
+
+        if leader == opponent:
+            if _REVEALING >> lead & 1:
+                voids = 0
+        else:
+            if card_suits[follow] != card_suits[lead]:
+                voids |= 1 << card_suits[lead]
+            if _REVEALING >> follow & 1:
+                voids = 0
+
+    if state.lead >= 0 and state.follow < 0:
+        played[state.leader] |= 1 << state.lead
+        if state.leader == opponent and _REVEALING >> state.lead & 1:
+            voids = 0
+
+    return (
+        state.hands[seat],
+        played[seat],
+        played[opponent],
+        state.trick,
+        1 << state.decree,
+        voids,
+        state.turns,
+        state.tricks[seat],
+        state.tricks[opponent],
+    )
+
+
+def opponent_voids(state: engine.GameState, seat: int) -> int:
+    """Returns the mask of suits the opponent of seat is known to lack."""
+
+    return observe(state, seat)[5]
+
+
+############
+#
+# Encoder
+#
+############
+
+
+class ObservationEncoder:
+    """Encodes observations of many rounds into one (N, NUM_FEATURES) matrix.
+
+    All intermediate buffers are allocated once for capacity rows, so repeated
+    calls only spend time on gathering the masks of every state and a handful
+    of vectorized bit expansions.
+
+    Args:
+        capacity (int): rows of the buffers, grown when a larger batch arrives
+        dtype (npt.DTypeLike): type of the observation matrix
+        normalize (bool): divide the trick counts by 13, without it they are
+            kept as counts so observations fit in small integer types
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        dtype: npt.DTypeLike = np.float32,
+        normalize: bool = True,
+    ):
+
+        self.dtype = dtype
+        self.normalize = normalize
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+
+        self.capacity = capacity
+        self.out = np.zeros((capacity, NUM_FEATURES), dtype=self.dtype)
+        self._raw = np.zeros((capacity, 9), dtype=np.uint64)
+        self._bits = np.zeros(
+            (capacity, _CARD_BLOCKS, engine.NUM_CARDS), dtype=np.uint64
+        )
+        self._suits = np.zeros((capacity, len(engine.SUITS)), dtype=np.uint64)
+
+    def encode(
+        self,
+        states: Sequence[engine.GameState],
+        seats: Sequence[int],
+        out: Optional[npt.NDArray] = None,
+    ) -> npt.NDArray:
+        """Writes the observation of seats[i] in states[i] into row i.
+
+        Without out, the rows are written into the buffer of the encoder and
+        the returned view is overwritten by the next call.
+        """
+
+        n = len(states)
+
+        if n > self.capacity:
+            self._allocate(max(n, 2 * self.capacity))
+
+        if out is None:
+            out = self.out[:n]
+
+        raw = self._raw[:n]
+        raw[:] = [observe(state, seat) for state, seat in zip(states, seats)]
+
+        bits = self._bits[:n]
+        np.right_shift(raw[:, :_CARD_BLOCKS, None], _SHIFTS, out=bits)
+        np.bitwise_and(bits, 1, out=bits)
+        out[:, : _CARD_BLOCKS * engine.NUM_CARDS] = bits.reshape(n, -1)
+
+        suits = self._suits[:n]
+        np.right_shift(raw[:, 5, None], _SUIT_SHIFTS, out=suits)
+        np.bitwise_and(suits, 1, out=suits)
+        out[:, VOIDS] = suits
+
+        if self.normalize:
+            np.divide(raw[:, 6:], 13, out=out[:, TURNS:], casting="unsafe")
+        else:
+            out[:, TURNS:] = raw[:, 6:]
+
+        return out
+
+    def encode_game(self, game_being_played: "game.Game", player) -> npt.NDArray:
+        """Returns the observation of player in a Game as a new 1-D array."""
+
+        seat = 0 if game_being_played.player1 is player else 1
+
+        return self.encode([game_being_played.to_state()], [seat])[0].copy()
+
+
+############
+#
+# Decoding
+#
+############
+
+
+def decode_cards(encoded: npt.ArrayLike) -> List[List["game.Card"]]:
+    """Turns an (N, 33) matrix of card indicators, or one row of 33, back into
+    lists of cards ordered by index."""
+
+    encoded = np.asarray(encoded)
+
+    if encoded.ndim == 1:
+        encoded = encoded[None]
+
+    rows, columns = np.nonzero(encoded)
+    counts = np.bincount(rows, minlength=len(encoded)).tolist()
+
+    cards = [game.Card.from_index(index) for index in columns.tolist()]
+
+    decoded = []
+    start = 0
+
+    for count in counts:
+        decoded.append(cards[start : start + count])
+        start += count
+
+    return decoded
@@ -2,14 +2,99 @@ from __future__ import annotations
 
 
 import foxforest.game as game
+import foxforest.engine as engine
+import foxforest.ismcts as ismcts
+import foxforest.observation as observation
+import foxforest.profiling as profiling
+import foxforest.tablebase as tablebase
 
+from typing import Iterable
 from typing import Optional
 from typing import List
+from typing import Tuple
 import numpy as np
 import numpy.typing as npt
+import asyncio
+import copy
 import random
 
 
+class Hand(list):
+    """List of cards that keeps the engine mask of its contents up to date,
+    so rule checks do not need to scan the list."""
+
+    def __init__(self, cards: Iterable["game.Card"] = ()):
+
+        list.__init__(self, cards)
+        self.mask = 0
+
+        for card in self:
+            self.mask |= 1 << card.index
+
+    def _update_mask(self) -> None:
+
+        self.mask = 0
+
+        for card in self:
+            self.mask |= 1 << card.index
+
+    def append(self, card: "game.Card") -> None:
+
+        list.append(self, card)
+        self.mask |= 1 << card.index
+
+    def insert(self, position: int, card: "game.Card") -> None:
+
+        list.insert(self, position, card)
+        self.mask |= 1 << card.index
+
+    def extend(self, cards: Iterable["game.Card"]) -> None:
+
+        for card in cards:
+            self.append(card)
+
+    def remove(self, card: "game.Card") -> None:
+
+        # a card is held at most once, so only its bit changes
+        list.remove(self, card)
+        self.mask &= ~(1 << card.index)
+
+    def pop(self, position: int = -1) -> "game.Card":
+
+        card = list.pop(self, position)
+        self.mask &= ~(1 << card.index)
+
+        return card
+
+    def clear(self) -> None:
+
+        list.clear(self)
+        self.mask = 0
+
+    def __setitem__(self, key, value) -> None:
+
+        list.__setitem__(self, key, value)
+        self._update_mask()
+
+    def __delitem__(self, key) -> None:
+
+        list.__delitem__(self, key)
+        self._update_mask()
+
+    def copy(self) -> "Hand":
+
+        hand = Hand.__new__(Hand)
+        list.__init__(hand, self)
+        hand.mask = self.mask
+
+        return hand
+
+    def __iadd__(self, cards: Iterable["game.Card"]) -> "Hand":
+
+        self.extend(cards)
+        return self
+
+
 ############
 #
 # Player classes
@@ -18,12 +103,48 @@ import random
 
 
 class Player:
+
+    # players that can decide on the compact engine state implement
+    # choose_play and choose_discard, which lets simulations skip the Game
+    engine_policy = False
+
     def __init__(self, name: str):
 
-        self.hand: List["game.Card"] = []
+        self.hand: Hand = Hand()
         self.name = name
         self.tricks_won: List[List["game.Card"]] = []
 
+    def seed(self, seed: int) -> None:
+        """Reseeds the random choices of the player, players without any
+        ignore it."""
+
+        pass
+
+    def clone(self) -> "Player":
+        """Returns a shallow copy with its own hand and tricks, used when
+        branching a Game. Subclasses copy any other state their decisions
+        change, so the clone never advances the original."""
+
+        player = copy.copy(self)
+        player._hand = self._hand.copy()
+        player.tricks_won = list(self.tricks_won)
+
+        # profiling wrappers are bound to this player, not to the copy
+        for method in profiling.PLAYER_HOOKS:
+            player.__dict__.pop(method, None)
+
+        return player
+
+    @property
+    def hand(self) -> Hand:
+
+        return self._hand
+
+    @hand.setter
+    def hand(self, cards: Iterable["game.Card"]) -> None:
+
+        self._hand = cards if isinstance(cards, Hand) else Hand(cards)
+
     def sort_hand(self) -> None:
 
         self.hand.sort(key=lambda x: x.value)
@@ -41,10 +162,10 @@ class Player:
 
     def get_valid_moves(self, game_being_played: "game.Game") -> List["game.Play"]:
 
-        proposed_moves = [game.Play(self, card) for card in self.hand]
+        legal = game_being_played.legal_moves_mask(self)
 
         valid_moves = [
-            move for move in proposed_moves if game_being_played.is_valid_play(move)
+            game.Play(self, card) for card in self.hand if legal >> card.index & 1
         ]
 
         return valid_moves
@@ -57,66 +178,182 @@ class Player:
 
         pass
 
+    def choose_play(
+        self, state: engine.GameState, legal: int, rng: engine.RandomSource
+    ) -> Tuple[int, int]:
+        """Returns the index of the card to play and of the card to exchange
+        with the decree card, or engine.NO_CARD to not use a 3's ability."""
+
+        raise NotImplementedError
+
+    def choose_discard(self, state: engine.GameState, rng: engine.RandomSource) -> int:
+
+        raise NotImplementedError
+
 
 class RandomPlayer(Player):
+    """Plays and discards uniformly at random.
+
+    Args:
+        name (str): name of the player
+        rng (Optional[engine.RandomSource]): source of the choices made in a
+            Game, seeded from the global random module when not given
+    """
+
+    engine_policy = True
+
+    def __init__(self, name: str, rng: Optional[engine.RandomSource] = None):
+
+        Player.__init__(self, name)
+
+        self.rng = random.Random(random.getrandbits(64)) if rng is None else rng
+
+    def seed(self, seed: int) -> None:
+
+        self.rng = random.Random(seed)
+
+    def clone(self) -> "RandomPlayer":
+
+        player: RandomPlayer = Player.clone(self)  # type: ignore
+        player.rng = copy.deepcopy(self.rng)
+
+        return player
+
     def request_play(self, game_being_played: "game.Game") -> "game.Play":
 
         valid_moves = self.get_valid_moves(game_being_played)
 
-        return random.choice(valid_moves)
+        return valid_moves[engine.random_below(len(valid_moves), self.rng)]
 
     def request_discard(self, game_being_played: "game.Game") -> "game.Card":
 
-        return random.choice(self.hand)
+        return self.hand[engine.random_below(len(self.hand), self.rng)]
+
+    def choose_play(
+        self, state: engine.GameState, legal: int, rng: engine.RandomSource
+    ) -> Tuple[int, int]:
+
+        return engine.random_card(legal, rng), engine.NO_CARD
+
+    def choose_discard(self, state: engine.GameState, rng: engine.RandomSource) -> int:
+
+        return engine.random_card(state.hands[state.turn], rng)
 
 
 class AIPlayer(Player):
-    def request_play(self, game_being_played: "game.Game") -> "game.Play":
+    """Plays with information set Monte Carlo tree search, see ismcts.ISMCTS.
+
+    Args:
+        name (str): name of the player
+        iterations (int): playouts per decision
+        time_limit (Optional[float]): seconds per decision
+        exploration (float): UCB exploration constant
+        seed (Optional[int]): seed of the search
+        endgame (Optional[tablebase.Tablebase]): exact values that end the
+            playouts of the search early
+    """
+
+    def __init__(
+        self,
+        name: str,
+        iterations: int = 500,
+        time_limit: Optional[float] = None,
+        exploration: float = 0.7,
+        seed: Optional[int] = None,
+        endgame: Optional[tablebase.Tablebase] = None,
+    ):
 
-        valid_moves = self.get_valid_moves(game_being_played)
+        Player.__init__(self, name)
 
-        return random.choice(valid_moves)
+        # without a seed, draw one from the global random module so seeding it
+        # reproduces the games of this player too
+        if seed is None:
+            seed = random.getrandbits(64)
 
-    def get_gamestate(self, game_being_played: "game.Game") -> npt.ArrayLike:
+        self.search = ismcts.ISMCTS(
+            iterations, time_limit, exploration, random.Random(seed), endgame
+        )
+        self.observer = ismcts.Observer()
+        self.encoder = observation.ObservationEncoder(1)
 
-        # state encoding consists of
-        # - encoded hand cards
-        # - played cards (separate own vs other played?)
-        # - turn nr
-        # - nr tricks won
-        # - opponent out of certain suit?
+    def seed(self, seed: int) -> None:
 
-        pass
+        self.search.rng = random.Random(seed)
 
-    def encode_cards(self, cards: List["game.Card"]) -> npt.ArrayLike:
+    def clone(self) -> "AIPlayer":
 
-        # encode cards to array, order of suits is 'K', 'B', 'M'
+        player: AIPlayer = Player.clone(self)  # type: ignore
 
-        state = np.array([0 for _ in range(33)])
+        # the tree and rng of the search are copied, the tablebase is read
+        # only and shared
+        tablebase = self.search.tablebase
+        player.search = copy.deepcopy(self.search, {id(tablebase): tablebase})
+        player.observer = copy.deepcopy(self.observer)
+        player.encoder = observation.ObservationEncoder(1)
 
-        for card in cards:
+        return player
+
+    def decide(self, game_being_played: "game.Game") -> engine.Move:
+
+        information = self.observer.observe(game_being_played, self)
+
+        if self.observer.new_round:
+            self.search.reset()
+        else:
+            for move in self.observer.opponent_moves:
+                self.search.advance(move)
+
+        move = self.search.search(information)
+
+        self.search.advance(move)
+        self.observer.record_own(move)
+
+        return move
+
+    def card_in_hand(self, index: int) -> "game.Card":
+
+        return next(card for card in self.hand if card.index == index)
+
+    def request_play(self, game_being_played: "game.Game") -> "game.Play":
+
+        card, ability_card = self.decide(game_being_played)
 
-            pos = card.value - 1
+        if ability_card >= 0:
+            return game.Play(
+                self,
+                self.card_in_hand(card),
+                use_ability=True,
+                ability_card=self.card_in_hand(ability_card),
+            )
 
-            if card.suit == "B":
+        return game.Play(self, self.card_in_hand(card))
+
+    def get_gamestate(self, game_being_played: "game.Game") -> npt.ArrayLike:
 
-                pos = pos + 11
+        # state encoding consists of own hand, cards played by both players,
+        # the current trick, the decree card, opponent voids, turn nr and
+        # tricks won, see observation.ObservationEncoder for the layout
 
-            if card.suit == "M":
+        return self.encoder.encode_game(game_being_played, self)
 
-                pos = pos + 22
+    def encode_cards(self, cards: List["game.Card"]) -> npt.ArrayLike:
+
+        # encode cards to array, order of suits is 'K', 'B', 'M'
 
-            state[pos] = 1
+        state = np.zeros(engine.NUM_CARDS, dtype=np.int64)
+        state[[card.index for card in cards]] = 1
 
         return state
 
     def decode_cards(self, encoded_cards: npt.ArrayLike) -> List["game.Card"]:
 
-        pass
+        return observation.decode_cards(encoded_cards)[0]
 
     def request_discard(self, game_being_played: "game.Game") -> "game.Card":
 
-        return random.choice(self.hand)
+        card, _ = self.decide(game_being_played)
+
+        return self.card_in_hand(card)
 
 
 class HumanPlayer(Player):
@@ -176,3 +413,38 @@ class StreamlitPlayer(Player):
         self.picked_card = None
 
         return to_discard
+
+
+class RemotePlayer(Player):
+    """Player whose actions arrive from outside, e.g. a client of the server.
+
+    Actions are engine actions, see engine.NUM_ACTIONS. A Game cannot wait for
+    them, so rounds with a RemotePlayer are driven by awaiting next_action and
+    passing the result to Game.apply_action.
+    """
+
+    def __init__(self, name: str):
+
+        Player.__init__(self, name)
+        self.actions: "asyncio.Queue[int]" = asyncio.Queue()
+        # set while the round waits for an action of this player
+        self.waiting = False
+
+    def submit(self, action: int) -> None:
+
+        self.actions.put_nowait(action)
+
+    async def next_action(self) -> int:
+
+        return await self.actions.get()
+
+    def request_play(self, game_being_played: "game.Game") -> "game.Play":
+
+        if self.actions.empty():
+            raise RuntimeError(f"{self.name} has not submitted an action")
+
+        return game_being_played.action_to_play(self.actions.get_nowait())
+
+    def request_discard(self, game_being_played: "game.Game") -> "game.Card":
+
+        return self.request_play(game_being_played).card
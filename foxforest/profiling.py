@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import bisect
+import os
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+
+############
+#
+# Profiler
+#
+############
+
+# phases of a round and the methods timed for them. Phases nest, e.g. a bot
+# checking legal moves while deciding, and every phase only counts the time
+# not spent in a nested phase. A phase nested in itself, like is_valid_play
+# calling legal_moves_mask, is counted once, by the outer call.
+GAME_HOOKS: Dict[str, str] = {
+    "setup_game": "deal",
+    "is_valid_play": "legal",
+    "legal_moves_mask": "legal",
+    "legal_actions": "legal",
+    "finish_trick": "trick",
+    "determine_points_end_round": "scoring",
+}
+
+PLAYER_HOOKS: Tuple[str, ...] = ("request_play", "request_discard")
+
+PHASES = ("deal", "legal", "decision", "trick", "scoring")
+
+# upper bounds in seconds of the decision latency histogram buckets
+DECISION_BUCKETS: Tuple[float, ...] = (
+    1e-5,
+    3e-5,
+    1e-4,
+    3e-4,
+    1e-3,
+    3e-3,
+    1e-2,
+    3e-2,
+    0.1,
+    0.3,
+    1.0,
+    3.0,
+    10.0,
+    float("inf"),
+)
+
+
+class Histogram:
+    def __init__(self, bounds: Tuple[float, ...] = DECISION_BUCKETS):
+
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[int]:
+
+        totals = []
+        total = 0
+
+        for count in self.counts:
+            total += count
+            totals.append(total)
+
+        return totals
+
+
+class Profiler:
+    """Counts and times the phases of the rounds played by instrumented
+    games, and keeps a decision latency histogram per player name."""
+
+    def __init__(self):
+
+        self.calls = {phase: 0 for phase in PHASES}
+        self.seconds = {phase: 0.0 for phase in PHASES}
+        self.decisions: Dict[str, Histogram] = {}
+
+        # start time and time spent in nested phases of the open phases
+        self._stack: List[List[float]] = []
+        self._open: List[str] = []
+
+    @property
+    def rounds(self) -> int:
+
+        return self.calls["deal"]
+
+    def enter(self, phase: str) -> None:
+
+        self._stack.append([time.perf_counter(), 0.0])
+        self._open.append(phase)
+
+    def exit(self, phase: str, player_name: str = "") -> None:
+
+        self._open.pop()
+        start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+
+        self.calls[phase] += 1
+        self.seconds[phase] += elapsed - nested
+
+        if self._stack:
+            self._stack[-1][1] += elapsed
+
+        if player_name:
+            histogram = self.decisions.get(player_name)
+            if histogram is None:
+                histogram = self.decisions[player_name] = Histogram()
+            histogram.observe(elapsed)
+
+    def timed(self, phase: str, function: Callable, player_name: str = "") -> Callable:
+        """Wraps function so every call is counted and timed as phase."""
+
+        def timed_function(*args, **kwargs):
+
+            if self._open and self._open[-1] == phase:
+                return function(*args, **kwargs)
+
+            self.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.exit(phase, player_name)
+
+        timed_function.__wrapped__ = function  # type: ignore
+
+        return timed_function
+
+    def to_dict(self) -> dict:
+
+        rounds = max(self.rounds, 1)
+
+        return {
+            "rounds": self.rounds,
+            "phases": {
+                phase: {
+                    "calls": self.calls[phase],
+                    "seconds": self.seconds[phase],
+                    "seconds_per_round": self.seconds[phase] / rounds,
+                }
+                for phase in PHASES
+            },
+            "decisions": {
+                name: {
+                    "count": histogram.count,
+                    "seconds": histogram.sum,
+                    "buckets": dict(
+                        zip(
+                            [str(bound) for bound in histogram.bounds],
+                            histogram.cumulative(),
+                        )
+                    ),
+                }
+                for name, histogram in self.decisions.items()
+            },
+        }
+
+    def to_prometheus(self, prefix: str = "foxforest") -> str:
+        """Renders the counters in the Prometheus text exposition format."""
+
+        lines = [
+            f"# HELP {prefix}_rounds_total Rounds dealt.",
+            f"# TYPE {prefix}_rounds_total counter",
+            f"{prefix}_rounds_total {self.rounds}",
+            f"# HELP {prefix}_phase_calls_total Calls per phase of a round.",
+            f"# TYPE {prefix}_phase_calls_total counter",
+        ]
+
+        for phase in PHASES:
+            lines.append(
+                f'{prefix}_phase_calls_total{{phase="{phase}"}} {self.calls[phase]}'
+            )
+
+        lines += [
+            f"# HELP {prefix}_phase_seconds_total Time spent per phase of a round.",
+            f"# TYPE {prefix}_phase_seconds_total counter",
+        ]
+
+        for phase in PHASES:
+            lines.append(
+                f'{prefix}_phase_seconds_total{{phase="{phase}"}} {self.seconds[phase]!r}'
+            )
+
+        lines += [
+            f"# HELP {prefix}_decision_seconds Decision latency per player.",
+            f"# TYPE {prefix}_decision_seconds histogram",
+        ]
+
+        for name, histogram in self.decisions.items():
+
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+
+            for bound, count in zip(histogram.bounds, histogram.cumulative()):
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f'{prefix}_decision_seconds_bucket{{player="{label}",le="{le}"}} {count}'
+                )
+
+            lines.append(
+                f'{prefix}_decision_seconds_sum{{player="{label}"}} {histogram.sum!r}'
+            )
+            lines.append(
+                f'{prefix}_decision_seconds_count{{player="{label}"}} {histogram.count}'
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = "foxforest") -> None:
+        """Writes the text format to path atomically, for the textfile
+        collector of a node exporter."""
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+
+        with open(temporary, "w") as file:
+            file.write(self.to_prometheus(prefix))
+
+        os.replace(temporary, path)
+
+
+############
+#
+# Instrumentation
+#
+############
+
+
+def instrument(game, profiler: Profiler) -> None:
+    """Times the phases of game and the decisions of its players.
+
+    The timed wrappers are set on the instances and shadow the methods of the
+    classes, so a game that is not instrumented runs without any overhead.
+    """
+
+    uninstrument(game)
+
+    for method, phase in GAME_HOOKS.items():
+        setattr(game, method, profiler.timed(phase, getattr(game, method)))
+
+    for player in {
+        id(game.player1): game.player1,
+        id(game.player2): game.player2,
+    }.values():
+        for method in PLAYER_HOOKS:
+            setattr(
+                player,
+                method,
+                profiler.timed("decision", getattr(player, method), player.name),
+            )
+
+
+def uninstrument(game) -> None:
+
+    for method in GAME_HOOKS:
+        game.__dict__.pop(method, None)
+
+    for player in (game.player1, game.player2):
+        for method in PLAYER_HOOKS:
+            player.__dict__.pop(method, None)
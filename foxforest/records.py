@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import mmap
+import os
+from typing import BinaryIO
+from typing import Callable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from . import engine
+from .game import Game
+
+
+############
+#
+# Record format
+#
+############
+
+# a record file starts with MAGIC and holds records back to back. A record is
+#   1 byte         number of actions n
+#   33 bytes       card order dealt from, see GameState.deal
+#   n bytes        engine actions, one byte each, see engine.NUM_ACTIONS
+# so a full round takes about 65 bytes.
+
+MAGIC = b"FXR\x01"
+
+DEAL_BYTES = engine.NUM_CARDS
+
+# decoded action table, replay looks moves up instead of decoding them
+_ACTION_MOVES = tuple(
+    engine.action_to_move(action) for action in range(engine.NUM_ACTIONS)
+)
+
+
+def encode_record(deal_order: Sequence[int], actions: Sequence[int]) -> bytes:
+
+    if len(deal_order) != DEAL_BYTES:
+        raise ValueError("A record needs the order of all 33 cards")
+
+    return bytes((len(actions),)) + bytes(deal_order) + bytes(actions)
+
+
+def game_record(game_being_played: Game) -> bytes:
+    """Returns the record of the round a Game has played so far."""
+
+    return encode_record(game_being_played.deal_order, game_being_played.action_log)
+
+
+class RecordWriter:
+    """Appends records to a file, writing MAGIC first when the file is new."""
+
+    def __init__(self, path: str):
+
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+
+        self.file: BinaryIO = open(path, "ab")
+        self.records = 0
+
+        if new:
+            self.file.write(MAGIC)
+
+    def __enter__(self) -> RecordWriter:
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.close()
+
+    def write(self, record: bytes) -> None:
+
+        self.file.write(record)
+        self.records += 1
+
+    def write_game(self, game_being_played: Game) -> None:
+
+        self.write(game_record(game_being_played))
+
+    def close(self) -> None:
+
+        self.file.close()
+
+
+def iter_records(path: str) -> Iterator[Tuple[bytes, bytes]]:
+    """Yields (deal order, actions) of every record in a file."""
+
+    with open(path, "rb") as file:
+
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+
+            if data[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a record file")
+
+            position = len(MAGIC)
+            size = len(data)
+
+            while position < size:
+
+                count = data[position]
+                deal_end = position + 1 + DEAL_BYTES
+                end = deal_end + count
+
+                if end > size:
+                    raise ValueError(f"{path} ends in a truncated record")
+
+                yield data[position + 1 : deal_end], data[deal_end:end]
+
+                position = end
+
+
+############
+#
+# Replay
+#
+############
+
+
+def replay(
+    deal_order: Sequence[int], actions: Sequence[int], validate: bool = False
+) -> engine.GameState:
+    """Re-executes a record on the engine and returns the state it ends in.
+
+    Args:
+        deal_order (Sequence[int]): card order dealt from
+        actions (Sequence[int]): engine actions in the order taken
+        validate (bool): check every action is legal, otherwise the record is
+            trusted
+    """
+
+    state = engine.GameState()
+    state.deal(deal_order)
+
+    play = state.play
+    discard = state.discard
+
+    for action in actions:
+
+        if validate and not state.legal_actions() >> action & 1:
+            raise ValueError(f"Illegal action {action} after {state.turns} tricks")
+
+        card, ability_card = _ACTION_MOVES[action]
+
+        if ability_card == engine.DISCARD:
+            discard(card)
+        else:
+            play(card, ability_card)
+
+    return state
+
+
+def rescore(
+    path: str,
+    scoring: Optional[Callable[[engine.GameState], List[int]]] = None,
+    validate: bool = False,
+) -> List[List[int]]:
+    """Replays every record in a file and scores the final states, with the
+    current rules of GameState.points unless another scoring is given."""
+
+    scores = []
+
+    for deal_order, actions in iter_records(path):
+
+        state = replay(deal_order, actions, validate)
+        scores.append(state.points() if scoring is None else scoring(state))
+
+    return scores
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import random
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from . import engine
+
+
+############
+#
+# Knowledge
+#
+############
+
+# ABOVE[card] holds the cards of the suit of card with a higher value
+ABOVE: Tuple[int, ...] = tuple(
+    engine.SUIT_MASKS[engine.CARD_SUITS[card]] & ~((2 << card) - 1)
+    for card in range(engine.NUM_CARDS)
+)
+
+
+def follow_exclusions(lead: int, follow: int) -> int:
+    """Returns the cards the follower cannot hold, given the card it answered
+    the lead with.
+
+    Not following suit reveals a void. Following an 11 with anything but the
+    1 reveals the follower held no higher card of the suit, as the 11 forces
+    the 1 or the highest card.
+    """
+
+    suit = engine.CARD_SUITS[lead]
+
+    if engine.CARD_SUITS[follow] != suit:
+        return engine.SUIT_MASKS[suit]
+
+    if engine.CARD_VALUES[lead] == 11 and engine.CARD_VALUES[follow] != 1:
+        return ABOVE[follow]
+
+    return 0
+
+
+class Knowledge:
+    """What one seat knows about the hidden cards, updated move by move.
+
+    known_opponent holds cards known to be in the opponent's hand, excluded
+    the cards it cannot hold and known_deck the cards the seat put at the
+    bottom of the deck itself. A 5 of the opponent draws a card the seat may
+    not know, after which the exclusions no longer hold; cards known to be in
+    its hand are assumed to be kept through the hidden discard.
+
+    Args:
+        seat (int): seat whose knowledge is kept
+    """
+
+    def __init__(self, seat: int):
+
+        self.seat = seat
+        self.known_opponent = 0
+        self.excluded = 0
+        self.known_deck = 0
+
+    def copy(self) -> Knowledge:
+
+        knowledge = Knowledge(self.seat)
+        knowledge.known_opponent = self.known_opponent
+        knowledge.excluded = self.excluded
+        knowledge.known_deck = self.known_deck
+
+        return knowledge
+
+    def opponent_played(
+        self, card: int, lead: int = engine.NO_CARD, taken: int = engine.NO_CARD
+    ) -> None:
+        """Records a card of the opponent, played after lead when it followed.
+        taken is the decree card it took in exchange with a 3."""
+
+        self.known_opponent &= ~(1 << card)
+
+        if lead >= 0:
+            self.excluded |= follow_exclusions(lead, card)
+
+        if taken >= 0:
+            self.known_opponent |= 1 << taken
+
+    def drawn(self, player: int, card: int = engine.NO_CARD) -> None:
+        """Records a 5 of player drawing card from the deck, NO_CARD when the
+        seat does not know which card was drawn."""
+
+        if player != self.seat:
+            self.excluded = 0
+
+        if card < 0:
+            return
+
+        bit = 1 << card
+
+        if player != self.seat and self.known_deck & bit:
+            self.known_opponent |= bit
+
+        self.known_deck &= ~bit
+
+    def own_discard(self, card: int) -> None:
+
+        self.known_deck |= 1 << card
+
+    def update(self, state: engine.GameState, move: engine.Move) -> None:
+        """Records a move about to be made in state, by either seat. Only what
+        the seat can see is used: the cards discarded and drawn by the
+        opponent are hidden."""
+
+        card, ability_card = move
+        player = state.turn
+
+        if ability_card == engine.DISCARD:
+            if player == self.seat:
+                self.own_discard(card)
+            return
+
+        if player != self.seat:
+            self.opponent_played(
+                card,
+                state.lead,
+                state.decree if ability_card >= 0 else engine.NO_CARD,
+            )
+
+        if engine.CARD_VALUES[card] == 5:
+            self.drawn(player, state.deck[state.deck_pos])
+
+
+############
+#
+# Sampling
+#
+############
+
+
+class Sampler:
+    """Draws the hidden cards of a round uniformly among the deals consistent
+    with what seat knows.
+
+    The opponent's hand is its known cards plus a uniform choice of the
+    unknown cards it may hold; the remaining unknown cards fill the deck
+    positions the seat does not know in uniform order. If the exclusions leave
+    too few cards for the opponent's hand, they are dropped.
+
+    Args:
+        state (engine.GameState): state of the round
+        seat (int): seat the deals are drawn for
+        known_opponent (int): cards known to be in the opponent's hand
+        excluded (int): cards the opponent cannot hold
+        known_deck (int): deck cards whose position the seat knows
+    """
+
+    def __init__(
+        self,
+        state: engine.GameState,
+        seat: int,
+        known_opponent: int = 0,
+        excluded: int = 0,
+        known_deck: int = 0,
+    ):
+
+        self.state = state
+        self.seat = seat
+
+        opponent = state.hands[seat ^ 1]
+        deck = state.deck[state.deck_pos :]
+
+        self.known_opponent = known_opponent & opponent
+        self.known_deck = known_deck & engine.cards_to_mask(deck)
+        self.opponent_size = engine.popcount(opponent)
+        self.needed = self.opponent_size - engine.popcount(self.known_opponent)
+
+        # deck positions holding cards unknown to seat
+        self.unknown_slots = [
+            position
+            for position in range(state.deck_pos, len(state.deck))
+            if not self.known_deck >> state.deck[position] & 1
+        ]
+
+        self.unknown = (opponent | engine.cards_to_mask(deck)) & ~(
+            self.known_opponent | self.known_deck
+        )
+
+        self.candidates = self.unknown & ~excluded
+        if engine.popcount(self.candidates) < self.needed:
+            self.candidates = self.unknown
+
+        self._candidates = list(engine.cards_of(self.candidates))
+        self._unknown = list(engine.cards_of(self.unknown))
+
+        # Zobrist keys of the deck positions the unknown slots are at, and the
+        # hash of the hidden cards the draws replace
+        self._slot_keys = [
+            engine.ZOBRIST_DECK[position - state.deck_pos]
+            for position in self.unknown_slots
+        ]
+        self._hidden_hash = engine.hand_hash(seat ^ 1, opponent)
+        for keys, position in zip(self._slot_keys, self.unknown_slots):
+            self._hidden_hash ^= keys[state.deck[position]]
+
+    @classmethod
+    def from_knowledge(cls, state: engine.GameState, knowledge: Knowledge) -> Sampler:
+
+        return cls(
+            state,
+            knowledge.seat,
+            knowledge.known_opponent,
+            knowledge.excluded,
+            knowledge.known_deck,
+        )
+
+    def draw(self, rng: random.Random) -> engine.GameState:
+        """Returns a copy of the state with the hidden cards drawn."""
+
+        state = self.state.copy()
+        random_float = rng.random
+
+        # partial Fisher-Yates shuffles, cheaper than rng.sample and shuffle
+        candidates = self._candidates[:]
+        size = len(candidates)
+        hand = self.known_opponent
+
+        for i in range(self.needed):
+            j = i + int(random_float() * (size - i))
+            candidates[i], candidates[j] = candidates[j], candidates[i]
+            hand |= 1 << candidates[i]
+
+        state.hands[self.seat ^ 1] = hand
+        key = self._hidden_hash ^ engine.hand_hash(self.seat ^ 1, hand)
+
+        rest = [card for card in self._unknown if not hand >> card & 1]
+        deck = state.deck
+        size = len(rest)
+        slot_keys = self._slot_keys
+
+        for i, position in enumerate(self.unknown_slots):
+            j = i + int(random_float() * (size - i))
+            rest[i], rest[j] = rest[j], rest[i]
+            deck[position] = rest[i]
+            key ^= slot_keys[i][rest[i]]
+
+        state.hash ^= key
+
+        return state
+
+    def draw_batch(
+        self, count: int, rng: Optional[np.random.Generator] = None
+    ) -> Tuple[npt.NDArray, npt.NDArray]:
+        """Draws count deals at once.
+
+        Returns:
+            Tuple[npt.NDArray, npt.NDArray]: the (count,) uint64 hand masks of
+                the opponent and the (count, len(state.deck)) int8 decks
+        """
+
+        if rng is None:
+            rng = np.random.default_rng()
+
+        unknown = np.array(self._unknown, dtype=np.int64)
+        is_candidate = (np.right_shift(self.candidates, unknown) & 1).astype(bool)
+
+        # the hand takes the needed candidates with the smallest keys, which is
+        # a uniform choice, and the rest are ordered by independent keys
+        keys = rng.random((count, len(unknown)))
+        keys[:, ~is_candidate] = 2.0
+
+        chosen = np.zeros((count, len(unknown)), dtype=bool)
+        if self.needed:
+            smallest = np.argpartition(keys, self.needed - 1, axis=1)[:, : self.needed]
+            np.put_along_axis(chosen, smallest, True, axis=1)
+
+        order = rng.random((count, len(unknown)))
+        order[chosen] = -1.0
+        rest = unknown[np.argsort(order, axis=1)[:, self.needed :]]
+
+        bits = np.left_shift(np.uint64(1), unknown.astype(np.uint64))
+        hands = np.bitwise_or.reduce(
+            np.where(chosen, bits, np.uint64(0)), axis=1
+        ) | np.uint64(self.known_opponent)
+
+        decks = np.tile(np.array(self.state.deck, dtype=np.int8), (count, 1))
+        decks[:, self.unknown_slots] = rest
+
+        return hands, decks
+
+    def state_of(
+        self, hands: npt.NDArray, decks: npt.NDArray, row: int
+    ) -> engine.GameState:
+        """Returns the state of one deal drawn by draw_batch."""
+
+        state = self.state.copy()
+        state.hands[self.seat ^ 1] = int(hands[row])
+        state.deck = decks[row].tolist()
+        state.rehash()
+
+        return state
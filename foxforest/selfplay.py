@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import os
+import random
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from . import engine
+from . import observation
+from .game import Game
+from .player import Player
+from .vectorized import ACTION_BYTES
+
+
+############
+#
+# Sample layout
+#
+############
+
+# one row per decision. Observations hold the trick counts as counts, see
+# ObservationEncoder(normalize=False), legal_actions is the action mask packed
+# little endian, points are the final points of the round seen from seat.
+# valid is written last and stays 0 in rows never written, which keeps a shard
+# readable when the job writing it is killed.
+SAMPLE_DTYPE = np.dtype(
+    [
+        ("observation", np.uint8, (observation.NUM_FEATURES,)),
+        ("legal_actions", np.uint8, (ACTION_BYTES,)),
+        ("action", np.int16),
+        ("seat", np.int8),
+        ("points", np.int8, (2,)),
+        ("valid", np.uint8),
+    ]
+)
+
+# decisions in a single round: 26 plays and at most 3 discards
+_ROUND_SAMPLES = 32
+
+
+def unpack_legal_actions(samples: npt.NDArray) -> npt.NDArray:
+    """Returns the (N, NUM_ACTIONS) bool legal action matrix of samples."""
+
+    bits = np.unpackbits(samples["legal_actions"], axis=1, bitorder="little")
+
+    return bits[:, : engine.NUM_ACTIONS].astype(bool)
+
+
+############
+#
+# Shards
+#
+############
+
+
+class ShardWriter:
+    """Appends samples to fixed size .npy shards of shard_size rows.
+
+    Shards are numpy memmaps, so only the pages being written are held in
+    memory. A new shard is started when the current one is full.
+
+    Args:
+        directory (str): directory the shards are written to
+        shard_size (int): rows per shard
+        prefix (str): file name prefix, shards are named prefix-00000.npy etc.
+    """
+
+    def __init__(
+        self, directory: str, shard_size: int = 1 << 20, prefix: str = "selfplay"
+    ):
+
+        self.directory = directory
+        self.shard_size = shard_size
+        self.prefix = prefix
+
+        self.shard: Optional[np.memmap] = None
+        self.shard_count = 0
+        self.position = 0
+        self.samples = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self) -> ShardWriter:
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.close()
+
+    def _open_shard(self) -> None:
+
+        self.close()
+
+        path = os.path.join(self.directory, f"{self.prefix}-{self.shard_count:05d}.npy")
+
+        # the file is created sparse, so unwritten rows read as zeros
+        self.shard = np.lib.format.open_memmap(
+            path, mode="w+", dtype=SAMPLE_DTYPE, shape=(self.shard_size,)
+        )
+        self.shard_count += 1
+        self.position = 0
+
+    def write(self, samples: npt.NDArray) -> None:
+
+        start = 0
+
+        while start < len(samples):
+
+            if self.shard is None or self.position == self.shard_size:
+                self._open_shard()
+
+            assert self.shard is not None
+
+            count = min(len(samples) - start, self.shard_size - self.position)
+            rows = self.shard[self.position : self.position + count]
+            chunk = samples[start : start + count]
+
+            # mark the rows valid only once all their fields are in place
+            for name in SAMPLE_DTYPE.names:  # type: ignore
+                if name != "valid":
+                    rows[name] = chunk[name]
+            rows["valid"] = 1
+
+            self.position += count
+            self.samples += count
+            start += count
+
+    def flush(self) -> None:
+
+        if self.shard is not None:
+            self.shard.flush()
+
+    def close(self) -> None:
+
+        if self.shard is not None:
+            self.shard.flush()
+            self.shard = None
+
+
+def valid_rows(shard: npt.NDArray) -> int:
+    """Returns the number of samples in a shard. Rows are written in order, so
+    the first invalid row is found by bisection."""
+
+    valid = shard["valid"]
+    low, high = 0, len(shard)
+
+    while low < high:
+        middle = (low + high) // 2
+        if valid[middle]:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+def load_shard(path: str) -> npt.NDArray:
+    """Memory maps a shard read only and returns a view of its samples."""
+
+    shard = np.load(path, mmap_mode="r")
+
+    return shard[: valid_rows(shard)]
+
+
+def iter_shards(directory: str, prefix: str = "selfplay") -> Iterator[npt.NDArray]:
+
+    for name in sorted(os.listdir(directory)):
+        if name.startswith(prefix + "-") and name.endswith(".npy"):
+            yield load_shard(os.path.join(directory, name))
+
+
+############
+#
+# Self-play
+#
+############
+
+
+def play_round(
+    game_being_played: Game,
+    encoder: observation.ObservationEncoder,
+    samples: npt.NDArray,
+    order: Optional[List[int]] = None,
+) -> int:
+    """Plays one round of a Game and fills the first rows of samples with its
+    decisions. Returns the number of rows filled."""
+
+    game_being_played.setup_game(order)
+
+    states: List[engine.GameState] = []
+    seats: List[int] = []
+    count = 0
+
+    while not game_being_played.round_done:
+
+        player = game_being_played.player_turn
+        seat = 0 if player is game_being_played.player1 else 1
+
+        states.append(game_being_played.to_state())
+        seats.append(seat)
+
+        legal = game_being_played.legal_actions()
+        action = game_being_played.request_action()
+
+        samples["legal_actions"][count] = np.frombuffer(
+            legal.to_bytes(ACTION_BYTES, "little"), dtype=np.uint8
+        )
+        samples["action"][count] = action
+        samples["seat"][count] = seat
+
+        game_being_played.apply_action(action)
+        count += 1
+
+    encoder.encode(states, seats, out=samples["observation"][:count])
+
+    points = game_being_played.determine_points_end_round()
+    seat_column = samples["seat"][:count]
+    samples["points"][:count, 0] = np.where(seat_column == 0, points[0], points[1])
+    samples["points"][:count, 1] = np.where(seat_column == 0, points[1], points[0])
+
+    return count
+
+
+def generate(
+    player1: Player,
+    player2: Player,
+    rounds: int,
+    directory: str,
+    shard_size: int = 1 << 20,
+    seed: Optional[int] = None,
+    prefix: str = "selfplay",
+) -> int:
+    """Plays rounds between two players and streams every decision of both into
+    shards in directory. Returns the number of samples written.
+
+    Args:
+        player1 (Player): any Player, e.g. an AIPlayer
+        player2 (Player): its opponent
+        rounds (int): rounds to play
+        directory (str): directory of the shards
+        shard_size (int): rows per shard
+        seed (Optional[int]): seed of the deals
+        prefix (str): file name prefix of the shards
+    """
+
+    rng = random.Random(seed)
+    game_being_played = Game(player1, player2, rng)
+    encoder = observation.ObservationEncoder(
+        _ROUND_SAMPLES, dtype=np.uint8, normalize=False
+    )
+    samples = np.zeros(_ROUND_SAMPLES, dtype=SAMPLE_DTYPE)
+
+    with ShardWriter(directory, shard_size, prefix) as writer:
+
+        for _ in range(rounds):
+
+            count = play_round(
+                game_being_played, encoder, samples, engine.shuffled_deck(rng)
+            )
+            writer.write(samples[:count])
+
+        return writer.samples
@@ -0,0 +1,514 @@
+"""Asyncio server hosting rounds between remote clients and bots.
+
+Clients talk a line protocol over TCP, one JSON object per line. A client
+starts a round against a bot with
+
+    {"type": "new", "opponent": "random", "seed": 1, "seat": 0}
+
+and receives the events of the round as they happen, together with a
+your_turn message holding its hand and the legal engine actions whenever it
+has to act. It answers with
+
+    {"type": "play", "action": 12}
+
+Cards are engine card indices, actions engine actions, see engine.NUM_ACTIONS.
+Run a server with
+
+    python -m foxforest.server --port 8765
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import random
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Type
+
+from . import engine
+from . import events
+from .game import Game
+from .player import AIPlayer
+from .player import Player
+from .player import RandomPlayer
+from .player import RemotePlayer
+
+
+# bots a client can play against, created from a seeded rng
+BOTS: Dict[str, Callable[[random.Random], Player]] = {
+    "random": lambda rng: RandomPlayer("random", rng),
+    "ai": lambda rng: AIPlayer("ai", seed=rng.getrandbits(64)),
+}
+
+
+class ProtocolError(Exception):
+    pass
+
+
+############
+#
+# Messages
+#
+############
+
+
+def encode_message(message: dict) -> bytes:
+
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_message(line: bytes) -> dict:
+
+    try:
+        message = json.loads(line)
+    except ValueError:
+        raise ProtocolError("Messages must be JSON objects, one per line")
+
+    if not isinstance(message, dict) or "type" not in message:
+        raise ProtocolError("Messages must be JSON objects with a type")
+
+    return message
+
+
+def event_message(
+    game_being_played: Game, event: events.Event, seat: int
+) -> Optional[dict]:
+    """Returns the message telling the player in seat about an event, without
+    the cards hidden from that player."""
+
+    players = (game_being_played.player1, game_being_played.player2)
+
+    if isinstance(event, events.RoundStarted):
+
+        return {
+            "type": "round_started",
+            "seat": seat,
+            "hand": [card.index for card in event.hands[seat]],
+            "decree": event.decree_card.index,
+        }
+
+    if isinstance(event, events.CardPlayed):
+
+        return {
+            "type": "card_played",
+            "seat": players.index(event.player),
+            "card": event.card.index,
+        }
+
+    if isinstance(event, events.AbilityUsed):
+
+        actor = players.index(event.player)
+
+        if event.given is not None:
+            return {
+                "type": "decree_exchanged",
+                "seat": actor,
+                "taken": event.taken.index,
+                "decree": event.given.index,
+            }
+
+        return {
+            "type": "card_drawn",
+            "seat": actor,
+            "card": event.taken.index if actor == seat else None,
+        }
+
+    if isinstance(event, events.CardDiscarded):
+
+        actor = players.index(event.player)
+
+        return {
+            "type": "card_discarded",
+            "seat": actor,
+            "card": event.card.index if actor == seat else None,
+        }
+
+    if isinstance(event, events.TrickWon):
+
+        return {
+            "type": "trick_won",
+            "seat": players.index(event.winner),
+            "cards": [card.index for card in event.cards],
+        }
+
+    if isinstance(event, events.RoundScored):
+
+        return {
+            "type": "round_scored",
+            "points": list(event.points),
+            "tricks": list(event.tricks),
+        }
+
+    return None
+
+
+############
+#
+# Server
+#
+############
+
+
+class Connection:
+    """Writes messages to a client. Drains are serialized, as the round and
+    the reader of a connection both write to it."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+
+        self.writer = writer
+        self.lock = asyncio.Lock()
+
+    def send(self, message: dict) -> None:
+
+        self.writer.write(encode_message(message))
+
+    async def drain(self) -> None:
+
+        async with self.lock:
+            await self.writer.drain()
+
+
+class GameServer:
+    """Hosts any number of concurrent rounds on one event loop.
+
+    Every connection plays its rounds against a bot chosen by the client, one
+    round at a time. Decisions of bots of the offload types run in executor,
+    so a searching bot does not hold up the other tables; the other bots
+    decide inline.
+
+    Args:
+        bots (Optional[Dict[str, Callable]]): bots by name, BOTS by default
+        executor (Optional[concurrent.futures.Executor]): runs offloaded
+            decisions, the default executor of the loop when not given
+        offload (Tuple[Type[Player], ...]): bot types to run in executor
+    """
+
+    def __init__(
+        self,
+        bots: Optional[Dict[str, Callable[[random.Random], Player]]] = None,
+        executor: Optional[concurrent.futures.Executor] = None,
+        offload: Tuple[Type[Player], ...] = (AIPlayer,),
+    ):
+
+        self.bots = BOTS if bots is None else bots
+        self.executor = executor
+        self.offload = offload
+
+        self.connections = 0
+        self.rounds_started = 0
+        self.rounds_finished = 0
+
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, int]:
+        """Starts listening and returns the address, port 0 picks a free port."""
+
+        self.server = await asyncio.start_server(self.handle, host, port)
+
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self) -> None:
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serves one connection until the client quits or disconnects.
+
+        Plays are handed to the RemotePlayer of the round being played, which
+        runs as its own task and awaits them. Plays sent while the round does
+        not wait for one are refused.
+        """
+
+        connection = Connection(writer)
+        remote = RemotePlayer("remote")
+        round_task: Optional[asyncio.Future] = None
+
+        self.connections += 1
+
+        try:
+            while True:
+
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    message = decode_message(line)
+
+                    if message["type"] == "quit":
+                        break
+
+                    playing = round_task is not None and not round_task.done()
+
+                    if message["type"] == "new":
+
+                        if playing:
+                            raise ProtocolError("A round is being played")
+
+                        remote = RemotePlayer("remote")
+                        game_being_played = self.new_round(message, remote)
+                        round_task = asyncio.ensure_future(
+                            self.play_round(game_being_played, remote, connection)
+                        )
+
+                    elif message["type"] == "play":
+
+                        if not playing:
+                            raise ProtocolError("No round is being played")
+
+                        # a play sent out of turn would answer a later turn
+                        if not remote.waiting or not remote.actions.empty():
+                            raise ProtocolError("It is not your turn")
+
+                        remote.submit(message.get("action"))
+
+                    else:
+                        raise ProtocolError(f"Unknown message type {message['type']!r}")
+
+                except ProtocolError as error:
+                    connection.send({"type": "error", "message": str(error)})
+                    await connection.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+
+            if round_task is not None:
+                round_task.cancel()
+                try:
+                    await round_task
+                except (asyncio.CancelledError, ConnectionError):
+                    pass
+
+            self.connections -= 1
+            writer.close()
+
+    def new_round(self, message: dict, remote: RemotePlayer) -> Game:
+        """Seats remote and the bot asked for by a new message at a Game."""
+
+        opponent = message.get("opponent", "random")
+        if not isinstance(opponent, str):
+            raise ProtocolError("opponent must be a string")
+
+        bot_factory = self.bots.get(opponent)
+        if bot_factory is None:
+            raise ProtocolError(f"Unknown opponent {opponent!r}")
+
+        seat = message.get("seat", 0)
+        if isinstance(seat, bool) or seat not in (0, 1):
+            raise ProtocolError("seat must be 0 or 1")
+
+        seed = message.get("seed")
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+            raise ProtocolError("seed must be an integer")
+
+        rng = random.Random(seed)
+        bot = bot_factory(rng)
+
+        if seat == 0:
+            return Game(remote, bot, rng)
+
+        return Game(bot, remote, rng)
+
+    async def play_round(
+        self, game_being_played: Game, remote: RemotePlayer, connection: Connection
+    ) -> None:
+
+        seat = 0 if game_being_played.player1 is remote else 1
+
+        game_being_played.subscribe(
+            lambda event: self._send_event(connection, game_being_played, event, seat)
+        )
+
+        self.rounds_started += 1
+        game_being_played.setup_game()
+
+        loop = asyncio.get_running_loop()
+
+        while not game_being_played.round_done:
+
+            player = game_being_played.player_turn
+
+            if player is remote:
+                action = await self._remote_action(
+                    game_being_played, remote, connection
+                )
+            elif isinstance(player, self.offload):
+                action = await loop.run_in_executor(
+                    self.executor, game_being_played.request_action
+                )
+            else:
+                action = game_being_played.request_action()
+
+            game_being_played.apply_action(action)
+            await connection.drain()
+
+        self.rounds_finished += 1
+
+    def _send_event(
+        self,
+        connection: Connection,
+        game_being_played: Game,
+        event: events.Event,
+        seat: int,
+    ) -> None:
+
+        message = event_message(game_being_played, event, seat)
+
+        if message is not None:
+            connection.send(message)
+
+    async def _remote_action(
+        self, game_being_played: Game, remote: RemotePlayer, connection: Connection
+    ) -> int:
+        """Asks the client for its action until it sends a legal one."""
+
+        legal = game_being_played.legal_actions()
+
+        # set before asking, the answer may arrive while the message drains
+        remote.waiting = True
+
+        connection.send(
+            {
+                "type": "your_turn",
+                "hand": [card.index for card in remote.hand],
+                "discard": game_being_played.wait_for_discard,
+                "legal_actions": list(engine.iter_actions(legal)),
+            }
+        )
+
+        while True:
+
+            await connection.drain()
+
+            action = await remote.next_action()
+
+            if (
+                isinstance(action, int)
+                and 0 <= action < engine.NUM_ACTIONS
+                and legal >> action & 1
+            ):
+                remote.waiting = False
+                return action
+
+            connection.send({"type": "error", "message": f"Illegal action {action!r}"})
+
+
+############
+#
+# Clients
+#
+############
+
+
+class Client:
+    """Minimal client of a GameServer, e.g. a stand-in for tests and bots."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> Client:
+
+        reader, writer = await asyncio.open_connection(host, port)
+
+        return cls(reader, writer)
+
+    async def send(self, message: dict) -> None:
+
+        self.writer.write(encode_message(message))
+        await self.writer.drain()
+
+    async def receive(self) -> dict:
+
+        line = await self.reader.readline()
+        if not line:
+            raise EOFError("The server closed the connection")
+
+        return decode_message(line)
+
+    async def play_round(
+        self,
+        choose: Callable[[dict], int],
+        opponent: str = "random",
+        seed: Optional[int] = None,
+        seat: int = 0,
+    ) -> dict:
+        """Plays a round, answering every your_turn message with choose(message),
+        and returns the round_scored message."""
+
+        await self.send(
+            {"type": "new", "opponent": opponent, "seed": seed, "seat": seat}
+        )
+
+        while True:
+
+            message = await self.receive()
+
+            if message["type"] == "your_turn":
+                await self.send({"type": "play", "action": choose(message)})
+            elif message["type"] == "round_scored":
+                return message
+            elif message["type"] == "error":
+                raise ProtocolError(message["message"])
+
+    async def close(self) -> None:
+
+        await self.send({"type": "quit"})
+        self.writer.close()
+
+
+def random_choice(rng: random.Random) -> Callable[[dict], int]:
+    """Returns a choose function for Client.play_round picking random actions."""
+
+    return lambda message: rng.choice(message["legal_actions"])
+
+
+############
+#
+# Command line
+#
+############
+
+
+async def serve(host: str, port: int, workers: Optional[int] = None) -> None:
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+
+        server = GameServer(executor=executor)
+        host, port = await server.start(host, port)
+        print(f"Serving fox in the forest on {host}:{port}")
+
+        assert server.server is not None
+        await server.server.serve_forever()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="threads for the AI players")
+
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import collections
+import random
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+from . import records
+from .game import Game
+from .player import Player
+
+
+T = TypeVar("T")
+
+# creates the two players of a session, the rng makes the bots reproducible
+PlayerFactory = Callable[[random.Random], Tuple[Player, Player]]
+
+
+@dataclass
+class Session:
+    """Compact state of one session: the record of the round being played,
+    see records, and the plain values the front end keeps between reruns.
+
+    version changes whenever the round changes and keys the cached view.
+    """
+
+    seed: int
+    record: bytes = b""
+    ui: Dict[str, Any] = field(default_factory=dict)
+    version: int = 0
+    touched: float = 0.0
+    view: Optional[Tuple[int, Any]] = None
+
+
+class SessionStore:
+    """Keeps the games of many front end sessions in bounded memory.
+
+    Every session is stored as its round record of about 65 bytes. The Games
+    of the live_size most recently used sessions are also kept, so a rerun of
+    an active session gets its Game back without replaying the record.
+    Sessions are evicted least recently used first once there are more than
+    max_sessions, and after idle_timeout seconds without use. The store may be
+    shared by the threads serving the sessions.
+
+    Args:
+        new_players (PlayerFactory): creates the players of a session
+        max_sessions (int): sessions kept at most
+        idle_timeout (float): seconds after which an unused session is evicted
+        live_size (int): sessions whose Game is kept live
+        clock (Callable[[], float]): time source, time.monotonic by default
+    """
+
+    def __init__(
+        self,
+        new_players: PlayerFactory,
+        max_sessions: int = 10000,
+        idle_timeout: float = 3600.0,
+        live_size: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+
+        self.new_players = new_players
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.live_size = live_size
+        self.clock = clock
+
+        # both ordered from least to most recently used
+        self.sessions: "collections.OrderedDict[str, Session]" = (
+            collections.OrderedDict()
+        )
+        self.live: "collections.OrderedDict[str, Tuple[int, Game]]" = (
+            collections.OrderedDict()
+        )
+
+        self.restores = 0
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+
+        return len(self.sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+
+        return session_id in self.sessions
+
+    def load(self, session_id: str) -> Tuple[Game, Dict[str, Any]]:
+        """Returns the Game and the front end values of a session, starting a
+        new session when it is unknown or was evicted."""
+
+        with self.lock:
+            now = self.clock()
+            self.evict(now)
+
+            session = self.sessions.get(session_id)
+
+            if session is None:
+                session = Session(random.getrandbits(64), touched=now)
+                self.sessions[session_id] = session
+                self.evict(now)
+            else:
+                session.touched = now
+                self.sessions.move_to_end(session_id)
+
+            live = self.live.get(session_id)
+
+            if live is not None and live[0] == session.version:
+                self.live.move_to_end(session_id)
+                return live[1], session.ui
+
+            game_being_played = self._restore(session)
+            self._keep_live(session_id, session.version, game_being_played)
+
+            return game_being_played, session.ui
+
+    def save(
+        self,
+        session_id: str,
+        game_being_played: Game,
+        ui: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Stores the round being played by a session and its front end
+        values, the Game stays live for the next load."""
+
+        with self.lock:
+            session = self.sessions.get(session_id)
+
+            if session is None:
+                session = Session(random.getrandbits(64))
+                self.sessions[session_id] = session
+
+            record = b""
+            if game_being_played.deal_order:
+                record = records.game_record(game_being_played)
+
+            if record != session.record:
+                session.record = record
+                session.version += 1
+
+            if ui is not None:
+                session.ui = ui
+
+            session.touched = self.clock()
+            self.sessions.move_to_end(session_id)
+
+            self._keep_live(session_id, session.version, game_being_played)
+            self.evict(session.touched)
+
+    def view(self, session_id: str, compute: Callable[[Game], T]) -> T:
+        """Returns compute(game) of a session, computed once per version of
+        its round, e.g. the labels and legal cards the front end shows."""
+
+        with self.lock:
+            session = self.sessions[session_id]
+
+            if session.view is not None and session.view[0] == session.version:
+                return session.view[1]
+
+            game_being_played, _ = self.load(session_id)
+            data = compute(game_being_played)
+            session.view = (session.version, data)
+
+            return data
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Drops idle sessions and the least recently used ones beyond
+        max_sessions. Returns the number of sessions dropped."""
+
+        with self.lock:
+            if now is None:
+                now = self.clock()
+
+            evicted = 0
+
+            while self.sessions:
+
+                session_id, session = next(iter(self.sessions.items()))
+
+                if (
+                    len(self.sessions) <= self.max_sessions
+                    and now - session.touched < self.idle_timeout
+                ):
+                    break
+
+                del self.sessions[session_id]
+                self.live.pop(session_id, None)
+                evicted += 1
+
+            return evicted
+
+    def _keep_live(self, session_id: str, version: int, game: Game) -> None:
+
+        self.live[session_id] = (version, game)
+        self.live.move_to_end(session_id)
+
+        while len(self.live) > self.live_size:
+            self.live.popitem(last=False)
+
+    def _restore(self, session: Session) -> Game:
+        """Rebuilds the Game of a session by replaying its record. The players
+        get an rng derived from the seed and version of the session."""
+
+        rng = random.Random(f"{session.seed}:{session.version}")
+        game_being_played = Game(*self.new_players(rng), rng)
+
+        if session.record:
+
+            deal_order = session.record[1 : 1 + records.DEAL_BYTES]
+            actions = session.record[1 + records.DEAL_BYTES :]
+
+            game_being_played.setup_game(list(deal_order))
+
+            for action in actions:
+                game_being_played.apply_action(action)
+
+        self.restores += 1
+
+        return game_being_played
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from . import engine
+from .game import Game
+from .player import Player
+
+
+@dataclass(frozen=True)
+class RoundResult:
+    """Outcome of a simulated round, indexed by seat (0 for player1).
+
+    trick_sequence holds (leader, card led, card followed, winner) for every
+    trick, with cards given as engine indices.
+    """
+
+    tricks: Tuple[int, int]
+    points: Tuple[int, int]
+    sevens: Tuple[int, int]
+    trick_sequence: Tuple[Tuple[int, int, int, int], ...]
+
+
+def simulate_round(
+    player1: Player,
+    player2: Player,
+    seed: Optional[int] = None,
+    decision_seed: Optional[int] = None,
+) -> RoundResult:
+    """Plays a full round without any output and returns its result.
+
+    Players that set engine_policy are run directly on the engine state, any
+    other players play through a silent Game. The seed fixes the deal, and for
+    engine players also every decision unless decision_seed is given, which
+    lets several rounds share a deal but not the choices made on it.
+    """
+
+    rng = random.Random(seed)
+
+    order = engine.shuffled_deck(rng)
+
+    if decision_seed is not None:
+        rng = random.Random(decision_seed)
+
+    if player1.engine_policy and player2.engine_policy:
+        return _simulate_state(player1, player2, order, rng)
+
+    return _simulate_game(player1, player2, order, rng)
+
+
+def _simulate_state(
+    player1: Player, player2: Player, order: List[int], rng: random.Random
+) -> RoundResult:
+
+    state = engine.GameState()
+    # nothing here looks at the hash, so its upkeep is skipped
+    state.deal(order, hashed=False)
+
+    players = (player1, player2)
+
+    # bound methods are looked up once, this loop runs 26 times per round
+    play = state.play
+    legal_moves = state.legal_moves
+    choose_play = (player1.choose_play, player2.choose_play)
+
+    while state.turns < 13:
+
+        card, ability_card = choose_play[state.turn](state, legal_moves(), rng)
+        play(card, ability_card)
+
+        if state.pending_discard:
+            state.discard(players[state.turn].choose_discard(state, rng))
+
+    return RoundResult(
+        tricks=(state.tricks[0], state.tricks[1]),
+        points=tuple(state.points()),
+        sevens=(state.sevens[0], state.sevens[1]),
+        trick_sequence=tuple(state.history),
+    )
+
+
+def _simulate_game(
+    player1: Player, player2: Player, order: List[int], rng: random.Random
+) -> RoundResult:
+
+    game = Game(player1, player2, rng)
+    game.setup_game(order)
+
+    def seat(player: Player) -> int:
+
+        return 0 if player == game.player1 else 1
+
+    trick_sequence = []
+
+    while game.turns < 13:
+
+        leader = seat(game.player_turn)
+
+        play1 = game.play_turn()
+        play2 = game.play_turn()
+
+        winner = game.finish_trick()
+
+        trick_sequence.append(
+            (leader, play1.card.index, play2.card.index, seat(winner))
+        )
+
+    sevens = tuple(
+        sum(1 for trick in player.tricks_won for card in trick if card.value == 7)
+        for player in (game.player1, game.player2)
+    )
+
+    return RoundResult(
+        tricks=(len(game.player1.tricks_won), len(game.player2.tricks_won)),
+        points=tuple(game.determine_points_end_round()),
+        sevens=sevens,
+        trick_sequence=tuple(trick_sequence),
+    )
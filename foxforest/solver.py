@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from . import engine
+from . import symmetry
+
+if TYPE_CHECKING:
+    from .tablebase import Tablebase
+
+
+# point difference player1 - player2 from the trick table, by player1 tricks
+TRICK_DIFFERENCE: Tuple[int, ...] = tuple(p1 - p2 for p1, p2 in engine.TRICK_POINTS)
+
+# TRICK_RANGE[tricks][remaining] is the (lowest, highest) trick table difference
+# still reachable with tricks won by player1 and remaining tricks to play
+TRICK_RANGE: Tuple[Tuple[Tuple[int, int], ...], ...] = tuple(
+    tuple(
+        (
+            min(TRICK_DIFFERENCE[tricks : tricks + remaining + 1]),
+            max(TRICK_DIFFERENCE[tricks : tricks + remaining + 1]),
+        )
+        for remaining in range(14 - tricks)
+    )
+    for tricks in range(14)
+)
+
+FIVES = engine.VALUE_MASKS[5]
+THREES = engine.VALUE_MASKS[3]
+NINES = engine.VALUE_MASKS[9]
+
+# cards without an ability, two of them held by the same player are
+# interchangeable when every card ranked between them has been played
+PLAIN = (
+    engine.VALUE_MASKS[2]
+    | engine.VALUE_MASKS[4]
+    | engine.VALUE_MASKS[6]
+    | engine.VALUE_MASKS[8]
+    | engine.VALUE_MASKS[10]
+)
+
+# transposition table flags
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+@dataclass(frozen=True)
+class Solution:
+    """Exact outcome of a position with both players playing optimally.
+
+    value is the final point difference player1 - player2, move the best move
+    for the player to act and line the optimal continuation from here.
+    """
+
+    value: int
+    move: Optional[engine.Move]
+    line: Tuple[engine.Move, ...]
+
+
+class Solver:
+    """Double dummy solver: both hands, the decree card and the order of the
+    deck are known, and the optimal round outcome is computed under the trick
+    points table plus one point per 7.
+
+    Alpha-beta search on the point difference player1 - player2, with a
+    transposition table and bounds on the points still reachable. Only the
+    trick count of player1 enters the table key, since sevens already won
+    add a constant to every continuation.
+
+    The transposition table may be shared between solvers and calls, which
+    pays off when solving many positions of the same round. With symmetric
+    set, positions are keyed by their canonical form, so positions that only
+    differ in the labelling of the suits share entries; a PositionCache keeps
+    such a table bounded and can be shared across rounds. With a tablebase
+    the positions after a move that it holds are looked up instead of
+    searched, the line then stops at its horizon.
+    """
+
+    def __init__(
+        self,
+        table: Optional[Union[Dict[tuple, tuple], symmetry.PositionCache]] = None,
+        tablebase: Optional[Tablebase] = None,
+        symmetric: bool = False,
+    ):
+
+        self.table: Union[Dict[tuple, tuple], symmetry.PositionCache] = (
+            {} if table is None else table
+        )
+        self.tablebase = tablebase
+        self.symmetric = symmetric
+        self.nodes = 0
+
+    def solve(self, state: engine.GameState) -> Solution:
+
+        state = state.copy()
+        sevens = state.sevens[0] - state.sevens[1]
+
+        value = sevens + self._mtdf(state)
+        line = self._line(state)
+
+        return Solution(value=value, move=line[0] if line else None, line=line)
+
+    def evaluate_moves(self, state: engine.GameState) -> Dict[engine.Move, int]:
+        """Returns the exact value of every legal move, for post-mortems."""
+
+        state = state.copy()
+        values = {}
+
+        for move in state.moves():
+
+            state.push(*move)
+            values[move] = (
+                state.sevens[0] - state.sevens[1] + self._search(state, -100, 100)
+            )
+            state.pop()
+
+        return values
+
+    def _line(self, state: engine.GameState) -> Tuple[engine.Move, ...]:
+
+        line: List[engine.Move] = []
+
+        while state.turns < 13:
+
+            key, permutation = self._position(state)
+            entry = self.table.get(key)
+
+            if entry is None or entry[2] is None:
+                break
+
+            move = symmetry.relabel_move(entry[2], symmetry.INVERSE[permutation])
+            line.append(move)
+            state.push(*move)
+
+        return tuple(line)
+
+    def _mtdf(self, state: engine.GameState, guess: int = 0) -> int:
+        """Finds the exact value with a series of zero window searches, which
+        prune far more than one wide window over the small range of values."""
+
+        lower = -100
+        upper = 100
+        value = guess
+
+        while lower < upper:
+
+            beta = value + 1 if value == lower else value
+            value = self._search(state, beta - 1, beta)
+
+            if value < beta:
+                upper = value
+            else:
+                lower = value
+
+        return value
+
+    def _search(self, state: engine.GameState, alpha: int, beta: int) -> int:
+        """Returns the point difference still to be gained: the trick table
+        difference at the end of the round plus the sevens won from here."""
+
+        self.nodes += 1
+
+        if state.turns >= 13:
+            return TRICK_DIFFERENCE[state.tricks[0]]
+
+        # the trick table and uncaptured sevens bound what is still reachable
+        lowest, highest = TRICK_RANGE[state.tricks[0]][13 - state.turns]
+        sevens_left = 3 - state.sevens[0] - state.sevens[1]
+        lowest -= sevens_left
+        highest += sevens_left
+
+        if lowest >= beta:
+            return lowest
+        if highest <= alpha:
+            return highest
+
+        key, permutation = self._position(state)
+        entry = self.table.get(key)
+        best_move = None
+
+        if entry is not None:
+
+            value, flag, best_move = entry
+            best_move = symmetry.relabel_move(best_move, symmetry.INVERSE[permutation])
+
+            if flag == EXACT:
+                return value
+            if flag == LOWER and value >= beta:
+                return value
+            if flag == UPPER and value <= alpha:
+                return value
+
+        original_alpha = alpha
+        original_beta = beta
+        maximizing = state.turn == 0
+        best = -100 if maximizing else 100
+
+        for move in _ordered(state, best_move):
+
+            before = state.sevens[0] - state.sevens[1]
+            state.push(*move)
+            gained = state.sevens[0] - state.sevens[1] - before
+
+            known = None
+            if self.tablebase is not None:
+                known = self.tablebase.value(state)
+
+            if known is None:
+                known = self._search(state, alpha - gained, beta - gained)
+
+            value = gained + known
+
+            state.pop()
+
+            if maximizing:
+                if value > best:
+                    best = value
+                    best_move = move
+                    if best > alpha:
+                        alpha = best
+            else:
+                if value < best:
+                    best = value
+                    best_move = move
+                    if best < beta:
+                        beta = best
+
+            if alpha >= beta:
+                break
+
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= original_beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+
+        self.table[key] = (best, flag, symmetry.relabel_move(best_move, permutation))
+
+        return best
+
+    def _position(self, state: engine.GameState) -> Tuple[tuple, int]:
+        """Returns the table key of state and the permutation of the suits
+        that the moves in its entry are stored under."""
+
+        if self.symmetric:
+            return symmetry.canonical(state)
+
+        return _key(state), symmetry.IDENTITY
+
+
+def _key(state: engine.GameState) -> tuple:
+
+    hands = state.hands
+
+    # the order of the deck only matters while a 5 can still draw from it,
+    # played from hand or taken from the decree with a 3
+    in_hands = hands[0] | hands[1]
+
+    if in_hands & FIVES or (FIVES >> state.decree & 1 and in_hands & THREES):
+        deck = tuple(state.deck[state.deck_pos : state.deck_pos + 3])
+    else:
+        deck = ()
+
+    return (
+        hands[0],
+        hands[1],
+        state.decree,
+        state.lead,
+        state.follow,
+        state.turn,
+        state.pending_discard,
+        state.tricks[0],
+        deck,
+    )
+
+
+def _representative(card: int, hand: int, live: int) -> int:
+    """Returns the lowest card of hand that is interchangeable with card.
+
+    live holds the cards still in play, including the current trick. A 9 only
+    compares values across suits, so an 8 and 10 are only interchangeable once
+    every 9 has been played.
+    """
+
+    if not PLAIN >> card & 1:
+        return card
+
+    while engine.CARD_VALUES[card] > 2:
+
+        between = card - 1
+        lower = card - 2
+
+        if live >> between & 1 or not hand >> lower & 1:
+            break
+
+        if engine.CARD_VALUES[between] == 9 and live & NINES:
+            break
+
+        card = lower
+
+    return card
+
+
+def _ordered(
+    state: engine.GameState, first: Optional[engine.Move]
+) -> List[engine.Move]:
+
+    hand = state.hands[state.turn]
+    live = ~state.played | state.trick
+
+    # keep one move of every set of interchangeable moves
+    moves = []
+    seen = set()
+
+    for card, ability_card in state.moves():
+
+        key = (
+            _representative(card, hand, live),
+            ability_card
+            if ability_card < 0
+            else _representative(ability_card, hand & ~(1 << card), live),
+        )
+
+        if key not in seen:
+            seen.add(key)
+            moves.append((card, ability_card))
+
+    # high cards first, exchanges of the decree card last
+    moves.sort(key=lambda move: (move[1] >= 0, -engine.CARD_VALUES[move[0]]))
+
+    if first is not None and first in moves:
+        moves.remove(first)
+        moves.insert(0, first)
+
+    return moves
+
+
+def solve_game(game) -> Solution:
+    """Solves the round a Game is in, with all hidden information revealed."""
+
+    return Solver().solve(game.to_state())
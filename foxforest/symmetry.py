@@ -0,0 +1,271 @@
+"""Suit symmetry of positions and a cache of positions keyed by it.
+
+The rules treat the three suits alike, except for the trump suit set by the
+decree card. Relabelling the suits of a position therefore changes neither
+its value nor the value of any move, as long as the moves are relabelled too.
+canonical() picks one labelling of every such class of positions: the trump
+suit becomes suit 0 and the other two suits are ordered by their cards.
+"""
+from __future__ import annotations
+
+import collections
+import itertools
+import threading
+from typing import Any
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+
+from . import engine
+
+
+############
+#
+# Relabelling
+#
+############
+
+# PERMUTATIONS[i][suit] is the suit that suit becomes under permutation i
+PERMUTATIONS: Tuple[Tuple[int, ...], ...] = tuple(
+    itertools.permutations(range(len(engine.SUITS)))
+)
+IDENTITY = 0
+
+INVERSE: Tuple[int, ...] = tuple(
+    PERMUTATIONS.index(tuple(permutation.index(suit) for suit in range(3)))
+    for permutation in PERMUTATIONS
+)
+
+# CARD_MAPS[i][card] is card relabelled by permutation i. The extra last entry
+# maps NO_CARD, which indexes it as -1, onto itself
+CARD_MAPS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(
+        permutation[engine.CARD_SUITS[card]] * engine.NUM_VALUES
+        + engine.CARD_VALUES[card]
+        - 1
+        for card in range(engine.NUM_CARDS)
+    )
+    + (engine.NO_CARD,)
+    for permutation in PERMUTATIONS
+)
+
+# OTHER_SUITS[trump] holds the two suits that are not trump, TRUMP_FIRST[trump]
+# the two permutations making trump suit 0 and keeping them in order or not
+OTHER_SUITS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(suit for suit in range(3) if suit != trump) for trump in range(3)
+)
+
+TRUMP_FIRST: Tuple[Tuple[int, ...], ...] = tuple(
+    (
+        PERMUTATIONS.index(
+            tuple(0 if suit == trump else 1 + others.index(suit) for suit in range(3))
+        ),
+        PERMUTATIONS.index(
+            tuple(0 if suit == trump else 2 - others.index(suit) for suit in range(3))
+        ),
+    )
+    for trump, others in enumerate(OTHER_SUITS)
+)
+
+FIVES = engine.VALUE_MASKS[5]
+THREES = engine.VALUE_MASKS[3]
+
+
+def relabel_mask(mask: int, permutation: int) -> int:
+
+    suits = PERMUTATIONS[permutation]
+    relabelled = 0
+
+    for suit in range(len(suits)):
+        chunk = mask >> engine.NUM_VALUES * suit & engine.SUIT_CHUNK
+        relabelled |= chunk << engine.NUM_VALUES * suits[suit]
+
+    return relabelled
+
+
+def relabel_move(move: engine.Move, permutation: int) -> engine.Move:
+    """Relabels the cards of a move, the ability card may be NO_CARD or
+    DISCARD."""
+
+    if permutation == IDENTITY:
+        return move
+
+    cards = CARD_MAPS[permutation]
+    card, ability_card = move
+
+    return cards[card], cards[ability_card] if ability_card >= 0 else ability_card
+
+
+def relabel(state: engine.GameState, permutation: int) -> engine.GameState:
+    """Returns a copy of state with the suits relabelled by permutation."""
+
+    cards = CARD_MAPS[permutation]
+    state = state.copy()
+
+    state.hands = [relabel_mask(hand, permutation) for hand in state.hands]
+    state.deck = [cards[card] for card in state.deck]
+    state.decree = cards[state.decree]
+    state.trick = relabel_mask(state.trick, permutation)
+    state.lead = cards[state.lead]
+    state.follow = cards[state.follow]
+    state.played = relabel_mask(state.played, permutation)
+    state.history = [
+        (leader, cards[lead], cards[follow], winner)
+        for leader, lead, follow, winner in state.history
+    ]
+    state.rehash()
+
+    return state
+
+
+############
+#
+# Canonical form
+#
+############
+
+
+def _key(state: engine.GameState, permutation: int) -> tuple:
+
+    cards = CARD_MAPS[permutation]
+    hands = state.hands
+
+    # the order of the deck only matters while a 5 can still draw from it,
+    # played from hand or taken from the decree with a 3
+    in_hands = hands[0] | hands[1]
+
+    if in_hands & FIVES or (FIVES >> state.decree & 1 and in_hands & THREES):
+        deck = tuple(
+            cards[card] for card in state.deck[state.deck_pos : state.deck_pos + 3]
+        )
+    else:
+        deck = ()
+
+    return (
+        relabel_mask(hands[0], permutation),
+        relabel_mask(hands[1], permutation),
+        cards[state.decree],
+        cards[state.lead],
+        cards[state.follow],
+        state.turn,
+        state.pending_discard,
+        state.tricks[0],
+        deck,
+    )
+
+
+def canonical(state: engine.GameState) -> Tuple[tuple, int]:
+    """Returns the key of the class of positions state belongs to and the
+    permutation that relabels state into its canonical form.
+
+    The key holds what the rest of the round depends on, like the keys of the
+    Solver: points already won are left out, so the values stored under it
+    must be the points still to be gained. Moves relabelled with the
+    permutation are moves of the canonical form, relabel them back with the
+    INVERSE permutation.
+    """
+
+    trump = engine.CARD_SUITS[state.decree]
+    first, second = OTHER_SUITS[trump]
+    straight, crossed = TRUMP_FIRST[trump]
+
+    hands = state.hands
+    first_cards = [
+        hand >> engine.NUM_VALUES * first & engine.SUIT_CHUNK for hand in hands
+    ]
+    second_cards = [
+        hand >> engine.NUM_VALUES * second & engine.SUIT_CHUNK for hand in hands
+    ]
+
+    if first_cards < second_cards:
+        return _key(state, straight), straight
+
+    if second_cards < first_cards:
+        return _key(state, crossed), crossed
+
+    # both suits hold the same cards, the rest of the position decides
+    return min((_key(state, straight), straight), (_key(state, crossed), crossed))
+
+
+def canonical_key(state: engine.GameState) -> tuple:
+
+    return canonical(state)[0]
+
+
+############
+#
+# Cache
+#
+############
+
+
+_MISSING = object()
+
+
+class PositionCache:
+    """Least recently used cache of values by canonical position key.
+
+    A cache may be shared by any number of bots and solvers, also across
+    threads: every position it has seen in any labelling of the suits is a
+    hit. Values are stored as given, store moves in the labelling of the
+    canonical form, see canonical.
+
+    Args:
+        max_size (int): entries kept at most
+    """
+
+    def __init__(self, max_size: int = 1 << 20):
+
+        self.max_size = max_size
+        self.entries: "collections.OrderedDict[Hashable, Any]" = (
+            collections.OrderedDict()
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+
+        return key in self.entries
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+
+        with self.lock:
+            value = self.entries.get(key, _MISSING)
+
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+
+        lookups = self.hits + self.misses
+
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,357 @@
+"""Endgame tablebase of the exact values of the last tricks of a round.
+
+Build one with
+
+    python -m foxforest.tablebase endgame.fxtb --tricks 1
+
+and pass Tablebase("endgame.fxtb") to a Solver or an ISMCTS. The file is
+memory mapped, so opening it costs nothing and processes reading the same file
+share one copy through the page cache.
+
+The default of one trick builds in a fraction of a second but only holds the
+last trick, which a search plays out almost as fast as it looks it up, so it
+is mostly useful for tests. --tricks 2 is the smallest useful horizon and
+takes about half an hour and 171 MB to build. Positions in which a 5 can still
+draw are not stored at any horizon, and three or more tricks are out of reach
+of this generator.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import math
+import os
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from . import engine
+from . import vectorized
+from .solver import TRICK_DIFFERENCE
+
+
+############
+#
+# Layout
+#
+############
+
+# the file is a HEADER_BYTES header followed by one int8 level per number of
+# tricks remaining, 1 trick first. A level holds the value of every position
+# at the start of a trick: the trick table difference player1 - player2 at the
+# end of the round plus the sevens player1 wins from here minus those player2
+# wins, with both players playing optimally. See Solver._search.
+MAGIC = b"FXTB"
+VERSION = 1
+HEADER_BYTES = 16
+
+# value of positions that are not stored, where a 5 could still draw from the
+# deck and the value would depend on its order
+MISSING = -128
+
+FIVES = engine.VALUE_MASKS[5]
+THREES = engine.VALUE_MASKS[3]
+
+# COMBINATIONS[n][k] is n choose k
+COMBINATIONS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(math.comb(n, k) for k in range(engine.NUM_CARDS + 1))
+    for n in range(engine.NUM_CARDS + 1)
+)
+
+
+def level_shape(tricks: int) -> Tuple[int, int, int, int, int]:
+    """Returns the dimensions of a level: hands of player1, hands of player2
+    from the remaining cards, decree cards, leaders and tricks won."""
+
+    return (
+        COMBINATIONS[engine.NUM_CARDS][tricks],
+        COMBINATIONS[engine.NUM_CARDS - tricks][tricks],
+        engine.NUM_CARDS - 2 * tricks,
+        2,
+        14 - tricks,
+    )
+
+
+def level_size(tricks: int) -> int:
+
+    return math.prod(level_shape(tricks))
+
+
+def needs_deck(hand1: int, hand2: int, decree: int, tricks: int) -> bool:
+    """A 5 played before the last trick draws a card from the deck, which
+    makes the value depend on the order of the deck. A 3 can take a 5 that
+    is the decree card into hand."""
+
+    if tricks < 2:
+        return False
+
+    cards = hand1 | hand2
+
+    return bool(cards & FIVES or (FIVES >> decree & 1 and cards & THREES))
+
+
+def _compressed(card: int, removed: int) -> int:
+
+    return card - engine.popcount(removed & ((1 << card) - 1))
+
+
+def _rank(hand: int, removed: int) -> int:
+    """Ranks a hand among the hands of the same size drawn from the cards not
+    in removed, in the combinatorial number system."""
+
+    rank = 0
+
+    for size, card in enumerate(engine.iter_cards(hand), 1):
+        rank += COMBINATIONS[_compressed(card, removed)][size]
+
+    return rank
+
+
+def position_base(hand1: int, hand2: int, decree: int, leader: int) -> int:
+    """Returns the offset within its level of the position with player1 on 0
+    tricks, the following entries hold 1, 2, ... tricks won."""
+
+    tricks = engine.popcount(hand1)
+    _, hands2, decrees, leaders, tricks_won = level_shape(tricks)
+
+    index = _rank(hand1, 0) * hands2 + _rank(hand2, hand1)
+    index = index * decrees + _compressed(decree, hand1 | hand2)
+
+    return (index * leaders + leader) * tricks_won
+
+
+############
+#
+# Generation
+#
+############
+
+
+def _first_level() -> npt.NDArray:
+    """Values of the last trick, computed for all positions at once."""
+
+    cards = np.arange(engine.NUM_CARDS)
+    hand1, hand2, decree = np.meshgrid(cards, cards, cards, indexing="ij")
+
+    distinct = (hand1 != hand2) & (hand1 != decree) & (hand2 != decree)
+    hand1, hand2, decree = hand1[distinct], hand2[distinct], decree[distinct]
+
+    base = (hand1 * level_shape(1)[1] + hand2 - (hand1 < hand2)) * level_shape(1)[2] + (
+        decree - (hand1 < decree) - (hand2 < decree)
+    )
+
+    trump = vectorized.CARD_SUITS[decree]
+    sevens = (vectorized.CARD_VALUES[hand1] == 7).astype(np.int8) + (
+        vectorized.CARD_VALUES[hand2] == 7
+    )
+    difference = np.array(TRICK_DIFFERENCE, dtype=np.int8)
+
+    values = np.empty(level_shape(1), dtype=np.int8).reshape(-1, 2, 13)
+
+    for leader in (0, 1):
+
+        lead, follow = (hand1, hand2) if leader == 0 else (hand2, hand1)
+
+        # the winner relative to the leader, 0 if the card led wins
+        won = (vectorized.TRICK_WINNER[lead, follow, trump] ^ leader) == 0
+
+        gained = np.where(won, sevens, -sevens)
+        tricks_won = np.arange(13)[None, :] + won[:, None]
+
+        values[base, leader] = difference[tricks_won] + gained[:, None]
+
+    return values.reshape(-1)
+
+
+def solve_position(
+    previous: npt.NDArray, hand1: int, hand2: int, decree: int, leader: int
+) -> npt.NDArray:
+    """Returns the values of a position with k tricks remaining for every
+    number of tricks won by player1, by playing out the first trick and
+    looking the positions after it up in previous, the level of k - 1 tricks.
+    """
+
+    tricks = engine.popcount(hand1)
+
+    state = engine.GameState()
+    state.hands = [hand1, hand2]
+    state.decree = decree
+    state.turn = leader
+    state.turns = 13 - tricks
+    state.played = ((1 << engine.NUM_CARDS) - 1) & ~(hand1 | hand2 | 1 << decree)
+
+    width = 14 - tricks
+    lead_values = []
+
+    for lead in state.moves():
+
+        state.push(*lead)
+        follow_values = []
+
+        for follow in state.moves():
+
+            state.push(*follow)
+
+            hands = state.hands
+            base = position_base(hands[0], hands[1], state.decree, state.turn)
+            start = base + state.tricks[0]
+
+            follow_values.append(
+                previous[start : start + width] + (state.sevens[0] - state.sevens[1])
+            )
+
+            state.pop()
+
+        state.pop()
+
+        # the follower is the other seat, player1 maximizes
+        combine = np.max if leader == 1 else np.min
+        lead_values.append(combine(follow_values, axis=0))
+
+    combine = np.max if leader == 0 else np.min
+
+    return combine(lead_values, axis=0).astype(np.int8)
+
+
+def _next_level(previous: npt.NDArray, tricks: int) -> npt.NDArray:
+
+    values = np.full(level_size(tricks), MISSING, dtype=np.int8)
+    width = 14 - tricks
+    everything = (1 << engine.NUM_CARDS) - 1
+
+    for hand1 in _hands(everything, tricks):
+        for hand2 in _hands(everything & ~hand1, tricks):
+            for decree in engine.iter_cards(everything & ~hand1 & ~hand2):
+
+                if needs_deck(hand1, hand2, decree, tricks):
+                    continue
+
+                for leader in (0, 1):
+                    base = position_base(hand1, hand2, decree, leader)
+                    values[base : base + width] = solve_position(
+                        previous, hand1, hand2, decree, leader
+                    )
+
+    return values
+
+
+def _hands(cards: int, size: int) -> Iterator[int]:
+
+    for combination in itertools.combinations(engine.iter_cards(cards), size):
+        yield engine.cards_to_mask(combination)
+
+
+def generate(path: str, tricks: int = 1) -> None:
+    """Solves every position with tricks or fewer tricks remaining and writes
+    the tablebase to path.
+
+    One trick takes a fraction of a second and 0.85 MB, but saves a search
+    next to nothing, see the module docstring. Every further level is solved
+    position by position from the one before it and grows quickly: two tricks
+    take about half an hour and 171 MB, three would take days and 13 GB.
+    """
+
+    levels: List[npt.NDArray] = [_first_level()]
+
+    while len(levels) < tricks:
+        levels.append(_next_level(levels[-1], len(levels) + 1))
+
+    header = MAGIC + bytes((VERSION, tricks))
+    header += bytes(HEADER_BYTES - len(header))
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+
+    with open(temporary, "wb") as file:
+        file.write(header)
+        for level in levels:
+            level.tofile(file)
+
+    os.replace(temporary, path)
+
+
+############
+#
+# Lookup
+#
+############
+
+
+class Tablebase:
+    """A tablebase file opened with mmap. Lookups read single bytes, so only
+    the pages touched are ever read from disk."""
+
+    def __init__(self, path: str):
+
+        with open(path, "rb") as file:
+            header = file.read(HEADER_BYTES)
+
+        if header[:4] != MAGIC or header[4] != VERSION:
+            raise ValueError(f"{path} is not a tablebase")
+
+        self.path = path
+        self.tricks = header[5]
+        self.values = np.memmap(path, dtype=np.int8, mode="r", offset=HEADER_BYTES)
+
+        # start of the level of every number of tricks remaining
+        self.offsets = [0, 0]
+        for tricks in range(1, self.tricks + 1):
+            self.offsets.append(self.offsets[-1] + level_size(tricks))
+
+        if len(self.values) != self.offsets[-1]:
+            raise ValueError(f"{path} is truncated")
+
+    def lookup(
+        self, hand1: int, hand2: int, decree: int, leader: int, tricks_won: int
+    ) -> Optional[int]:
+        """Returns the value of a position at the start of a trick, None if
+        the tablebase does not hold it."""
+
+        tricks = engine.popcount(hand1)
+
+        if not 0 < tricks <= self.tricks:
+            return None
+
+        index = (
+            self.offsets[tricks]
+            + position_base(hand1, hand2, decree, leader)
+            + tricks_won
+        )
+        value = int(self.values[index])
+
+        return None if value == MISSING else value
+
+    def value(self, state: engine.GameState) -> Optional[int]:
+        """Returns the value of a state, see lookup. Only states between
+        tricks are held."""
+
+        if state.lead >= 0 or state.pending_discard:
+            return None
+
+        return self.lookup(
+            state.hands[0], state.hands[1], state.decree, state.turn, state.tricks[0]
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="file to write the tablebase to")
+    parser.add_argument(
+        "--tricks",
+        type=int,
+        default=1,
+        help="tricks remaining covered, 2 takes about half an hour",
+    )
+
+    args = parser.parse_args(argv)
+
+    generate(args.path, args.tricks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import itertools
+import multiprocessing
+import os
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from .player import Player
+from .simulate import simulate_round
+
+
+# a player entry is a Player subclass, or any picklable callable taking a name
+PlayerFactory = Callable[[str], Player]
+
+# columns of the result buffers, counted from the point of view of the first
+# player of a pairing
+STATS = (
+    "rounds",
+    "wins",
+    "losses",
+    "draws",
+    "points",
+    "opponent_points",
+    "tricks",
+    "opponent_tricks",
+    "sevens",
+    "opponent_sevens",
+)
+
+_STAT_INDEX = {name: position for position, name in enumerate(STATS)}
+
+
+@dataclass
+class TournamentResult:
+    """Aggregated round robin results.
+
+    stats has one row per pairing and one column per entry of STATS, seen from
+    the first player of the pairing.
+    """
+
+    names: List[str]
+    pairings: List[Tuple[int, int]]
+    stats: npt.NDArray
+
+    def stat(self, pairing: int, name: str) -> int:
+
+        return int(self.stats[pairing, _STAT_INDEX[name]])
+
+    def standings(self) -> List[Tuple[str, int, int, float]]:
+        """Returns (name, rounds, wins, average points) per player, sorted by
+        average points."""
+
+        totals = np.zeros((len(self.names), 3), dtype=np.int64)
+
+        for pairing, (first, second) in enumerate(self.pairings):
+
+            rounds = self.stat(pairing, "rounds")
+
+            totals[first] += (
+                rounds,
+                self.stat(pairing, "wins"),
+                self.stat(pairing, "points"),
+            )
+            totals[second] += (
+                rounds,
+                self.stat(pairing, "losses"),
+                self.stat(pairing, "opponent_points"),
+            )
+
+        standings = [
+            (name, int(rounds), int(wins), float(points) / max(int(rounds), 1))
+            for name, (rounds, wins, points) in zip(self.names, totals)
+        ]
+
+        return sorted(standings, key=lambda entry: entry[3], reverse=True)
+
+
+def spawn_seeds(seed: Optional[int], count: int) -> List[int]:
+    """Returns count independent seeds for the chunks of a match, from a numpy
+    SeedSequence so they do not depend on how the chunks are scheduled."""
+
+    return [
+        int(child.generate_state(1, np.uint64)[0])
+        for child in np.random.SeedSequence(seed).spawn(count)
+    ]
+
+
+def create_players(
+    first: PlayerFactory, second: PlayerFactory, rng: np.random.Generator
+) -> Tuple[Player, Player]:
+    """Creates the two players of a chunk and seeds them from rng, which makes
+    the chunk reproducible without touching the global random module."""
+
+    players = (first("player a"), second("player b"))
+
+    for player in players:
+        player.seed(int(rng.integers(2**63)))
+
+    return players
+
+
+def _play_chunk(
+    task: Tuple[str, Tuple[int, ...], int, PlayerFactory, PlayerFactory, int, int]
+) -> None:
+
+    memory_name, shape, row, first, second, rounds, seed = task
+
+    rng = np.random.default_rng(seed)
+    player_a, player_b = create_players(first, second, rng)
+
+    totals = np.zeros(len(STATS), dtype=np.int64)
+
+    for number, round_seed in enumerate(rng.integers(2**63, size=rounds)):
+
+        # alternate seats, so neither player always leads the first trick
+        if number % 2 == 0:
+            result = simulate_round(player_a, player_b, int(round_seed))
+            seat_a, seat_b = 0, 1
+        else:
+            result = simulate_round(player_b, player_a, int(round_seed))
+            seat_a, seat_b = 1, 0
+
+        points_a = result.points[seat_a]
+        points_b = result.points[seat_b]
+
+        totals += (
+            1,
+            points_a > points_b,
+            points_a < points_b,
+            points_a == points_b,
+            points_a,
+            points_b,
+            result.tricks[seat_a],
+            result.tricks[seat_b],
+            result.sevens[seat_a],
+            result.sevens[seat_b],
+        )
+
+    # pool workers share the resource tracker of the parent, which owns and
+    # unlinks the block
+    memory = shared_memory.SharedMemory(name=memory_name)
+
+    try:
+        buffer = np.ndarray(shape, dtype=np.int64, buffer=memory.buf)
+        buffer[row] = totals
+        del buffer
+    finally:
+        memory.close()
+
+
+def round_robin(
+    players: Sequence[PlayerFactory],
+    rounds_per_pairing: int,
+    seed: Optional[int] = None,
+    processes: Optional[int] = None,
+    chunk_size: int = 1000,
+    names: Optional[Sequence[str]] = None,
+) -> TournamentResult:
+    """Plays every pair of players against each other across a process pool.
+
+    Every pairing is split into chunks of at most chunk_size rounds. Each chunk
+    runs in a worker with its own seed from a numpy SeedSequence, and writes
+    its totals into its own row of a shared memory buffer, so no per round
+    objects are sent back.
+
+    Args:
+        players (Sequence[PlayerFactory]): Player subclasses or picklable
+            callables that create a player from a name
+        rounds_per_pairing (int): rounds played by every pair of players
+        seed (Optional[int]): seed of the whole tournament
+        processes (Optional[int]): worker processes, all cores by default,
+            1 runs everything in the calling process
+        chunk_size (int): rounds per task
+        names (Optional[Sequence[str]]): names reported in the result
+    """
+
+    if names is None:
+        names = [getattr(player, "__name__", repr(player)) for player in players]
+
+    pairings = list(itertools.combinations(range(len(players)), 2))
+
+    chunks = [
+        (pairing, min(chunk_size, rounds_per_pairing - start))
+        for pairing in range(len(pairings))
+        for start in range(0, rounds_per_pairing, chunk_size)
+    ]
+
+    seeds = spawn_seeds(seed, len(chunks))
+
+    shape = (max(len(chunks), 1), len(STATS))
+    memory = shared_memory.SharedMemory(
+        create=True, size=int(np.prod(shape)) * np.dtype(np.int64).itemsize
+    )
+
+    try:
+        buffer = np.ndarray(shape, dtype=np.int64, buffer=memory.buf)
+        buffer[:] = 0
+
+        tasks = [
+            (
+                memory.name,
+                shape,
+                row,
+                players[pairings[pairing][0]],
+                players[pairings[pairing][1]],
+                rounds,
+                chunk_seed,
+            )
+            for row, ((pairing, rounds), chunk_seed) in enumerate(zip(chunks, seeds))
+        ]
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        if processes == 1:
+            for task in tasks:
+                _play_chunk(task)
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                pool.map(_play_chunk, tasks, chunksize=1)
+
+        stats = np.zeros((len(pairings), len(STATS)), dtype=np.int64)
+        np.add.at(stats, [pairing for pairing, _ in chunks], buffer[: len(chunks)])
+
+        del buffer
+
+    finally:
+        memory.close()
+        memory.unlink()
+
+    return TournamentResult(names=list(names), pairings=pairings, stats=stats)
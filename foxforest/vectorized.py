@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from . import engine
+
+
+############
+#
+# Card tables as arrays
+#
+############
+
+CARD_VALUES = np.array(engine.CARD_VALUES, dtype=np.int8)
+CARD_SUITS = np.array(engine.CARD_SUITS, dtype=np.int8)
+
+# SUIT_CARDS[s] is a (33,) bool row selecting the cards of suit s
+SUIT_CARDS = CARD_SUITS[None, :] == np.arange(len(engine.SUITS))[:, None]
+
+TRICK_POINTS = np.array(engine.TRICK_POINTS, dtype=np.int8)
+
+# (33, 33, 3) array indexed by card led, card followed and trump suit
+TRICK_WINNER = np.array(engine.TRICK_WINNER, dtype=np.int8)
+
+# length of the deck array, the 6 cards left after dealing plus one discard
+# for each of the three 5s
+DECK_SIZE = engine.NUM_CARDS - 27 + 3
+
+
+def batch_legal_moves(hands: npt.NDArray, lead: npt.NDArray) -> npt.NDArray:
+    """Returns the (M, 33) mask of legal cards for M hands at once.
+
+    Args:
+        hands (npt.NDArray): (M, 33) bool matrix of cards held
+        lead (npt.NDArray): (M,) index of the card led, or engine.NO_CARD
+    """
+
+    leading = lead < 0
+    lead_suit = CARD_SUITS[np.where(leading, 0, lead)]
+
+    follow = hands & SUIT_CARDS[lead_suit]
+    can_follow = follow.any(axis=1) & ~leading
+
+    legal = np.where(can_follow[:, None], follow, hands)
+
+    # an 11 forces the 1 or the highest card of the suit
+    eleven = can_follow & (CARD_VALUES[np.where(leading, 0, lead)] == 11)
+
+    if eleven.any():
+        rows = np.flatnonzero(eleven)
+        forced = follow[rows] & (CARD_VALUES == 1)
+        highest = engine.NUM_CARDS - 1 - np.argmax(follow[rows, ::-1], axis=1)
+        forced[np.arange(len(rows)), highest] = True
+        legal[rows] = forced
+
+    return legal
+
+
+def batch_trick_winner(
+    lead: npt.NDArray, follow: npt.NDArray, trump_suit: npt.NDArray
+) -> npt.NDArray:
+    """Returns 1 where the following card wins the trick and 0 where the card
+    led wins, looked up in TRICK_WINNER."""
+
+    return TRICK_WINNER[lead, follow, trump_suit]
+
+
+# bytes holding one action mask
+ACTION_BYTES = (engine.NUM_ACTIONS + 7) // 8
+
+
+def action_masks(masks: Sequence[int]) -> npt.NDArray:
+    """Unpacks engine action masks into an (M, NUM_ACTIONS) bool matrix."""
+
+    data = b"".join(mask.to_bytes(ACTION_BYTES, "little") for mask in masks)
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(len(masks), ACTION_BYTES)
+
+    bits = np.unpackbits(rows, axis=1, bitorder="little")
+
+    return bits[:, : engine.NUM_ACTIONS].astype(bool)
+
+
+def batch_legal_actions(
+    hands: npt.NDArray, lead: npt.NDArray, pending_discard: npt.NDArray
+) -> npt.NDArray:
+    """Returns the (M, NUM_ACTIONS) mask of legal actions for M hands at once,
+    following engine.legal_actions.
+
+    Args:
+        hands (npt.NDArray): (M, 33) bool matrix of cards held
+        lead (npt.NDArray): (M,) index of the card led, or engine.NO_CARD
+        pending_discard (npt.NDArray): (M,) bool, True where a discard is due
+    """
+
+    playing = ~pending_discard
+    legal = batch_legal_moves(hands, lead) & playing[:, None]
+
+    actions = np.zeros((len(hands), engine.NUM_ACTIONS), dtype=bool)
+    actions[:, : engine.NUM_CARDS] = legal
+
+    for suit in range(len(engine.SUITS)):
+
+        three = suit * engine.NUM_VALUES + 2
+        start = engine.SWAP_OFFSET + suit * engine.NUM_CARDS
+
+        swaps = hands & legal[:, three, None]
+        swaps[:, three] = False
+        actions[:, start : start + engine.NUM_CARDS] = swaps
+
+    actions[:, engine.DISCARD_OFFSET :] = hands & pending_discard[:, None]
+
+    return actions
+
+
+############
+#
+# Policies
+#
+############
+
+
+class BatchPolicy:
+    """Decides the moves of one seat for a subset of the rounds in a batch.
+
+    rows holds the indices of the rounds in which this seat has to act.
+    """
+
+    def choose_play(
+        self, batch: BatchGame, rows: npt.NDArray, legal: npt.NDArray
+    ) -> Tuple[npt.NDArray, npt.NDArray]:
+        """Returns the cards to play and the cards to exchange with the decree
+        card when a 3 is played, engine.NO_CARD to not use the ability."""
+
+        raise NotImplementedError
+
+    def choose_discard(
+        self, batch: BatchGame, rows: npt.NDArray, hands: npt.NDArray
+    ) -> npt.NDArray:
+
+        raise NotImplementedError
+
+
+def random_choice(rng: np.random.Generator, mask: npt.NDArray) -> npt.NDArray:
+    """Picks one True column uniformly in every row of a bool matrix."""
+
+    return np.argmax(np.where(mask, rng.random(mask.shape), -1.0), axis=1)
+
+
+class RandomBatchPolicy(BatchPolicy):
+    """Plays and discards uniformly at random, like RandomPlayer."""
+
+    def choose_play(
+        self, batch: BatchGame, rows: npt.NDArray, legal: npt.NDArray
+    ) -> Tuple[npt.NDArray, npt.NDArray]:
+
+        cards = random_choice(batch.rng, legal)
+
+        return cards, np.full(len(rows), engine.NO_CARD)
+
+    def choose_discard(
+        self, batch: BatchGame, rows: npt.NDArray, hands: npt.NDArray
+    ) -> npt.NDArray:
+
+        return random_choice(batch.rng, hands)
+
+
+############
+#
+# Batched game
+#
+############
+
+
+@dataclass
+class BatchResult:
+    """Per round outcome of a batch, every array has a first axis of length N
+    and a second axis indexed by seat."""
+
+    tricks: npt.NDArray
+    points: npt.NDArray
+    sevens: npt.NDArray
+
+
+class BatchGame:
+    """Advances N independent rounds in lockstep, one trick at a time.
+
+    All state is kept as structure-of-arrays: hands[seat] is an (N, 33) bool
+    matrix, decree and leader are (N,) arrays.
+    """
+
+    def __init__(self, n: int, rng: Optional[np.random.Generator] = None):
+
+        self.n = n
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.rows = np.arange(n)
+
+        self.hands = np.zeros((2, n, engine.NUM_CARDS), dtype=bool)
+        self.deck = np.zeros((n, DECK_SIZE), dtype=np.int8)
+        self.deck_pos = np.zeros(n, dtype=np.int8)
+        self.deck_len = np.zeros(n, dtype=np.int8)
+        self.decree = np.zeros(n, dtype=np.int8)
+        self.leader = np.zeros(n, dtype=np.int8)
+        self.tricks = np.zeros((n, 2), dtype=np.int8)
+        self.sevens = np.zeros((n, 2), dtype=np.int8)
+        self.turns = 0
+
+    @property
+    def trump_suit(self) -> npt.NDArray:
+
+        return CARD_SUITS[self.decree]
+
+    def deal(self, orders: Optional[npt.NDArray] = None) -> None:
+        """Deals every round like Game.setup_game, from an (N, 33) array of
+        card orders or from fresh shuffles."""
+
+        if orders is None:
+            orders = np.argsort(self.rng.random((self.n, engine.NUM_CARDS)), axis=1)
+
+        rows = self.rows[:, None]
+
+        self.hands[:] = False
+        self.hands[0, rows, orders[:, :13]] = True
+        self.hands[1, rows, orders[:, 13:26]] = True
+        self.decree[:] = orders[:, 26]
+
+        self.deck[:] = 0
+        self.deck[:, : engine.NUM_CARDS - 27] = orders[:, 27:]
+        self.deck_pos[:] = 0
+        self.deck_len[:] = engine.NUM_CARDS - 27
+
+        self.leader[:] = 0
+        self.tricks[:] = 0
+        self.sevens[:] = 0
+        self.turns = 0
+
+    def _play(
+        self,
+        seats: npt.NDArray,
+        lead: npt.NDArray,
+        policies: Sequence[BatchPolicy],
+    ) -> npt.NDArray:
+
+        cards = np.empty(self.n, dtype=np.int8)
+
+        for seat, policy in enumerate(policies):
+
+            rows = np.flatnonzero(seats == seat)
+
+            if len(rows) == 0:
+                continue
+
+            hands = self.hands[seat]
+            legal = batch_legal_moves(hands[rows], lead[rows])
+            chosen, swaps = policy.choose_play(self, rows, legal)
+
+            hands[rows, chosen] = False
+            cards[rows] = chosen
+
+            values = CARD_VALUES[chosen]
+
+            # if 3 played and ability used, exchange decree card with ability card
+            swapping = (values == 3) & (swaps >= 0)
+
+            if swapping.any():
+                swap_rows = rows[swapping]
+                hands[swap_rows, swaps[swapping]] = False
+                hands[swap_rows, self.decree[swap_rows]] = True
+                self.decree[swap_rows] = swaps[swapping]
+
+            # if 5 is played, draw the top card of the deck and discard a card
+            drawing = values == 5
+
+            if drawing.any():
+                draw_rows = rows[drawing]
+                hands[draw_rows, self.deck[draw_rows, self.deck_pos[draw_rows]]] = True
+                self.deck_pos[draw_rows] += 1
+
+                discards = policy.choose_discard(self, draw_rows, hands[draw_rows])
+                hands[draw_rows, discards] = False
+                self.deck[draw_rows, self.deck_len[draw_rows]] = discards
+                self.deck_len[draw_rows] += 1
+
+        return cards
+
+    def play_trick(self, policies: Sequence[BatchPolicy]) -> None:
+
+        no_lead = np.full(self.n, engine.NO_CARD, dtype=np.int8)
+
+        leader = self.leader
+        follower = leader ^ 1
+
+        lead = self._play(leader, no_lead, policies)
+        follow = self._play(follower, lead, policies)
+
+        winner = leader ^ batch_trick_winner(lead, follow, self.trump_suit)
+
+        self.tricks[self.rows, winner] += 1
+        self.sevens[self.rows, winner] += (CARD_VALUES[lead] == 7).astype(np.int8) + (
+            CARD_VALUES[follow] == 7
+        )
+
+        # winner leads, unless a 1 was played but did not win the trick
+        losing_card = np.where(winner == leader, follow, lead)
+        self.leader = np.where(CARD_VALUES[losing_card] == 1, winner ^ 1, winner)
+        self.leader = self.leader.astype(np.int8)
+
+        self.turns += 1
+
+    def points(self) -> npt.NDArray:
+
+        return TRICK_POINTS[self.tricks[:, 0]] + self.sevens
+
+    def play_round(
+        self,
+        policy1: Optional[BatchPolicy] = None,
+        policy2: Optional[BatchPolicy] = None,
+    ) -> BatchResult:
+
+        policies = (
+            RandomBatchPolicy() if policy1 is None else policy1,
+            RandomBatchPolicy() if policy2 is None else policy2,
+        )
+
+        while self.turns < 13:
+            self.play_trick(policies)
+
+        return BatchResult(
+            tricks=self.tricks.copy(), points=self.points(), sevens=self.sevens.copy()
+        )
+
+
+def simulate_rounds(
+    n: int,
+    seed: Optional[int] = None,
+    policy1: Optional[BatchPolicy] = None,
+    policy2: Optional[BatchPolicy] = None,
+    batch_size: int = 65536,
+) -> BatchResult:
+    """Plays n rounds in lockstep batches and returns the per round results."""
+
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for start in range(0, n, batch_size):
+
+        batch = BatchGame(min(batch_size, n - start), rng)
+        batch.deal()
+        results.append(batch.play_round(policy1, policy2))
+
+    return BatchResult(
+        tricks=np.concatenate([result.tricks for result in results]),
+        points=np.concatenate([result.points for result in results]),
+        sevens=np.concatenate([result.sevens for result in results]),
+    )
@@ -1,223 +1,240 @@
+import uuid
+from typing import Optional
+
 import streamlit as st
 import foxforest as ff
-import streamlit as st
-import pandas as pd
-import numpy as np
+from foxforest.sessions import SessionStore
 
-# set up the players and game objects as persistent variables
 
-if "game" not in st.session_state:
+# the games of all sessions are kept in one bounded store shared by the
+# sessions, st.session_state only holds the id of the session
 
-    p1 = ff.player.StreamlitPlayer("Human")
-    p2 = ff.player.RandomPlayer("Computer 1")
-    game = ff.Game(p1, p2)
 
-    setattr(st.session_state, "game", game)
+@st.experimental_singleton
+def session_store() -> SessionStore:
 
-if "game_state" not in st.session_state:
+    return SessionStore(
+        lambda rng: (
+            ff.player.StreamlitPlayer("Human"),
+            ff.player.RandomPlayer("Computer 1", rng),
+        )
+    )
 
-    setattr(st.session_state, "game_state", "not_initialised")
 
-if "proposed_play" not in st.session_state:
+store = session_store()
 
-    setattr(st.session_state, "proposed_play", None)
+if "session_id" not in st.session_state:
 
+    setattr(st.session_state, "session_id", uuid.uuid4().hex)
 
-def st_select_card_button(play: ff.game.Play, game: ff.Game, state) -> None:
+session_id = st.session_state.session_id
 
-    # switch input to cards instead of play
-    # give option to not switch decree card
 
-    if state.game_state == "select_decree_switch":
+def card_label(card: ff.game.Card) -> str:
 
-        # make something if user doesn't want to switch
-        if play != None:
-            state.proposed_play.ability_card = play.card
-            state.proposed_play.use_ability = True
+    return f"{card.value} {card.suit}"
 
-        if not game.is_valid_play(state.proposed_play):
 
-            state.game_state = "invalid_play_selected"
-            state.proposed_play = None
-            return None
+def round_view(game: ff.Game) -> dict:
+    """Everything shown about the round, cached by the store until the round
+    changes."""
 
-        else:
+    view = {
+        "round_done": game.round_done,
+        "hand": [(card.index, card_label(card)) for card in game.player1.hand],
+        "tricks_won": len(game.player1.tricks_won),
+        "turn": game.turns,
+        "decree": None,
+        "last_trick": None,
+        "leading": False,
+        "opponent_card": None,
+        "points": None,
+    }
 
-            game.step(state.proposed_play)
-            state.game_state = "round_playing"
-            state.proposed_play = None
+    if not game.deal_order:
+        return view
 
-            return None
+    view["decree"] = card_label(game.decree_card)
 
-    elif state.game_state == "select_card_to_discard":
+    if game.turns > 0:
+        view["last_trick"] = [card_label(card) for card in game.played_tricks[-1]]
 
-        if play.card not in game.player1.hand:
+    view["leading"] = game.player_turn == game.player1 and not game.current_trick_cards
 
-            state.game_state = "invalid_play_selected"
-            return None
+    if game.current_trick_cards:
+        view["opponent_card"] = card_label(game.current_trick_cards[0])
 
-        else:
+    if game.round_done:
+        view["points"] = game.determine_points_end_round()
 
-            game.step(play)
-            state.game_state = "round_playing"
+    return view
 
-            return None
 
-    else:
+def st_select_card_button(session_id: str, index: Optional[int]) -> None:
+
+    game, ui = store.load(session_id)
+
+    card = None if index is None else ff.game.Card.from_index(index)
+    play = None if card is None else ff.game.Play(game.player1, card)
 
-        if game.is_valid_play(play):
+    # switch input to cards instead of play
+    # give option to not switch decree card
 
-            if play.card.value == 3:
+    if ui["game_state"] == "select_decree_switch":
 
-                state.proposed_play = play
+        proposed_card, ability_card = ui["proposed_play"]
+        proposed_play = ff.game.Play(
+            game.player1, ff.game.Card.from_index(proposed_card)
+        )
 
-                state.game_state = "switch_decree_or_not"
+        # make something if user doesn't want to switch
+        if card is not None:
+            proposed_play.ability_card = card
+            proposed_play.use_ability = True
 
-                return None
+        ui["proposed_play"] = None
 
-            elif play.card.value == 5:
+        if not game.is_valid_play(proposed_play):
+            ui["game_state"] = "invalid_play_selected"
+        else:
+            game.step(proposed_play)
+            ui["game_state"] = "round_playing"
 
-                state.game_state = "select_card_to_discard"
+    elif ui["game_state"] == "select_card_to_discard":
 
-                game.step(play)
+        if card not in game.player1.hand:
+            ui["game_state"] = "invalid_play_selected"
+        else:
+            game.step(play)
+            ui["game_state"] = "round_playing"
 
-                return None
+    elif play is not None and game.is_valid_play(play):
 
-            else:
+        if play.card.value == 3:
 
-                game.step(play)
+            ui["proposed_play"] = (play.card.index, None)
+            ui["game_state"] = "switch_decree_or_not"
 
-                return None
+        elif play.card.value == 5:
+
+            ui["game_state"] = "select_card_to_discard"
+            game.step(play)
 
         else:
-            state.game_state = "invalid_play_selected"
-            return None
+            game.step(play)
+
+    else:
+        ui["game_state"] = "invalid_play_selected"
 
+    store.save(session_id, game, ui)
 
-def st_start_new_game(game: ff.Game, state) -> None:
+
+def st_start_new_game(session_id: str) -> None:
+
+    game, ui = store.load(session_id)
 
     game.setup_game()
-    state.game_state = "round_playing"
+    ui["game_state"] = "round_playing"
+    ui["proposed_play"] = None
 
+    store.save(session_id, game, ui)
 
-# for easier reference
-game = st.session_state.game
-state = st.session_state
 
-st.title("Play a game of the fox in the forest")
+game, ui = store.load(session_id)
+ui.setdefault("game_state", "not_initialised")
+ui.setdefault("proposed_play", None)
 
-# st.write(state.game_state)
+view = store.view(session_id, round_view)
 
-nr_of_cards = len(game.player1.hand)
+st.title("Play a game of the fox in the forest")
 
 # print decree card, cards involved in last trick, and card played by opponent in current trick (if applicable)
-if game.round_done == False:
-    st.write(f"The decree cards is {game.decree_card.value} {game.decree_card.suit}")
+if not view["round_done"]:
 
-    if game.turns > 0:
+    st.write(f"The decree cards is {view['decree']}")
 
-        last_trick = game.played_tricks[-1]
-        st.write(
-            f"Last turn {last_trick[0].value} {last_trick[0].suit} and {last_trick[1].value} {last_trick[1].suit} were played"
-        )
+    if view["last_trick"] is not None:
+        first, second = view["last_trick"]
+        st.write(f"Last turn {first} and {second} were played")
 
-    if game.player_turn == game.player1 and game.current_trick_cards == []:
+    if view["leading"]:
         st.write("Your turn, play the first card:")
 
-    elif state.game_state == "select_card_to_discard":
-
+    elif ui["game_state"] == "select_card_to_discard":
         st.write("You have received an extra card, select a card to discard:")
 
-    elif game.current_trick_cards != []:
-        played_card = game.current_trick_cards[0]
-
-        st.write(f"Your opponent played {played_card.value} {played_card.suit}:")
+    elif view["opponent_card"] is not None:
+        st.write(f"Your opponent played {view['opponent_card']}:")
 
 
 # print hand
 
-if game.round_done == False and state.game_state != "switch_decree_or_not":
-    st.write("Your hand:")
+if not view["round_done"] and ui["game_state"] != "switch_decree_or_not":
 
-    if nr_of_cards > 0:
-        hand_column = st.columns([1 for x in range(nr_of_cards)])
-    else:
-        hand_column = []
+    st.write("Your hand:")
 
-    for card, column in zip(game.player1.hand, hand_column):
+    hand = view["hand"]
+    hand_column = st.columns([1] * len(hand)) if hand else []
 
-        label = f"{card.value} {card.suit}"
-        play = ff.game.Play(game.player1, card)
+    for (index, label), column in zip(hand, hand_column):
 
         column.button(
             label,
-            key=None,
-            help=None,
+            key=f"card-{index}",
             on_click=st_select_card_button,
-            args=[play, game, state],
-            kwargs=None,
-            disabled=False,
+            args=[session_id, index],
         )
 
-if state.game_state == "invalid_play_selected":
+if ui["game_state"] == "invalid_play_selected":
 
     st.write("You cannot play that card")
+    ui["game_state"] = "round_playing"
 
-    setattr(state, "game_state", "round_playing")
-
-elif state.game_state == "select_decree_switch":
+elif ui["game_state"] == "select_decree_switch":
 
     st.write("Select card to switch with the decree card")
 
-elif state.game_state == "select_card_to_discard":
+elif ui["game_state"] == "select_card_to_discard":
 
     st.write("Select card to discard")
 
 # If player needs to decide whether to switch decree or not
-if game.round_done == False and state.game_state == "switch_decree_or_not":
+if not view["round_done"] and ui["game_state"] == "switch_decree_or_not":
 
-    st.write(f"Do you want to switch the decree card with a card from your hand?")
+    st.write("Do you want to switch the decree card with a card from your hand?")
 
-    setattr(state, "game_state", "select_decree_switch")
+    ui["game_state"] = "select_decree_switch"
 
     hand_column = st.columns([1, 1])
 
-    hand_column[0].button(
-        "Yes",
-        kwargs=None,
-        disabled=False,
-    )
+    hand_column[0].button("Yes")
 
     hand_column[1].button(
         "No",
         on_click=st_select_card_button,
-        args=[None, game, state],
-        kwargs=None,
-        disabled=False,
+        args=[session_id, None],
     )
 
 
 # misc info
-st.write(f"Tricks won: {len(game.player1.tricks_won)}")
-st.write(f"Turn: {game.turns}")
+st.write(f"Tricks won: {view['tricks_won']}")
+st.write(f"Turn: {view['turn']}")
 
-st.button("Start new game", on_click=st_start_new_game, args=[game, state])
+st.button("Start new game", on_click=st_start_new_game, args=[session_id])
 
-if game.round_done == True and state.game_state != "not_initialised":
+if view["round_done"] and ui["game_state"] != "not_initialised":
 
-    p1_points, p2_points = game.determine_points_end_round()
+    p1_points, p2_points = view["points"]
 
     st.write(
         f"The round is over, you scored {p1_points} points, while the computer scored {p2_points}"
     )
 
 
-if state.proposed_play != None:
+if ui["proposed_play"] is not None:
 
-    st.write(f"card: {state.proposed_play.card.value} {state.proposed_play.card.suit}")
+    proposed_card, _ = ui["proposed_play"]
+    st.write(f"card: {card_label(ff.game.Card.from_index(proposed_card))}")
 
-    if state.proposed_play.ability_card != None:
-
-        st.write(
-            f", switch: {state.proposed_play.ability_card.value} {state.proposed_play.ability_card.suit}"
-        )
+# keep the front end state changed while rendering
+store.save(session_id, game, ui)
@@ -1,14 +1,41 @@
 import pytest
+import asyncio
+import copy
+import functools
+import json
+import os
+import pickle
+import random
 import foxforest
 import numpy as np
 
 from foxforest import __version__
+from foxforest import benchmark
+from foxforest import engine
+from foxforest import evaluation
+from foxforest import events
+from foxforest import ismcts
+from foxforest import observation
+from foxforest import profiling
+from foxforest import records
+from foxforest import sampler
+from foxforest import selfplay
+from foxforest import server
+from foxforest import sessions
+from foxforest import solver
+from foxforest import symmetry
+from foxforest import tablebase
+from foxforest import tournament
+from foxforest import vectorized
+from foxforest.player import Hand
 from foxforest.player import Player
 from foxforest.player import AIPlayer
+from foxforest.player import RandomPlayer
 from foxforest.game import Card
 from foxforest.game import Game
 from foxforest.game import Play
 from foxforest.game import Deck
+from foxforest.game import InvalidPlay
 
 
 def test_version():
@@ -61,6 +88,15 @@ class TestPlayer:
 
         assert valid_moves[0].card == card
 
+    def test_hand_mask(self, basic_player):
+
+        basic_player.hand = [Card(11, "K"), Card(3, "B")]
+        basic_player.add_to_hand([Card(6, "M")])
+        basic_player.hand.remove(Card(3, "B"))
+
+        assert isinstance(basic_player.hand, Hand)
+        assert basic_player.hand.mask == (1 << 10) | (1 << 27)
+
 
 class TestAIPlayer:
     @pytest.fixture
@@ -83,6 +119,254 @@ class TestAIPlayer:
             encoded_cards, ai_player.encode_cards(ai_player.hand)
         )
 
+    def test_decode_cards(self, ai_player):
+
+        cards = [Card(11, "K"), Card(3, "B"), Card(5, "B"), Card(6, "M")]
+
+        assert ai_player.decode_cards(ai_player.encode_cards(cards)) == sorted(cards)
+
+        encoded = np.zeros((3, 33))
+        encoded[0, [0, 32]] = 1
+        encoded[2, 5] = 1
+
+        assert observation.decode_cards(encoded) == [
+            [Card(1, "K"), Card(11, "M")],
+            [],
+            [Card(6, "K")],
+        ]
+
+    def test_get_gamestate(self, ai_player):
+
+        game = Game(ai_player, RandomPlayer("player2"), random.Random(2))
+        game.setup_game()
+
+        encoded = ai_player.get_gamestate(game)
+
+        assert encoded.shape == (observation.NUM_FEATURES,)
+        assert ai_player.decode_cards(encoded[observation.HAND]) == sorted(
+            ai_player.hand
+        )
+        assert ai_player.decode_cards(encoded[observation.DECREE]) == [game.decree_card]
+        assert encoded[observation.TURNS] == 0
+
+        # the played planes cover the finished tricks, not just the open one
+        rng = random.Random(3)
+        while game.turns < 5:
+            game.apply_action(engine.random_action(game.legal_actions(), rng))
+
+        encoded = ai_player.get_gamestate(game)
+        played = [
+            (card, player)
+            for cards, players in zip(game.played_tricks, game.played_trick_players)
+            for card, player in zip(cards, players)
+        ]
+
+        assert ai_player.decode_cards(encoded[observation.OWN_PLAYED]) == sorted(
+            card for card, player in played if player is ai_player
+        )
+        assert ai_player.decode_cards(encoded[observation.OPPONENT_PLAYED]) == sorted(
+            card for card, player in played if player is not ai_player
+        )
+        assert (
+            game.to_state().history
+            == records.replay(game.deal_order, game.action_log).history
+        )
+
+
+class TestObservation:
+    def test_batch_matches_masks(self):
+
+        rng = random.Random(3)
+        states = []
+
+        for _ in range(300):
+
+            state = engine.GameState()
+            state.deal(engine.shuffled_deck(rng))
+
+            for _ in range(rng.randrange(30)):
+                if not state.done:
+                    state.apply_action(engine.random_action(state.legal_actions(), rng))
+
+            states.append(state)
+
+        seats = [rng.randrange(2) for _ in states]
+
+        encoder = observation.ObservationEncoder(16)
+        encoded = encoder.encode(states, seats)
+
+        assert encoded.shape == (300, observation.NUM_FEATURES)
+
+        for row, state, seat in zip(encoded, states, seats):
+
+            (
+                hand,
+                own,
+                opponent,
+                trick,
+                decree,
+                voids,
+                turns,
+                tricks,
+                opponent_tricks,
+            ) = observation.observe(state, seat)
+
+            def mask(block: slice) -> int:
+
+                return engine.cards_to_mask(np.flatnonzero(row[block]).tolist())
+
+            assert mask(observation.HAND) == hand == state.hands[seat]
+            assert (
+                mask(observation.OWN_PLAYED) | mask(observation.OPPONENT_PLAYED)
+                == state.played
+            )
+            assert mask(observation.TRICK) == trick
+            assert mask(observation.DECREE) == 1 << state.decree
+            assert mask(observation.VOIDS) == voids
+            assert row[observation.TURNS] == np.float32(state.turns / 13)
+            assert row[observation.TRICKS] == np.float32(state.tricks[seat] / 13)
+
+    def test_opponent_voids(self):
+
+        state = engine.GameState()
+        state.deal(range(33))
+
+        # seat 0 holds every K, seat 1 cannot follow but plays a 3, which may
+        # have taken the decree card
+        state.apply_action(engine.card_index(2, "K"))
+        state.apply_action(engine.card_index(3, "B"))
+
+        assert observation.opponent_voids(state, 0) == 0
+
+        state = engine.GameState()
+        state.deal(range(33))
+        state.apply_action(engine.card_index(4, "K"))
+        state.apply_action(engine.card_index(4, "B"))
+
+        assert observation.opponent_voids(state, 0) == 1 << engine.SUIT_INDEX["K"]
+        assert observation.opponent_voids(state, 1) == 0
+
+        # a 3 clears the voids even without an exchange, as the state does not
+        # tell, where the exact knowledge of the sampler keeps the void
+        knowledge = sampler.Knowledge(0)
+        knowledge.opponent_played(engine.card_index(4, "B"), engine.card_index(4, "K"))
+
+        state.apply_action(engine.card_index(6, "K"))
+        state.apply_action(engine.card_index(3, "B"))
+        knowledge.opponent_played(engine.card_index(3, "B"), engine.card_index(6, "K"))
+
+        assert state.decree == 26
+        assert observation.opponent_voids(state, 0) == 0
+        assert knowledge.excluded & engine.SUIT_MASKS[engine.SUIT_INDEX["K"]] == (
+            engine.SUIT_MASKS[engine.SUIT_INDEX["K"]]
+        )
+
+
+class TestCard:
+    def test_cards_are_interned(self):
+
+        assert Card(5, "K") is Card.from_index(engine.card_index(5, "K"))
+        assert Card(5, "K") == Card(5, "K")
+        assert Card(5, "K") != Card(5, "B")
+        assert hash(Card(5, "B")) == Card(5, "B").index
+        assert Card(11, "K") < Card(1, "B")
+
+        first = Deck()
+        first.create_deck()
+        second = Deck()
+        second.create_deck()
+
+        assert all(a is b for a, b in zip(first.cards, second.cards))
+        assert len(set(first.cards)) == 33
+
+    def test_cards_are_immutable(self):
+
+        card = Card(7, "M")
+
+        with pytest.raises(AttributeError):
+            card.value = 8
+
+        with pytest.raises(AttributeError):
+            card.played_by = None
+
+        with pytest.raises(ValueError):
+            Card(12, "K")
+
+    def test_pickle_keeps_identity(self):
+
+        card = Card(3, "B")
+
+        assert pickle.loads(pickle.dumps(card)) is card
+        assert copy.deepcopy([card])[0] is card
+
+    def test_trick_record(self):
+
+        game = Game(RandomPlayer("player1"), RandomPlayer("player2"))
+        game.setup_game()
+
+        play = game.play_turn()
+
+        assert game.current_trick_cards == [play.card]
+        assert game.current_trick_players == [game.player1]
+
+        game.play_turn()
+        game.finish_trick()
+
+        assert game.played_trick_players == [[game.player1, game.player2]]
+        assert game.current_trick_players == []
+
+
+class TestDeck:
+    def test_draw_and_discard(self):
+
+        deck = Deck(random.Random(0))
+        deck.create_deck(range(33))
+
+        hand1, hand2, decree_card = deck.deal()
+
+        assert [card.index for card in hand1] == list(range(13))
+        assert [card.index for card in hand2] == list(range(13, 26))
+        assert decree_card.index == 26
+        assert len(deck) == 6
+
+        assert deck.draw_top_n_cards(2) == [Card.from_index(27), Card.from_index(28)]
+
+        deck.put_bottom(hand1[0])
+        deck.return_top(Card.from_index(28))
+
+        assert [card.index for card in deck.cards] == [28, 29, 30, 31, 32, 0]
+        assert deck.take_bottom() is hand1[0]
+
+        with pytest.raises(IndexError):
+            deck.draw_top_n_cards(6)
+
+    @pytest.mark.parametrize(
+        "make_rng", [random.Random, np.random.default_rng], ids=["random", "numpy"]
+    )
+    def test_rounds_replay_from_seed(self, make_rng):
+        def play(seed: int) -> list:
+
+            game = Game(
+                RandomPlayer("player1", make_rng(seed + 1)),
+                RandomPlayer("player2", make_rng(seed + 2)),
+                make_rng(seed),
+            )
+            game.setup_game()
+
+            plays = []
+            while game.turns < 13:
+                plays.append(str(game.play_turn().card))
+                plays.append(str(game.play_turn().card))
+                game.finish_trick()
+
+            return plays + [game.determine_points_end_round()]
+
+        random.seed(1)
+        first = play(4)
+        random.seed(2)
+        assert play(4) == first
+        assert play(5) != first
+
 
 class TestGame:
     @pytest.fixture
@@ -112,7 +396,7 @@ class TestGame:
         self, test_game, test_play, first_card, second_card, hand
     ):
 
-        test_game.decree_card = Card(3, "K", None)
+        test_game.decree_card = Card(3, "K")
 
         test_game.player_turn = test_game.player2
 
@@ -135,7 +419,7 @@ class TestGame:
         self, test_game, test_play, first_card, second_card, hand
     ):
 
-        test_game.decree_card = Card(10, "K", None)
+        test_game.decree_card = Card(10, "K")
 
         test_game.player_turn = test_game.player2
 
@@ -148,7 +432,7 @@ class TestGame:
 
     def test_is_valid_play_three_ability(self, test_game, test_play):
 
-        test_game.decree_card = Card(1, "K", None)
+        test_game.decree_card = Card(1, "K")
 
         test_game.player1.hand = [Card(3, "K"), Card(8, "B")]
 
@@ -163,49 +447,37 @@ class TestGame:
 
     def test_determine_trick_winner_trump(self, test_game):
 
-        test_game.decree_card = Card(1, "K", None)
+        test_game.decree_card = Card(1, "K")
 
         # trump suit beats higher value
-        test_game.current_trick_cards = [
-            Card(5, "K", test_game.player1),
-            Card(10, "B", test_game.player2),
-        ]
+        test_game.current_trick_cards = [Card(5, "K"), Card(10, "B")]
+        test_game.current_trick_players = [test_game.player1, test_game.player2]
 
         assert test_game.determine_trick_winner() == test_game.player1
 
     def test_determine_trick_winner_non_trump(self, test_game):
         # higher value wins for non-trump suit
-        test_game.decree_card = Card(1, "K", None)
+        test_game.decree_card = Card(1, "K")
 
-        test_game.current_trick_cards = [
-            Card(5, "B", test_game.player1),
-            Card(10, "B", test_game.player2),
-        ]
+        test_game.current_trick_cards = [Card(5, "B"), Card(10, "B")]
+        test_game.current_trick_players = [test_game.player1, test_game.player2]
 
         assert test_game.determine_trick_winner() == test_game.player2
 
     def test_determine_trick_winner_nines(self, test_game):
         # if one 9 is played counts as trump
-        test_game.decree_card = Card(1, "K", None)
+        test_game.decree_card = Card(1, "K")
 
-        test_game.current_trick_cards = [
-            Card(9, "M", test_game.player1),
-            Card(10, "B", test_game.player2),
-        ]
+        test_game.current_trick_cards = [Card(9, "M"), Card(10, "B")]
+        test_game.current_trick_players = [test_game.player1, test_game.player2]
 
         assert test_game.determine_trick_winner() == test_game.player1
 
-        test_game.current_trick_cards = [
-            Card(9, "M", test_game.player1),
-            Card(8, "K", test_game.player2),
-        ]
+        test_game.current_trick_cards = [Card(9, "M"), Card(8, "K")]
 
         assert test_game.determine_trick_winner() == test_game.player1
 
-        test_game.current_trick_cards = [
-            Card(9, "M", test_game.player1),
-            Card(9, "K", test_game.player2),
-        ]
+        test_game.current_trick_cards = [Card(9, "M"), Card(9, "K")]
 
         assert test_game.determine_trick_winner() == test_game.player2
 
@@ -261,3 +533,1672 @@ class TestGame:
 
         assert test_game.deck.cards[-1] == Card(8, "B")
         assert test_game.player1.hand == [Card(9, "M")]
+
+
+class TestEngine:
+    def test_legal_move_tables(self):
+
+        rng = random.Random(11)
+
+        for _ in range(300):
+
+            hand = rng.getrandbits(33)
+
+            assert engine.cards_of(hand) == tuple(engine.iter_cards(hand))
+            assert engine.legal_moves(hand, engine.NO_CARD) == hand
+
+            for lead in range(33):
+
+                # the rules spelled out card by card
+                cards = list(engine.iter_cards(hand))
+                suit = [
+                    c for c in cards if engine.CARD_SUITS[c] == engine.CARD_SUITS[lead]
+                ]
+                if not suit:
+                    legal = cards
+                elif engine.CARD_VALUES[lead] == 11:
+                    legal = [
+                        c for c in suit if engine.CARD_VALUES[c] == 1 or c == max(suit)
+                    ]
+                else:
+                    legal = suit
+
+                assert engine.legal_moves(hand, lead) == engine.cards_to_mask(legal)
+
+    def test_trick_winner_table(self):
+
+        for lead in range(33):
+            for follow in range(33):
+                for trump_suit in range(3):
+                    assert engine.TRICK_WINNER[lead][follow][
+                        trump_suit
+                    ] == engine.trick_winner(lead, follow, trump_suit)
+
+        assert vectorized.TRICK_WINNER.shape == (33, 33, 3)
+        assert vectorized.TRICK_WINNER.tolist() == [
+            [list(winners) for winners in row] for row in engine.TRICK_WINNER
+        ]
+
+    @pytest.mark.parametrize(
+        "lead, hand, legal",
+        [
+            (Card(7, "K"), [Card(8, "K"), Card(9, "M")], [Card(8, "K")]),
+            (Card(7, "K"), [Card(8, "B"), Card(9, "M")], [Card(8, "B"), Card(9, "M")]),
+            (
+                Card(11, "K"),
+                [Card(1, "K"), Card(4, "K"), Card(9, "K"), Card(2, "B")],
+                [Card(1, "K"), Card(9, "K")],
+            ),
+            (None, [Card(1, "K"), Card(2, "B")], [Card(1, "K"), Card(2, "B")]),
+        ],
+    )
+    def test_legal_moves(self, lead, hand, legal):
+
+        lead_index = engine.NO_CARD if lead is None else lead.index
+        hand_mask = engine.cards_to_mask([card.index for card in hand])
+
+        assert engine.legal_moves(hand_mask, lead_index) == engine.cards_to_mask(
+            [card.index for card in legal]
+        )
+
+    def test_state_matches_game(self):
+
+        random.seed(3)
+
+        for _ in range(20):
+
+            game = Game(RandomPlayer("player1"), RandomPlayer("player2"))
+            game.setup_game()
+            state = game.to_state()
+
+            while game.turns < 13:
+
+                assert state.hands == [game.player1.hand.mask, game.player2.hand.mask]
+                assert state.legal_moves() == game.legal_moves_mask(game.player_turn)
+
+                player = game.player_turn
+                play = player.request_play(game)
+                game.execute_play(play)
+                state.play(play.card.index)
+
+                if game.wait_for_discard:
+                    discard = player.request_discard(game)
+                    game.execute_discard(Play(player, discard))
+                    state.discard(discard.index)
+
+                if len(game.current_trick_cards) == 2:
+                    winner = game.determine_trick_winner()
+                    winner.add_to_tricks_won(game.current_trick_cards)
+                    game.player_turn = winner
+
+                    for card, player in zip(
+                        game.current_trick_cards, game.current_trick_players
+                    ):
+                        if card.value == 1 and player != winner:
+                            game.player_turn = player
+
+                    game.current_trick_cards = []
+                    game.current_trick_players = []
+                    game.turns += 1
+
+                assert state.turn == (0 if game.player_turn == game.player1 else 1)
+
+            assert state.points() == game.determine_points_end_round()
+
+
+class TestSimulate:
+    def test_simulate_round_reproducible(self):
+
+        players = (RandomPlayer("player1"), RandomPlayer("player2"))
+
+        result = foxforest.simulate_round(*players, seed=11)
+
+        assert result == foxforest.simulate_round(*players, seed=11)
+        assert sum(result.tricks) == 13
+        assert len(result.trick_sequence) == 13
+        assert list(result.points) == engine.round_points(
+            result.tricks[0], result.sevens[0], result.sevens[1]
+        )
+
+    def test_simulate_round_game_players(self, capsys):
+
+        result = foxforest.simulate_round(
+            AIPlayer("player1", iterations=50, seed=1), RandomPlayer("player2"), seed=4
+        )
+
+        assert sum(result.tricks) == 13
+        assert sum(result.sevens) <= 3
+        assert capsys.readouterr().out == ""
+
+
+class TestActions:
+    def test_actions_match_moves(self):
+
+        rng = random.Random(4)
+        state = engine.GameState()
+
+        for _ in range(20):
+
+            state.deal(engine.shuffled_deck(rng))
+
+            while not state.done:
+
+                moves = state.moves()
+                actions = state.legal_actions()
+
+                assert sorted(engine.iter_actions(actions)) == sorted(
+                    engine.move_to_action(move) for move in moves
+                )
+                assert all(
+                    engine.action_to_move(engine.move_to_action(move)) == move
+                    for move in moves
+                )
+
+                state.apply_action(engine.random_action(actions, rng))
+
+    def test_game_apply_action(self):
+
+        rng = random.Random(8)
+
+        for _ in range(5):
+
+            game = Game(Player("player1"), Player("player2"), random.Random(1))
+            game.setup_game()
+            state = game.to_state()
+
+            while not game.round_done:
+
+                actions = game.legal_actions()
+                assert actions == state.legal_actions()
+
+                action = engine.random_action(actions, rng)
+                game.apply_action(action)
+                state.apply_action(action)
+
+                assert game.to_state().hands == state.hands
+                assert game.decree_card.index == state.decree
+
+            assert game.determine_points_end_round() == state.points()
+
+            with pytest.raises(InvalidPlay):
+                game.apply_action(0)
+
+    def test_batch_legal_actions(self):
+
+        rng = random.Random(6)
+        states = []
+
+        for _ in range(200):
+
+            state = engine.GameState()
+            state.deal(engine.shuffled_deck(rng))
+
+            for _ in range(rng.randrange(20)):
+                state.apply_action(engine.random_action(state.legal_actions(), rng))
+
+            states.append(state)
+
+        hands = vectorized.action_masks([state.hands[state.turn] for state in states])
+
+        actions = vectorized.batch_legal_actions(
+            hands[:, : engine.NUM_CARDS],
+            np.array([state.lead for state in states]),
+            np.array([state.pending_discard for state in states]),
+        )
+
+        expected = vectorized.action_masks([state.legal_actions() for state in states])
+
+        np.testing.assert_array_equal(actions, expected)
+
+
+class TestSelfPlay:
+    def test_generate_shards(self, tmp_path):
+
+        written = selfplay.generate(
+            RandomPlayer("player1", random.Random(1)),
+            AIPlayer("player2", iterations=5, seed=2),
+            rounds=6,
+            directory=str(tmp_path),
+            shard_size=50,
+            seed=3,
+        )
+
+        shards = list(selfplay.iter_shards(str(tmp_path)))
+
+        assert sum(len(shard) for shard in shards) == written
+        assert all(len(shard) == 50 for shard in shards[:-1])
+        assert 26 * 6 <= written <= 29 * 6
+
+        samples = np.concatenate(shards)
+        legal = selfplay.unpack_legal_actions(samples)
+
+        assert legal[np.arange(len(samples)), samples["action"]].all()
+        assert set(samples["seat"].tolist()) == {0, 1}
+        assert (samples["observation"][:, observation.TURNS] <= 12).all()
+
+        # every round is worth at least 6 points to one of the players
+        assert (samples["points"].max(axis=1) >= 6).all()
+
+    def test_samples_hold_the_cards_played(self, tmp_path):
+
+        selfplay.generate(
+            RandomPlayer("player1", random.Random(1)),
+            RandomPlayer("player2", random.Random(2)),
+            rounds=1,
+            directory=str(tmp_path),
+            seed=3,
+        )
+
+        samples = np.concatenate(list(selfplay.iter_shards(str(tmp_path))))
+        observations = samples["observation"]
+
+        # the cards played in earlier tricks stay in the observation
+        played = observations[:, observation.OWN_PLAYED].sum(axis=1)
+        played += observations[:, observation.OPPONENT_PLAYED].sum(axis=1)
+        assert (np.diff(played) >= 0).all()
+
+        for seat in (0, 1):
+            opponent = observations[samples["seat"] == seat]
+            opponent = opponent[:, observation.OPPONENT_PLAYED].sum(axis=1)
+
+            assert (np.diff(opponent) >= 0).all()
+            assert opponent[-1] > 0
+
+    def test_partial_shard_stays_valid(self, tmp_path):
+
+        writer = selfplay.ShardWriter(str(tmp_path), shard_size=100)
+
+        samples = np.zeros(30, dtype=selfplay.SAMPLE_DTYPE)
+        samples["action"] = np.arange(30)
+        writer.write(samples)
+        writer.flush()
+
+        # the writer is never closed, as when the job is killed
+        (shard,) = selfplay.iter_shards(str(tmp_path))
+
+        assert len(shard) == 30
+        assert shard["action"].tolist() == list(range(30))
+        assert isinstance(shard, np.memmap)
+
+
+class TestRecords:
+    def test_replay_matches_game(self, tmp_path):
+
+        rng = random.Random(5)
+        path = str(tmp_path / "rounds.fxr")
+        games = []
+
+        with records.RecordWriter(path) as writer:
+
+            for _ in range(20):
+
+                game = Game(Player("player1"), Player("player2"), rng)
+                game.setup_game()
+
+                # random actions, so swaps and discards are recorded too
+                while not game.round_done:
+                    game.apply_action(engine.random_action(game.legal_actions(), rng))
+
+                writer.write_game(game)
+                games.append(game)
+
+        assert os.path.getsize(path) < 4 + 20 * 70
+
+        replayed = list(records.iter_records(path))
+
+        assert len(replayed) == 20
+
+        for game, (deal_order, actions) in zip(games, replayed):
+
+            state = records.replay(deal_order, actions, validate=True)
+
+            assert list(actions) == game.action_log
+            assert state.done
+            assert state.points() == game.determine_points_end_round()
+            assert state.decree == game.decree_card.index
+
+        assert records.rescore(path) == [
+            game.determine_points_end_round() for game in games
+        ]
+        assert records.rescore(path, lambda state: state.tricks) == [
+            [len(game.player1.tricks_won), len(game.player2.tricks_won)]
+            for game in games
+        ]
+
+    def test_invalid_records(self, tmp_path):
+
+        path = str(tmp_path / "rounds.fxr")
+
+        with records.RecordWriter(path) as writer:
+            writer.write(records.encode_record(range(33), [0, 1, 2]))
+
+        with open(path, "ab") as file:
+            file.write(records.encode_record(range(33), [0, 1, 2])[:-1])
+
+        with pytest.raises(ValueError):
+            list(records.iter_records(path))
+
+        # the 1K led by player1 cannot be played again by player2
+        with pytest.raises(ValueError):
+            records.replay(list(range(33)), [0, 0], validate=True)
+
+
+class TestBenchmark:
+    def test_run_and_compare(self, tmp_path):
+
+        results = benchmark.run_benchmarks(
+            ["determine_trick_winner", "step_round"], min_time=0.02, repeats=2
+        )
+
+        assert [result.name for result in results] == [
+            "determine_trick_winner",
+            "step_round",
+        ]
+        assert all(result.ops_per_sec > 0 for result in results)
+        assert results[0].percentiles == {}
+        assert set(results[1].percentiles) == {"p50_ms", "p90_ms", "p99_ms"}
+
+        baseline = benchmark.to_json(results)
+        assert benchmark.compare(results, baseline, threshold=0.1) == []
+
+        baseline["benchmarks"]["step_round"]["ops_per_sec"] *= 10
+        (regression,) = benchmark.compare(results, baseline, threshold=0.1)
+        assert regression.startswith("step_round")
+
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps(baseline))
+
+        arguments = ["step_round", "--min-time", "0.02", "--repeats", "2"]
+        assert benchmark.main(arguments + ["--compare", str(path)]) == 1
+        assert (
+            benchmark.main(arguments + ["--compare", str(path), "--threshold", "0.95"])
+            == 0
+        )
+
+
+class TestEvents:
+    def test_round_events(self):
+
+        game = Game(
+            RandomPlayer("player1", random.Random(1)),
+            RandomPlayer("player2", random.Random(2)),
+            random.Random(3),
+        )
+        recorder = game.subscribe(events.EventRecorder())
+
+        game.play_game(verbose=False)
+
+        (started,) = recorder.of_type(events.RoundStarted)
+        assert recorder.events[0] is started
+        assert len(started.hands[0]) == len(started.hands[1]) == 13
+
+        assert len(recorder.of_type(events.CardPlayed)) == 26
+        assert len(recorder.of_type(events.TrickWon)) == 13
+
+        draws = [e for e in recorder.of_type(events.AbilityUsed) if e.given is None]
+        assert len(draws) == len(recorder.of_type(events.CardDiscarded))
+
+        (scored,) = recorder.of_type(events.RoundScored)
+        assert recorder.events[-1] is scored
+        assert list(scored.points) == game.determine_points_end_round()
+
+        tricks = [trick.cards for trick in recorder.of_type(events.TrickWon)]
+        assert tricks == [tuple(trick) for trick in game.played_tricks]
+
+        # clones and unsubscribed games stay silent
+        clone = game.clone()
+        game.unsubscribe(recorder)
+        game.play_game(verbose=False)
+        clone.setup_game()
+
+        assert recorder.events[-1] is scored
+        assert clone.listeners == []
+
+    def test_console_renderer(self, capsys):
+
+        game = Game(RandomPlayer("player1"), RandomPlayer("player2"))
+
+        game.play_game(verbose=False)
+        assert capsys.readouterr().out == ""
+
+        game.play_game()
+        output = capsys.readouterr().out
+
+        assert output.startswith("Decree card is: ")
+        assert output.count("Winner is: ") == 13
+        assert "Final points" in output
+        assert game.listeners == []
+
+
+class TestServer:
+    def test_concurrent_rounds(self):
+        async def run():
+
+            game_server = server.GameServer(
+                bots={
+                    "random": server.BOTS["random"],
+                    "ai": lambda rng: AIPlayer(
+                        "ai", iterations=20, seed=rng.getrandbits(64)
+                    ),
+                }
+            )
+            host, port = await game_server.start()
+
+            async def client(seed):
+
+                connection = await server.Client.connect(host, port)
+                rng = random.Random(seed)
+                results = [
+                    await connection.play_round(
+                        server.random_choice(rng),
+                        opponent="ai" if seed == 0 else "random",
+                        seed=seed,
+                        seat=seed % 2,
+                    )
+                    for _ in range(2)
+                ]
+                await connection.close()
+
+                return results
+
+            results = await asyncio.gather(*(client(seed) for seed in range(50)))
+            await game_server.close()
+
+            return game_server, results
+
+        game_server, results = asyncio.run(run())
+
+        assert game_server.rounds_started == game_server.rounds_finished == 100
+
+        for rounds in results:
+            for result in rounds:
+                assert sum(result["tricks"]) == 13
+                assert len(result["points"]) == 2
+
+    def test_protocol_errors(self):
+        async def run():
+
+            game_server = server.GameServer()
+            host, port = await game_server.start()
+            connection = await server.Client.connect(host, port)
+
+            replies = []
+
+            await connection.send({"type": "play", "action": 0})
+            replies.append(await connection.receive())
+
+            await connection.send({"type": "new", "opponent": "nobody"})
+            replies.append(await connection.receive())
+
+            # fields of the wrong type are refused without dropping the client
+            await connection.send({"type": "new", "opponent": []})
+            replies.append(await connection.receive())
+
+            await connection.send({"type": "new", "seed": [1]})
+            replies.append(await connection.receive())
+
+            await connection.send({"type": "new", "seed": 1.5})
+            replies.append(await connection.receive())
+
+            connection.writer.write(b"not json\n")
+            replies.append(await connection.receive())
+
+            await connection.send({"type": "new", "seed": 1})
+            message = await connection.receive()
+            while message["type"] != "your_turn":
+                message = await connection.receive()
+
+            # an illegal action is refused and the turn is asked for again
+            illegal = next(
+                action
+                for action in range(engine.NUM_ACTIONS)
+                if action not in message["legal_actions"]
+            )
+            await connection.send({"type": "play", "action": illegal})
+            replies.append(await connection.receive())
+
+            await connection.close()
+            await game_server.close()
+
+            return replies
+
+        replies = asyncio.run(run())
+
+        assert [reply["type"] for reply in replies] == ["error"] * 7
+        assert replies[2]["message"] == "opponent must be a string"
+        assert (
+            replies[3]["message"] == replies[4]["message"] == "seed must be an integer"
+        )
+        assert "Illegal action" in replies[-1]["message"]
+
+    def test_play_out_of_turn_is_refused(self):
+        async def run():
+
+            game_server = server.GameServer()
+            host, port = await game_server.start()
+            connection = await server.Client.connect(host, port)
+
+            await connection.send({"type": "new", "seed": 1})
+            message = await connection.receive()
+            while message["type"] != "your_turn":
+                message = await connection.receive()
+
+            # answer the turn twice at once, the second play is out of turn
+            action = message["legal_actions"][0]
+            play = server.encode_message({"type": "play", "action": action})
+            connection.writer.write(play + play)
+
+            messages = []
+            while not messages or messages[-1]["type"] != "your_turn":
+                messages.append(await connection.receive())
+
+            # the refused play does not answer the next turn either
+            await connection.send(
+                {"type": "play", "action": messages[-1]["legal_actions"][0]}
+            )
+            messages.append(await connection.receive())
+
+            await connection.close()
+            await game_server.close()
+
+            return messages
+
+        messages = asyncio.run(run())
+
+        errors = [message for message in messages if message["type"] == "error"]
+
+        assert len(errors) == 1
+        assert "not your turn" in errors[0]["message"]
+        assert messages[-1]["type"] == "card_played"
+
+    def test_event_messages_hide_cards(self):
+
+        game = Game(
+            RandomPlayer("player1", random.Random(1)),
+            RandomPlayer("player2", random.Random(2)),
+            random.Random(3),
+        )
+        recorder = game.subscribe(events.EventRecorder())
+        game.play_game(verbose=False)
+
+        for event in recorder.events:
+            message = server.event_message(game, event, 0)
+            if message["type"] in ("card_drawn", "card_discarded"):
+                assert (message["card"] is None) == (message["seat"] == 1)
+
+        started = server.event_message(game, recorder.events[0], 1)
+        assert started["hand"] == [card.index for card in recorder.events[0].hands[1]]
+
+
+class TestSessions:
+    @staticmethod
+    def new_players(rng):
+
+        return Player("Human"), RandomPlayer("Computer", rng)
+
+    def play_some(self, game, rng, actions):
+
+        for _ in range(actions):
+            game.apply_action(engine.random_action(game.legal_actions(), rng))
+
+    def test_restore_matches_game(self):
+
+        store = sessions.SessionStore(self.new_players, live_size=0)
+        rng = random.Random(0)
+
+        game, ui = store.load("session")
+        assert ui == {}
+
+        game.setup_game()
+        self.play_some(game, rng, 11)
+        store.save("session", game, {"game_state": "round_playing"})
+
+        restored, ui = store.load("session")
+
+        assert restored is not game
+        assert ui == {"game_state": "round_playing"}
+        assert records.game_record(restored) == records.game_record(game)
+
+        state, restored_state = game.to_state(), restored.to_state()
+        for name in ("hands", "decree", "trick", "turn", "tricks", "turns"):
+            assert getattr(restored_state, name) == getattr(state, name)
+
+    def test_live_games_and_views(self):
+
+        store = sessions.SessionStore(self.new_players, live_size=1)
+        computed = []
+
+        def view(game):
+            computed.append(game.turns)
+            return game.turns
+
+        game, _ = store.load("session")
+        game.setup_game()
+        store.save("session", game)
+
+        assert store.load("session")[0] is game
+        assert store.view("session", view) == store.view("session", view) == 0
+        assert len(computed) == 1
+
+        self.play_some(game, random.Random(1), 2)
+        store.save("session", game)
+
+        assert store.view("session", view) == 1
+        assert len(computed) == 2
+
+        # only one game is kept live, the other session is restored
+        store.load("other")
+        restores = store.restores
+        assert store.load("session")[0] is not game
+        assert store.restores == restores + 1
+
+    def test_eviction(self):
+
+        now = [0.0]
+        store = sessions.SessionStore(
+            self.new_players, max_sessions=2, idle_timeout=10, clock=lambda: now[0]
+        )
+
+        store.load("a")
+        store.load("b")
+        store.load("a")
+        store.load("c")
+
+        assert "b" not in store and "a" in store and "c" in store
+
+        now[0] = 5.0
+        store.load("a")
+        now[0] = 12.0
+
+        assert store.evict() == 1
+        assert list(store.sessions) == ["a"]
+
+
+class TestProfiling:
+    def test_phase_counters(self, tmp_path):
+
+        player1 = RandomPlayer("player1", random.Random(1))
+        player2 = RandomPlayer("player2", random.Random(2))
+        game = Game(player1, player2, random.Random(3))
+
+        profiler = game.enable_profiling()
+
+        for _ in range(3):
+            game.play_game(verbose=False)
+            game.determine_points_end_round()
+
+        assert profiler.rounds == 3
+        assert profiler.calls["decision"] >= 3 * 26
+        assert profiler.calls["trick"] == 3 * 13
+        assert profiler.calls["scoring"] == 3
+        assert profiler.calls["legal"] > 0
+        assert all(seconds >= 0 for seconds in profiler.seconds.values())
+
+        assert set(profiler.decisions) == {"player1", "player2"}
+        assert sum(h.count for h in profiler.decisions.values()) == (
+            profiler.calls["decision"]
+        )
+
+        summary = json.loads(json.dumps(profiler.to_dict()))
+        assert summary["phases"]["trick"]["calls"] == 39
+
+        path = str(tmp_path / "foxforest.prom")
+        profiler.write_prometheus(path)
+
+        with open(path) as file:
+            text = file.read()
+
+        assert 'foxforest_phase_calls_total{phase="deal"} 3' in text
+        assert 'foxforest_decision_seconds_bucket{player="player1",le="+Inf"}' in text
+
+    def test_nested_phase_is_counted_once(self):
+
+        game = Game(RandomPlayer("player1"), RandomPlayer("player2"))
+        game.setup_game()
+
+        profiler = game.enable_profiling()
+        play = game.player1.get_valid_moves(game)[0]
+        calls = profiler.calls["legal"]
+
+        # is_valid_play checks legal_moves_mask, both timed as legal
+        assert game.is_valid_play(play)
+        assert profiler.calls["legal"] == calls + 1
+
+    def test_disable_profiling(self):
+
+        game = Game(RandomPlayer("player1"), RandomPlayer("player2"))
+
+        profiler = game.enable_profiling()
+        clone = game.clone()
+
+        game.disable_profiling()
+        game.play_game(verbose=False)
+        clone.play_game(verbose=False)
+
+        assert profiler.rounds == 0
+        for method in profiling.GAME_HOOKS:
+            assert method not in game.__dict__
+        for method in profiling.PLAYER_HOOKS:
+            assert method not in game.player1.__dict__
+
+
+class TestVectorized:
+    class LowestCardPolicy(vectorized.BatchPolicy):
+        """Plays the lowest legal card. With exchange, a 3 takes the decree
+        card for the highest other card in hand."""
+
+        def __init__(self, seat, exchange=False):
+
+            self.seat = seat
+            self.exchange = exchange
+
+        def choose_play(self, batch, rows, legal):
+
+            cards = np.argmax(legal, axis=1)
+            swaps = np.full(len(rows), engine.NO_CARD)
+
+            if self.exchange:
+                others = batch.hands[self.seat][rows]
+                others[np.arange(len(rows)), cards] = False
+                highest = engine.NUM_CARDS - 1 - np.argmax(others[:, ::-1], axis=1)
+                threes = (vectorized.CARD_VALUES[cards] == 3) & others.any(axis=1)
+                swaps[threes] = highest[threes]
+
+            return cards, swaps
+
+        def choose_discard(self, batch, rows, hands):
+
+            return np.argmax(hands, axis=1)
+
+    def test_batch_legal_moves(self):
+
+        rng = np.random.default_rng(0)
+        hands = rng.random((500, 33)) < 0.4
+        lead = rng.integers(-1, 33, 500)
+
+        legal = vectorized.batch_legal_moves(hands, lead)
+
+        for row in range(500):
+            hand_mask = engine.cards_to_mask(np.flatnonzero(hands[row]).tolist())
+            expected = engine.legal_moves(hand_mask, int(lead[row]))
+            assert engine.cards_to_mask(np.flatnonzero(legal[row]).tolist()) == expected
+
+    def test_batch_trick_winner(self):
+
+        lead, follow, trump = np.meshgrid(
+            np.arange(33), np.arange(33), np.arange(3), indexing="ij"
+        )
+        winners = vectorized.batch_trick_winner(
+            lead.ravel(), follow.ravel(), trump.ravel()
+        )
+
+        for l, f, t, w in zip(lead.ravel(), follow.ravel(), trump.ravel(), winners):
+            if l != f:
+                assert engine.trick_winner(l, f, t) == w
+
+    @pytest.mark.parametrize("exchange", [False, True])
+    def test_round_matches_engine(self, exchange):
+
+        rng = np.random.default_rng(5)
+        orders = np.argsort(rng.random((200, 33)), axis=1)
+
+        batch = vectorized.BatchGame(200, rng)
+        batch.deal(orders)
+        result = batch.play_round(
+            self.LowestCardPolicy(0, exchange), self.LowestCardPolicy(1, exchange)
+        )
+
+        exchanges = 0
+
+        for row, order in enumerate(orders):
+
+            state = engine.GameState()
+            state.deal(order.tolist())
+
+            while not state.done:
+                legal = state.legal_moves()
+                card = (legal & -legal).bit_length() - 1
+                others = state.hands[state.turn] & ~(1 << card)
+                ability_card = engine.NO_CARD
+
+                if exchange and engine.CARD_VALUES[card] == 3 and others:
+                    ability_card = others.bit_length() - 1
+                    exchanges += 1
+
+                state.play(card, ability_card)
+
+                if state.pending_discard:
+                    hand = state.hands[state.turn]
+                    state.discard((hand & -hand).bit_length() - 1)
+
+            assert list(result.tricks[row]) == state.tricks
+            assert list(result.points[row]) == state.points()
+            assert list(result.sevens[row]) == state.sevens
+
+        assert (exchanges > 0) == exchange
+
+
+class TestTournament:
+    def test_round_robin(self):
+
+        players = [
+            RandomPlayer,
+            functools.partial(AIPlayer, iterations=10),
+            RandomPlayer,
+        ]
+
+        result = tournament.round_robin(players, 30, seed=2, processes=2, chunk_size=10)
+
+        assert result.pairings == [(0, 1), (0, 2), (1, 2)]
+        assert all(result.stat(pairing, "rounds") == 30 for pairing in range(3))
+        assert all(
+            result.stat(pairing, "wins")
+            + result.stat(pairing, "losses")
+            + result.stat(pairing, "draws")
+            == 30
+            for pairing in range(3)
+        )
+
+        inline = tournament.round_robin(players, 30, seed=2, processes=1, chunk_size=10)
+
+        np.testing.assert_array_equal(result.stats, inline.stats)
+
+    def test_global_random_is_left_alone(self):
+
+        players = [RandomPlayer, functools.partial(AIPlayer, iterations=5)]
+        outcomes = []
+
+        for global_seed in (5, 6):
+
+            random.seed(global_seed)
+            result = tournament.round_robin(players, 4, seed=2, processes=1)
+
+            outcomes.append((result.stats.tolist(), random.random()))
+
+        # the players are seeded from the tournament seed alone, and the
+        # caller's global random state is not replaced by it
+        assert outcomes[0][0] == outcomes[1][0]
+        assert outcomes[0][1] != outcomes[1][1]
+
+
+class TestCloneAndUndo:
+    @staticmethod
+    def snapshot(game: Game) -> tuple:
+
+        return (
+            [str(card) for card in game.player1.hand],
+            [str(card) for card in game.player2.hand],
+            game.player1.hand.mask,
+            game.player2.hand.mask,
+            [str(card) for card in game.deck.cards],
+            str(game.decree_card),
+            [str(card) for card in game.current_trick_cards],
+            [player.name for player in game.current_trick_players],
+            len(game.player1.tricks_won),
+            len(game.player2.tricks_won),
+            len(game.played_tricks),
+            game.player_turn.name,
+            game.wait_for_discard,
+            game.turns,
+            game.round_done,
+            list(game.action_log),
+        )
+
+    @staticmethod
+    def random_play(game: Game, rng: random.Random) -> Play:
+
+        player = game.player_turn
+
+        if game.wait_for_discard:
+            return Play(player, rng.choice(player.hand))
+
+        play = rng.choice(player.get_valid_moves(game))
+        others = [card for card in player.hand if card is not play.card]
+
+        if play.card.value == 3 and others and rng.random() < 0.5:
+            play.use_ability = True
+            play.ability_card = rng.choice(others)
+
+        return play
+
+    def test_push_pop_game(self):
+
+        rng = random.Random(7)
+
+        for _ in range(10):
+
+            game = Game(Player("player1"), Player("player2"))
+            game.setup_game()
+
+            snapshots = []
+
+            while not game.round_done:
+                snapshots.append(self.snapshot(game))
+                game.push(self.random_play(game, rng))
+
+            assert game.turns == 13
+
+            while snapshots:
+                game.pop()
+                assert self.snapshot(game) == snapshots.pop()
+
+    def test_clone_is_independent(self):
+
+        game = Game(RandomPlayer("player1"), RandomPlayer("player2"))
+        game.setup_game()
+        game.push(game.player1.get_valid_moves(game)[0])
+
+        before = self.snapshot(game)
+        clone = game.clone()
+
+        assert self.snapshot(clone) == before
+
+        while not clone.round_done:
+            clone.push(self.random_play(clone, random.Random(1)))
+
+        assert self.snapshot(game) == before
+        assert clone.player1 is not game.player1
+
+        # the players of the clone decide with copies of the rng and search
+        # state, so playing the clone does not change the original's moves
+        def new_game() -> Game:
+
+            game = Game(
+                RandomPlayer("player1", random.Random(1)),
+                AIPlayer("player2", iterations=5, seed=2),
+                random.Random(3),
+            )
+            game.setup_game()
+            game.play_turn()
+            game.play_turn()
+            game.finish_trick()
+
+            return game
+
+        def play_out(game: Game) -> list:
+
+            while game.turns < 13:
+                game.play_turn()
+                game.play_turn()
+                game.finish_trick()
+
+            return game.action_log
+
+        game = new_game()
+        clone = game.clone()
+
+        assert play_out(clone) == play_out(new_game())
+        assert play_out(game) == play_out(new_game())
+
+    def test_push_pop_state(self):
+
+        rng = random.Random(9)
+
+        for _ in range(20):
+
+            state = engine.GameState()
+            state.deal(engine.shuffled_deck(rng))
+            snapshots = []
+
+            while not state.done:
+                copy = state.copy()
+                snapshots.append(copy)
+
+                if state.pending_discard:
+                    state.push(engine.random_card(state.hands[state.turn], rng))
+                    continue
+
+                card = engine.random_card(state.legal_moves(), rng)
+                others = state.hands[state.turn] & ~(1 << card)
+                ability = engine.NO_CARD
+
+                if engine.CARD_VALUES[card] == 3 and others:
+                    ability = engine.random_card(others, rng)
+
+                state.push(card, ability)
+
+            while snapshots:
+                state.pop()
+                expected = snapshots.pop()
+                assert [getattr(state, name) for name in state.__slots__[:-1]] == [
+                    getattr(expected, name) for name in expected.__slots__[:-1]
+                ]
+
+
+class TestISMCTS:
+    def test_determinize_is_consistent(self):
+
+        rng = random.Random(2)
+        state = engine.GameState()
+        state.deal(engine.shuffled_deck(rng))
+
+        opponent = state.hands[1]
+        known = opponent & -opponent
+
+        # pretend the opponent lacks the suit of which it holds fewest cards
+        counts = [engine.popcount(opponent & mask) for mask in engine.SUIT_MASKS]
+        void_suit = counts.index(min(counts))
+        state.hands[1] &= ~engine.SUIT_MASKS[void_suit] | known
+        state.deck.extend(
+            engine.iter_cards(opponent & engine.SUIT_MASKS[void_suit] & ~known)
+        )
+        void_suits = 1 << void_suit
+
+        information = ismcts.InformationSet(state, 0, known, void_suits)
+
+        for _ in range(50):
+
+            sample = information.determinize(rng)
+
+            assert sample.hands[0] == state.hands[0]
+            assert sample.hands[1] & known == known
+            assert engine.popcount(sample.hands[1]) == engine.popcount(state.hands[1])
+            assert sample.hands[1] & engine.SUIT_MASKS[void_suit] & ~known == 0
+            assert sorted(sample.deck + list(engine.iter_cards(sample.hands[1]))) == (
+                sorted(state.deck + list(engine.iter_cards(state.hands[1])))
+            )
+
+    def test_ai_players_play_valid_rounds(self):
+
+        for seed in range(3):
+
+            result = foxforest.simulate_round(
+                AIPlayer("player1", iterations=30, seed=seed),
+                AIPlayer("player2", iterations=30, seed=seed + 10),
+                seed=seed,
+            )
+
+            assert sum(result.tricks) == 13
+
+    def test_ai_player_keeps_subtree(self):
+
+        kept = 0
+
+        for seed in range(4):
+
+            player = AIPlayer("player1", iterations=2000, seed=seed)
+            game = Game(player, RandomPlayer("player2", random.Random(seed)))
+            game.setup_game(engine.shuffled_deck(random.Random(seed)))
+
+            game.play_turn()
+            node = player.search.root
+            start = len(game.action_log)
+
+            game.play_turn()
+            game.finish_trick()
+
+            if game.player_turn is game.player2:
+                game.play_turn()
+
+            # follow the moves of the opponent down the tree of the first
+            # search, its discards are hidden and not part of the tree
+            for action in game.action_log[start:]:
+                if node is not None and action < engine.DISCARD_OFFSET:
+                    node = node.children.get(engine.action_to_move(action))
+
+            # the opponent's moves may not have been explored in this deal
+            if node is None:
+                continue
+
+            start = len(game.action_log)
+            game.play_turn()
+
+            # the new search grew from that node and the root moved along the
+            # player's own moves, including its discard
+            for action in game.action_log[start:]:
+                node = node.children[engine.action_to_move(action)]
+
+            assert player.search.root is node
+            kept += 1
+
+        assert kept > 0
+
+
+class TestSampler:
+    def test_follow_exclusions(self):
+
+        eleven = engine.card_index(11, "K")
+
+        assert sampler.follow_exclusions(eleven, engine.card_index(7, "K")) == (
+            engine.cards_to_mask([engine.card_index(v, "K") for v in (8, 9, 10, 11)])
+        )
+        assert sampler.follow_exclusions(eleven, engine.card_index(1, "K")) == 0
+        assert sampler.follow_exclusions(
+            engine.card_index(4, "B"), engine.card_index(7, "K")
+        ) == (engine.SUIT_MASKS[engine.SUIT_INDEX["B"]])
+
+    def test_availability_counts_every_visit(self):
+
+        state = engine.GameState()
+        state.deal(engine.shuffled_deck(random.Random(4)))
+
+        search = ismcts.ISMCTS(iterations=50, rng=random.Random(0))
+        search.search(ismcts.InformationSet(state, 0))
+
+        # the moves at the root are the same in every determinization, each
+        # child was available from the iteration that expanded it on
+        moves = len(state.moves())
+        available = sorted(child.available for child in search.root.children.values())
+
+        assert available == list(range(50 - moves + 1, 51))
+
+    def test_observer_follows_consecutive_exchanges(self):
+
+        # player1 holds the 2 of K, player2 the 3s of K and B, the 6 of B is
+        # the decree card
+        order = [1, *range(22, 33), 11]
+        order += [2, 13, *range(3, 11), 12, 14, 15]
+        order += [16, 0, *range(17, 22)]
+
+        game = Game(Player("player1"), Player("player2"), random.Random(0))
+        game.setup_game(order)
+
+        game.apply_action(1)
+        # player2 wins with the 3 of K giving the 4 of K, then leads the 3 of
+        # B giving the 5 of K, before player1 acts again
+        game.apply_action(engine.move_to_action((2, 3)))
+        game.apply_action(engine.move_to_action((13, 4)))
+
+        observer = ismcts.Observer()
+        observer.observe(game, game.player1)
+
+        # each 3 took the decree card of its own time
+        assert observer.opponent_moves == [(2, 3), (13, 4)]
+        assert observer.knowledge.known_opponent == 1 << 16 | 1 << 3
+        assert observer.decree == game.decree_card.index == 4
+
+    def test_knowledge_holds_in_played_rounds(self):
+
+        rng = random.Random(3)
+
+        for _ in range(20):
+
+            state = engine.GameState()
+            state.deal(engine.shuffled_deck(rng))
+            knowledge = sampler.Knowledge(0)
+
+            while not state.done:
+
+                moves = state.moves()
+                move = moves[int(rng.random() * len(moves))]
+                knowledge.update(state, move)
+                ismcts.apply_move(state, move)
+
+                assert state.hands[1] & knowledge.excluded == 0
+                assert (
+                    knowledge.known_deck
+                    & ~engine.cards_to_mask(state.deck[state.deck_pos :])
+                    == 0
+                )
+
+    def endgame_sampler(self, seed):
+
+        rng = random.Random(seed)
+        state = engine.GameState()
+        state.deal(engine.shuffled_deck(rng))
+        knowledge = sampler.Knowledge(0)
+
+        while state.turns < 6 or state.turn != 0 or state.pending_discard:
+            moves = state.moves()
+            move = moves[int(rng.random() * len(moves))]
+            knowledge.update(state, move)
+            ismcts.apply_move(state, move)
+
+        return state, sampler.Sampler.from_knowledge(state, knowledge)
+
+    def test_draws_are_consistent(self):
+
+        state, deals = self.endgame_sampler(1)
+        hidden = sorted(
+            state.deck[state.deck_pos :] + list(engine.iter_cards(state.hands[1]))
+        )
+        rng = random.Random(0)
+
+        hands, decks = deals.draw_batch(200, np.random.default_rng(0))
+        samples = [deals.draw(rng) for _ in range(200)]
+        samples += [deals.state_of(hands, decks, row) for row in range(200)]
+
+        for sample in samples:
+
+            assert sample.hands[0] == state.hands[0]
+            assert sample.hands[1] & deals.known_opponent == deals.known_opponent
+            assert sample.hands[1] & ~deals.candidates & ~deals.known_opponent == 0
+            assert engine.popcount(sample.hands[1]) == deals.opponent_size
+            assert sample.deck[: state.deck_pos] == state.deck[: state.deck_pos]
+            assert hidden == sorted(
+                sample.deck[state.deck_pos :] + list(engine.iter_cards(sample.hands[1]))
+            )
+
+    def test_draws_are_uniform(self):
+
+        state, deals = self.endgame_sampler(2)
+        rng = random.Random(0)
+        count = 4000
+
+        hands, _ = deals.draw_batch(count, np.random.default_rng(0))
+        frequencies = [
+            sum(deals.draw(rng).hands[1] >> card & 1 for _ in range(count)) / count
+            for card in engine.cards_of(deals.candidates)
+        ]
+        batch_frequencies = [
+            float(np.mean(hands >> np.uint64(card) & np.uint64(1)))
+            for card in engine.cards_of(deals.candidates)
+        ]
+
+        expected = deals.needed / engine.popcount(deals.candidates)
+        assert max(abs(f - expected) for f in frequencies) < 0.05
+        assert max(abs(f - expected) for f in batch_frequencies) < 0.05
+
+
+class TestSolver:
+    @staticmethod
+    def minimax(state: engine.GameState) -> int:
+
+        if state.done:
+            points = state.points()
+            return points[0] - points[1]
+
+        values = []
+
+        for move in state.moves():
+            state.push(*move)
+            values.append(TestSolver.minimax(state))
+            state.pop()
+
+        return max(values) if state.turn == 0 else min(values)
+
+    @staticmethod
+    def endgame(seed: int, tricks_left: int) -> engine.GameState:
+
+        rng = random.Random(seed)
+        state = engine.GameState()
+        state.deal(engine.shuffled_deck(rng))
+
+        while state.turns < 13 - tricks_left or state.pending_discard:
+            if state.pending_discard:
+                state.discard(engine.random_card(state.hands[state.turn], rng))
+            else:
+                state.play(engine.random_card(state.legal_moves(), rng))
+
+        return state
+
+    @pytest.mark.parametrize("seed", range(8))
+    def test_solver_matches_minimax(self, seed):
+
+        state = self.endgame(seed, 3)
+
+        solution = solver.Solver().solve(state)
+
+        assert solution.value == self.minimax(state)
+
+        # replaying the principal line reaches the solved outcome
+        for move in solution.line:
+            state.push(*move)
+
+        assert state.done
+        assert state.points()[0] - state.points()[1] == solution.value
+
+    def test_evaluate_moves(self):
+
+        state = self.endgame(3, 3)
+
+        values = solver.Solver().evaluate_moves(state)
+
+        assert set(values) == set(state.moves())
+        best = max if state.turn == 0 else min
+        assert best(values.values()) == solver.Solver().solve(state).value
+
+    def test_key_holds_deck_when_a_three_can_take_a_five_decree(self):
+
+        state = engine.GameState()
+        state.hands = [1 << 2, 1 << 11]
+        state.decree = 4
+        state.deck = [5, 6, 7, 8]
+
+        swapped = state.copy()
+        swapped.deck = [6, 5, 7, 8]
+
+        assert solver._key(state) != solver._key(swapped)
+        assert symmetry.canonical_key(state) != symmetry.canonical_key(swapped)
+
+
+@pytest.fixture(scope="module")
+def endgame(tmp_path_factory):
+
+    path = str(tmp_path_factory.mktemp("tablebase") / "endgame.fxtb")
+    tablebase.generate(path, 1)
+
+    return tablebase.Tablebase(path)
+
+
+class TestTablebase:
+    @pytest.mark.parametrize("seed", range(10))
+    def test_last_trick_matches_solver(self, endgame, seed):
+
+        state = TestSolver.endgame(seed, 1)
+
+        value = endgame.value(state)
+
+        assert value is not None
+        assert (
+            value + state.sevens[0] - state.sevens[1]
+            == solver.Solver().solve(state).value
+        )
+
+    def test_two_tricks_match_solver(self, endgame):
+
+        checked = 0
+
+        for seed in range(30):
+
+            state = TestSolver.endgame(seed, 2)
+            hand1, hand2 = state.hands
+
+            if tablebase.needs_deck(hand1, hand2, state.decree, 2):
+                continue
+
+            values = tablebase.solve_position(
+                endgame.values, hand1, hand2, state.decree, state.turn
+            )
+
+            assert (
+                values[state.tricks[0]] + state.sevens[0] - state.sevens[1]
+                == solver.Solver().solve(state).value
+            )
+            checked += 1
+
+        assert checked > 0
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_solver_with_tablebase(self, endgame, seed):
+
+        state = TestSolver.endgame(seed, 3)
+
+        with_tablebase = solver.Solver(tablebase=endgame).solve(state)
+
+        assert with_tablebase.value == solver.Solver().solve(state).value
+
+    def test_only_positions_between_tricks(self, endgame):
+
+        state = TestSolver.endgame(0, 1)
+        state.play(state.legal_moves().bit_length() - 1)
+
+        assert endgame.value(state) is None
+        assert endgame.value(TestSolver.endgame(0, 2)) is None
+
+    def test_rejects_other_files(self, tmp_path):
+
+        path = tmp_path / "other.fxtb"
+        path.write_bytes(bytes(64))
+
+        with pytest.raises(ValueError):
+            tablebase.Tablebase(str(path))
+
+
+class TestSymmetry:
+    @staticmethod
+    def midgame(seed: int) -> engine.GameState:
+
+        rng = random.Random(seed)
+        state = engine.GameState()
+        state.deal(engine.shuffled_deck(rng))
+
+        for _ in range(rng.randrange(26)):
+            if state.pending_discard:
+                state.discard(engine.random_card(state.hands[state.turn], rng))
+            else:
+                state.play(engine.random_card(state.legal_moves(), rng))
+
+        return state
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_canonical_key_ignores_labels(self, seed):
+
+        state = self.midgame(seed)
+        key = symmetry.canonical_key(state)
+
+        for permutation in range(len(symmetry.PERMUTATIONS)):
+            relabelled = symmetry.relabel(state, permutation)
+            assert symmetry.canonical_key(relabelled) == key
+
+    def test_canonical_form_has_trump_first(self):
+
+        state = self.midgame(1)
+        key, permutation = symmetry.canonical(state)
+
+        canonical = symmetry.relabel(state, permutation)
+
+        assert engine.CARD_SUITS[canonical.decree] == 0
+        assert symmetry.canonical(canonical) == (key, symmetry.IDENTITY)
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_relabelling_keeps_values(self, seed):
+
+        state = TestSolver.endgame(seed, 3)
+        permutation = 1 + seed
+
+        relabelled = symmetry.relabel(state, permutation)
+        values = solver.Solver().evaluate_moves(state)
+        relabelled_values = solver.Solver().evaluate_moves(relabelled)
+
+        assert relabelled_values == {
+            symmetry.relabel_move(move, permutation): value
+            for move, value in values.items()
+        }
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_symmetric_solver(self, seed):
+
+        state = TestSolver.endgame(seed, 4)
+        cache = symmetry.PositionCache(max_size=50)
+
+        solution = solver.Solver(cache, symmetric=True).solve(state)
+
+        assert solution.value == solver.Solver().solve(state).value
+        assert len(cache) <= 50
+
+        # the line is made of moves of the state, not of its canonical form
+        for move in solution.line:
+            assert move in state.moves()
+            state.push(*move)
+
+    def test_cache_is_shared_across_labels(self):
+
+        state = TestSolver.endgame(5, 3)
+        cache = symmetry.PositionCache()
+
+        first = solver.Solver(cache, symmetric=True)
+        first.solve(state)
+
+        second = solver.Solver(cache, symmetric=True)
+        solution = second.solve(symmetry.relabel(state, 3))
+
+        assert second.nodes < first.nodes
+        assert solution.value == first.solve(state).value
+        assert cache.hits > 0
+
+    def test_cache_evicts_least_recently_used(self):
+
+        cache = symmetry.PositionCache(max_size=2)
+
+        cache["a"] = 1
+        cache["b"] = 2
+        assert cache.get("a") == 1
+
+        cache["c"] = 3
+
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert (cache.hits, cache.misses) == (2, 1)
+
+
+class TestZobrist:
+    @pytest.mark.parametrize("seed", range(5))
+    def test_incremental_hash_matches_scratch(self, seed):
+
+        rng = random.Random(seed)
+        state = engine.GameState()
+        state.deal(engine.shuffled_deck(rng))
+
+        while not state.done:
+
+            move = rng.choice(state.moves())
+            before = state.hash
+
+            state.push(*move)
+            assert state.hash == engine.zobrist_hash(state)
+
+            state.pop()
+            assert state.hash == before
+
+            state.push(*move)
+
+    def test_empty_state(self):
+
+        assert engine.GameState().hash == engine.zobrist_hash(engine.GameState()) == 0
+
+    def test_unhashed_state_plays_the_same(self):
+
+        order = engine.shuffled_deck(random.Random(4))
+        hashed = engine.GameState()
+        hashed.deal(order)
+        unhashed = engine.GameState()
+        unhashed.deal(order, hashed=False)
+
+        rng = random.Random(5)
+
+        while not hashed.done:
+            move = rng.choice(hashed.moves())
+            hashed.push(*move)
+            unhashed.push(*move)
+
+        assert unhashed.history == hashed.history
+        assert unhashed.points() == hashed.points()
+        assert not unhashed.hashed
+
+        unhashed.rehash()
+        assert unhashed.hashed and unhashed.hash == hashed.hash
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_game_hash_follows_round(self, seed):
+
+        rng = random.Random(seed)
+        game = Game(RandomPlayer("p1", rng), RandomPlayer("p2", rng), rng)
+        game.setup_game()
+
+        hashes = [game.zobrist]
+
+        while not game.round_done:
+            game.apply_action(game.request_action())
+            assert game.zobrist == game.to_state().hash
+            hashes.append(game.zobrist)
+
+        assert len(set(hashes)) == len(hashes)
+
+    def test_game_push_pop_and_clone(self):
+
+        rng = random.Random(7)
+        game = Game(RandomPlayer("p1", rng), RandomPlayer("p2", rng), rng)
+        game.setup_game()
+
+        for _ in range(12):
+            game.apply_action(game.request_action())
+
+        before = game.zobrist
+        clone = game.clone()
+
+        play = game.action_to_play(engine.random_action(game.legal_actions(), rng))
+        game.push(play)
+        assert game.zobrist == game.to_state().hash
+
+        game.pop()
+        assert game.zobrist == before == clone.zobrist
+
+    def test_determinizations_are_hashed(self):
+
+        state = TestSolver.endgame(2, 10)
+        information = sampler.Sampler(state, 0)
+        rng = random.Random(0)
+
+        for _ in range(20):
+            drawn = information.draw(rng)
+            assert drawn.hash == engine.zobrist_hash(drawn)
+
+
+class TestEvaluation:
+    def test_equal_players_accept_h0(self):
+
+        result = evaluation.evaluate(
+            RandomPlayer, RandomPlayer, elo0=0, elo1=100, seed=1, processes=1
+        )
+
+        assert result.decision == evaluation.H0
+        assert result.llr <= result.bounds[0]
+        assert result.pairs < 10000
+        assert result.pairs % 10 == 0
+
+        # only the deal is shared, the two rounds of a pair are played out
+        # with their own choices, so not every pair is split evenly
+        assert result.counts[2] < result.pairs
+        assert result.counts[0] + result.counts[4] > 0
+
+        lowest, highest = result.elo_interval()
+        assert lowest < result.elo() < highest
+
+    def test_stronger_player_accepts_h1(self):
+
+        result = evaluation.evaluate(
+            functools.partial(AIPlayer, iterations=30),
+            RandomPlayer,
+            elo0=0,
+            elo1=100,
+            seed=2,
+            processes=2,
+            chunk_size=5,
+        )
+
+        assert result.decision == evaluation.H1
+        assert result.elo() > 0
+        assert result.point_difference > 0
+
+        (name, rating, lowest, highest), baseline = result.ratings()
+        assert lowest < rating < highest
+        assert baseline[1:] == (0.0, 0.0, 0.0)
+
+    def test_processes_do_not_change_the_outcome(self):
+
+        kwargs = dict(elo0=0, elo1=100, max_pairs=30, seed=3, chunk_size=10)
+
+        inline = evaluation.evaluate(RandomPlayer, RandomPlayer, processes=1, **kwargs)
+        pooled = evaluation.evaluate(RandomPlayer, RandomPlayer, processes=2, **kwargs)
+
+        assert inline == pooled
+        assert inline.pairs <= 30
+
+    def test_identical_pairs_do_not_stop_the_test_early(self):
+
+        sprt = evaluation.PentanomialSPRT(0, 50, min_pairs=30)
+
+        # a first chunk of wins alone has next to no variance and a huge llr
+        sprt.add([0, 0, 0, 0, 10])
+        assert sprt.llr() >= sprt.upper
+        assert sprt.decision() is None
+
+        sprt.add([2, 6, 8, 8, 6])
+        assert sprt.pairs == 40
+        assert sprt.decision() == evaluation.H1
+
+    def test_sprt_bounds(self):
+
+        sprt = evaluation.PentanomialSPRT(0, 50, alpha=0.05, beta=0.05)
+
+        assert sprt.decision() is None
+        assert sprt.upper == pytest.approx(-sprt.lower)
+
+        sprt.add([0, 0, 0, 10, 40])
+        assert sprt.decision() == evaluation.H1
+
+        assert evaluation.score_to_elo(evaluation.elo_to_score(120)) == pytest.approx(
+            120
+        )